@@ -0,0 +1,57 @@
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+
+
+class _AdaptiveChunks:
+    """
+    Mixin: chunksize() is chosen before each request - by a ChunkTuner, or
+    the fixed size the media was built with when there is none - and can be
+    capped for that request (see next_chunk_size).
+    """
+
+    # Streams that cannot be re-read cheaply never switch to a single request
+    allow_single_request = True
+
+    def _init_chunks(self, tuner):
+        self.tuner = tuner
+        self._fixed_chunksize = self._chunksize
+        self._chunksize = self._next_size(0)
+
+    def _next_size(self, progress):
+        if self.tuner is None:
+            return self._fixed_chunksize
+        size = self.tuner.size
+        # googleapiclient only gets Content-Range right for a single request
+        # that starts at byte 0, so a resumed upload goes on in chunks
+        if size == -1 and (progress or not self.allow_single_request):
+            size = self.tuner.chunk_size
+        return size
+
+    def chunksize(self):
+        return self._chunksize
+
+    def next_chunk_size(self, progress=0, cap=None):
+        """
+        Called before each request at offset `progress`; returns the chunk
+        size it will use, at most `cap` bytes when one is given.
+        """
+        size = self._next_size(progress)
+        if cap:
+            size = cap if size == -1 else min(size, cap)
+        self._chunksize = size
+        return size
+
+
+class AdaptiveMediaFileUpload(_AdaptiveChunks, MediaFileUpload):
+    def __init__(self, filename, tuner=None, mimetype=None, chunksize=None):
+        chunksize = tuner.minimum if tuner is not None else chunksize
+        MediaFileUpload.__init__(self, filename, mimetype=mimetype, chunksize=chunksize, resumable=True)
+        self._init_chunks(tuner)
+
+
+class AdaptiveMediaIoBaseUpload(_AdaptiveChunks, MediaIoBaseUpload):
+    allow_single_request = False
+
+    def __init__(self, fd, mimetype, tuner=None, chunksize=None):
+        chunksize = tuner.minimum if tuner is not None else chunksize
+        MediaIoBaseUpload.__init__(self, fd, mimetype, chunksize=chunksize, resumable=True)
+        self._init_chunks(tuner)
@@ -0,0 +1,385 @@
+import asyncio
+import logging
+import os
+import time
+
+# Optional (only RUN_MODE = "async" needs it) and slow to import - loaded by
+# require_aiohttp() on first use
+aiohttp = None
+
+from chunk_tuner import align_chunk
+from metrics import METRICS
+from quota import QuotaExceeded, is_quota_response
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from a response / file per step when streaming
+ASYNC_READ_SIZE = 1024 * 1024
+
+
+def require_aiohttp():
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp
+        except ImportError:
+            raise RuntimeError("RUN_MODE = 'async' requires aiohttp: pip install aiohttp") from None
+    return aiohttp
+
+
+def http_session(connections):
+    """One aiohttp session (and keep-alive connection pool) shared by every stage of a run."""
+    require_aiohttp()
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=max(connections, 1)),
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300),
+    )
+
+
+class NotFound(Exception):
+    """The remote file does not exist (HTTP 404)."""
+
+
+class UploadError(Exception):
+    def __init__(self, status, content):
+        super().__init__(f"HTTP {status}: {str(content)[:300]}")
+        self.status = status
+        self.content = content
+
+
+class StateWriter:
+    """
+    Owns the state store writes of an async run.
+
+    Coroutines queue writes with record() / call() and one task applies them
+    in order, off the event loop, so the journal (and the CSV exported from
+    it) is only ever touched from a single place.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def record(self, row_id, **fields):
+        self.call("record", row_id, **fields)
+
+    def call(self, method, *args, **kwargs):
+        self._queue.put_nowait((method, args, kwargs))
+
+    async def _run(self):
+        while True:
+            method, args, kwargs = await self._queue.get()
+            if method is None:
+                return
+            try:
+                await asyncio.to_thread(getattr(self.state, method), *args, **kwargs)
+            except Exception as e:
+                logger.error(f"❌ כתיבה ליומן המצב נכשלה ({method}): {str(e)}")
+
+    async def close(self):
+        """Apply everything queued so far and stop."""
+        if self._task is not None:
+            self._queue.put_nowait((None, (), {}))
+            await self._task
+            self._task = None
+
+
+async def probe(http, url_factory):
+    """(size, etag) of a remote file from a HEAD request."""
+    async with http.head(url_factory(), allow_redirects=True) as resp:
+        METRICS.inc("download_http_responses_total", code=resp.status)
+        if resp.status == 404:
+            raise NotFound(f"Not Found: {resp.url}")
+        resp.raise_for_status()
+        size = resp.headers.get("Content-Length")
+        etag = resp.headers.get("ETag", "").strip('"') or None
+        return (int(size) if size is not None else None), etag
+
+
+async def download(http, url_factory, out_path, size=None, max_retries=3, bandwidth=None):
+    """
+    Stream a remote file into out_path. A dropped connection resumes with a
+    Range request from the bytes already written. bandwidth: an optional
+    rate_limit.BandwidthGovernor the bytes read are paced by.
+    """
+    started = time.monotonic()
+    for attempt in range(max_retries):
+        offset = os.path.getsize(out_path) if os.path.exists(out_path) else 0
+        if size is not None and offset >= size:
+            break
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            async with http.get(url_factory(), headers=headers) as resp:
+                METRICS.inc("download_http_responses_total", code=resp.status)
+                if resp.status == 404:
+                    raise NotFound(f"Not Found: {resp.url}")
+                resp.raise_for_status()
+                if offset and resp.status != 206:
+                    offset = 0  # Range ignored - start over
+                with open(out_path, "r+b" if offset else "wb") as f:
+                    f.seek(offset)
+                    async for data in resp.content.iter_chunked(ASYNC_READ_SIZE):
+                        f.write(data)
+                        METRICS.inc("download_bytes_total", len(data))
+                        if bandwidth is not None:
+                            await bandwidth.acquire_async("ingress", len(data))
+            if size is None or os.path.getsize(out_path) >= size:
+                break
+            raise IOError(f"Connection closed at byte {os.path.getsize(out_path)} of {size}")
+        except NotFound:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            if attempt >= max_retries - 1:
+                raise
+            METRICS.inc("download_retries_total")
+            wait_time = 2 ** attempt
+            logger.warning(f"⚠️ שגיאה בהורדה (ניסיון {attempt + 1}/{max_retries}): {str(e)}. ממתין {wait_time} שניות...")
+            await asyncio.sleep(wait_time)
+    METRICS.observe("download_seconds", time.monotonic() - started)
+
+
+class FileSource:
+    """Upload source: a local file."""
+
+    allow_single_request = True
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    async def iter_range(self, start, end):
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining:
+                data = f.read(min(ASYNC_READ_SIZE, remaining))
+                if not data:
+                    raise IOError(f"{self.path} ended at byte {end - remaining}")
+                remaining -= len(data)
+                yield data
+
+    async def close(self):
+        pass
+
+
+class RemoteSource:
+    """
+    Upload source read straight from storage: one GET is piped into the
+    upload in order, and re-opened with a Range header whenever a chunk has
+    to be sent again.
+    """
+
+    allow_single_request = False
+
+    def __init__(self, http, url_factory, size, bandwidth=None):
+        self._http = http
+        self._url_factory = url_factory
+        self.size = size
+        self._bandwidth = bandwidth
+        self._resp = None
+        self._pos = 0
+
+    async def _open(self, offset):
+        await self.close()
+        resp = await self._http.get(self._url_factory(), headers={"Range": f"bytes={offset}-"} if offset else {})
+        METRICS.inc("download_http_responses_total", code=resp.status)
+        if resp.status == 404:
+            resp.release()
+            raise NotFound(f"Not Found: {resp.url}")
+        if resp.status >= 400 or (offset and resp.status != 206):
+            resp.release()
+            raise IOError(f"Source answered HTTP {resp.status} for bytes {offset}-")
+        self._resp = resp
+        self._pos = offset
+
+    async def iter_range(self, start, end):
+        if self._resp is None or self._pos != start:
+            await self._open(start)
+        try:
+            while self._pos < end:
+                data = await self._resp.content.read(min(ASYNC_READ_SIZE, end - self._pos))
+                if not data:
+                    raise IOError(f"Source closed the stream at byte {self._pos}")
+                self._pos += len(data)
+                METRICS.inc("download_bytes_total", len(data))
+                if self._bandwidth is not None:
+                    await self._bandwidth.acquire_async("ingress", len(data))
+                yield data
+        except BaseException:
+            await self.close()
+            raise
+
+    async def close(self):
+        if self._resp is not None:
+            self._resp.release()
+            self._resp = None
+
+
+class ResumableUpload:
+    """
+    One YouTube resumable upload over raw HTTP: a session POST, then PUTs of
+    chunks with Content-Range. After any failure YouTube is asked how much it
+    has (`Content-Range: bytes */size`) and the upload goes on from there.
+
+    Args:
+        auth: coroutine function auth(refresh=False) returning an access token
+        source: FileSource or RemoteSource
+        tuner: chunk_tuner.ChunkTuner picking the size of every chunk
+        bandwidth: optional rate_limit.BandwidthGovernor pacing the bytes sent
+    """
+
+    def __init__(self, http, upload_url, auth, metadata, source, mimetype, tuner, bandwidth=None):
+        self.http = http
+        self.upload_url = upload_url
+        self.auth = auth
+        self.metadata = metadata
+        self.source = source
+        self.size = source.size
+        self.mimetype = mimetype
+        self.tuner = tuner
+        self.bandwidth = bandwidth
+        self.uri = None
+        self.progress = 0
+
+    async def _request(self, method, url, headers=None, **kwargs):
+        """Send a request with the access token, refreshing it once on 401."""
+        for refresh in (False, True):
+            token = await self.auth(refresh)
+            # 308 is YouTube's "chunk received", not a redirect
+            resp = await self.http.request(
+                method, url, headers={"Authorization": f"Bearer {token}", **(headers or {})},
+                allow_redirects=False, **kwargs
+            )
+            if resp.status == 401 and not refresh and "data" not in kwargs:
+                resp.release()
+                continue
+            return resp
+
+    async def _error(self, resp):
+        content = await resp.text()
+        METRICS.inc("upload_http_errors_total", code=resp.status)
+        if is_quota_response(resp.status, content):
+            raise QuotaExceeded(content[:300])
+        raise UploadError(resp.status, content)
+
+    async def _outcome(self, resp):
+        async with resp:
+            if resp.status in (200, 201):
+                return "done", await resp.json(content_type=None)
+            if resp.status == 308:
+                committed = resp.headers.get("Range", "")
+                return "resume", int(committed.rsplit("-", 1)[1]) + 1 if committed else 0
+            await self._error(resp)
+
+    async def start(self):
+        resp = await self._request(
+            "POST",
+            self.upload_url,
+            params={"uploadType": "resumable", "part": "snippet,status"},
+            json=self.metadata,
+            headers={"X-Upload-Content-Length": str(self.size), "X-Upload-Content-Type": self.mimetype},
+        )
+        async with resp:
+            if resp.status != 200 or "Location" not in resp.headers:
+                await self._error(resp)
+            self.uri = resp.headers["Location"]
+
+    async def query(self):
+        """Ask YouTube for the committed offset: ("resume", offset), ("done", video) or (None, None)."""
+        resp = await self._request(
+            "PUT", self.uri, headers={"Content-Range": f"bytes */{self.size}", "Content-Length": "0"}
+        )
+        if resp.status in (404, 410):
+            resp.release()
+            return None, None
+        return await self._outcome(resp)
+
+    async def _put(self, end):
+        headers = {
+            "Content-Length": str(end - self.progress),
+            "Content-Range": f"bytes {self.progress}-{end - 1}/{self.size}",
+        }
+        body = self.source.iter_range(self.progress, end)
+        if self.bandwidth is not None:
+            body = self._paced(body)
+        resp = await self._request("PUT", self.uri, headers=headers, data=body)
+        return await self._outcome(resp)
+
+    async def _paced(self, body):
+        """The chunk body, released no faster than the egress limit allows."""
+        try:
+            async for data in body:
+                await self.bandwidth.acquire_async("egress", len(data))
+                yield data
+        finally:
+            await body.aclose()
+
+    def _chunk_size(self, limit=None):
+        size = self.tuner.size
+        if size == -1 and (self.progress or not self.source.allow_single_request):
+            size = self.tuner.chunk_size
+        if limit:
+            # As in the sync upload: at most about one second of the egress limit per chunk
+            cap = align_chunk(int(limit))
+            size = cap if size == -1 else min(size, cap)
+        return size
+
+    async def run(self, on_progress=None, max_retries=5):
+        """
+        Upload (or resume, when self.uri / self.progress are set) until YouTube
+        returns the video resource. on_progress(offset) is called after every
+        acknowledged chunk.
+        """
+        started = time.monotonic()
+        if self.uri is None:
+            await self.start()
+        retry_count = 0
+        needs_query = False
+        while True:
+            try:
+                if needs_query:
+                    outcome, value = await self.query()
+                    if outcome is None:
+                        raise UploadError(404, "Upload session expired")
+                    needs_query = False
+                else:
+                    limit = self.bandwidth.limit("egress") if self.bandwidth is not None else None
+                    chunk_size = self._chunk_size(limit)
+                    end = self.size if chunk_size == -1 else min(self.progress + chunk_size, self.size)
+                    chunk_started = time.monotonic()
+                    outcome, value = await self._put(end)
+                    # Paced chunks say nothing about the line rate
+                    if not limit:
+                        sent = (self.size if outcome == "done" else value) - self.progress
+                        self.tuner.record(sent, time.monotonic() - chunk_started, chunk_size)
+            except QuotaExceeded:
+                raise
+            except (UploadError, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                # 5xx and network errors are retried; so is a 401 (expired token) that hit a PUT
+                if isinstance(e, UploadError) and e.status < 500 and e.status != 401:
+                    raise
+                retry_count += 1
+                self.tuner.failed()
+                if retry_count >= max_retries:
+                    logger.error(f"❌ ההעלאה נכשלה לאחר {max_retries} ניסיונות: {str(e)}")
+                    raise
+                METRICS.inc("upload_retries_total")
+                wait_time = min(2 ** retry_count, 60)
+                logger.warning(f"⚠️ שגיאה בהעלאה (ניסיון {retry_count}/{max_retries}): {str(e)}. ממתין {wait_time} שניות...")
+                await asyncio.sleep(wait_time)
+                needs_query = True
+                continue
+
+            if outcome == "done":
+                METRICS.inc("upload_bytes_total", self.size - self.progress)
+                self.progress = self.size
+                METRICS.observe("upload_seconds", time.monotonic() - started)
+                return value
+            METRICS.inc("upload_bytes_total", value - self.progress)
+            self.progress = value
+            if on_progress is not None:
+                on_progress(value)
@@ -0,0 +1,453 @@
+"""
+Local stand-ins for the services the uploader talks to.
+
+- FakeSwift: Cloud Files temp-URL downloads (HMAC-checked, Range, bandwidth
+  and latency limits), Identity auth, object DELETE, bulk-delete and
+  container listings
+- FakeYouTube: the resumable videos.insert protocol, with injectable 5xx and
+  quota errors, and the channels / playlistItems / videos list calls over
+  the videos it received
+- FakeSite: update_provider.php (GET and batched POST)
+
+Every server runs in a daemon thread on 127.0.0.1 and a free port.
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+BLOCK_BYTES = 64 * 1024
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop streams they no longer need (e.g. a re-opened Range read)
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+class _Server:
+    """Base class: serve a BaseHTTPRequestHandler subclass in a background thread."""
+
+    def __init__(self, handler):
+        self.httpd = _HTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.service = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status, body=b"", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+            headers = {"Content-Type": "application/json", **(headers or {})}
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+
+# --- Cloud Files ------------------------------------------------------------------
+
+
+class FakeSwift(_Server):
+    """
+    Cloud Files stand-in.
+
+    Objects are synthetic: `objects` maps an object name (inside `container`)
+    to its size, and the bytes are a pattern derived from the name, so nothing
+    is held in memory. Downloads must carry a valid temp_url_sig computed the
+    way generate_storage_url does.
+    """
+
+    def __init__(self, objects, temp_url_key, account="AUTH_bench", container="videos",
+                 bandwidth=None, latency=0.0):
+        self.objects = dict(objects)
+        self.temp_url_key = temp_url_key
+        self.account = account
+        self.container = container
+        self.bandwidth = bandwidth  # bytes per second per connection
+        self.latency = latency  # seconds before each response
+        self.token = uuid.uuid4().hex
+        self.deleted = 0
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+        super().__init__(_SwiftHandler)
+
+    @property
+    def path_base(self):
+        """STORAGE_PATH_BASE for generate_storage_url."""
+        return f"/v1/{self.account}/{self.container}"
+
+    @property
+    def auth_url(self):
+        return f"{self.url}/v2.0/tokens"
+
+    def etag(self, name):
+        return hashlib.md5(f"{name}:{self.objects[name]}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def block(name):
+        seed = hashlib.sha1(name.encode("utf-8")).digest()
+        return (seed * (BLOCK_BYTES // len(seed) + 1))[:BLOCK_BYTES]
+
+    def content(self, name, start, end):
+        """Yield the bytes [start, end] of an object."""
+        block = self.block(name)
+        pos = start
+        while pos <= end:
+            offset = pos % BLOCK_BYTES
+            piece = block[offset:offset + min(BLOCK_BYTES - offset, end - pos + 1)]
+            yield piece
+            pos += len(piece)
+
+    def valid_signature(self, path, query):
+        try:
+            signature = query["temp_url_sig"][0]
+            expires = int(query["temp_url_expires"][0])
+        except (KeyError, ValueError):
+            return False
+        if expires < time.time():
+            return False
+        expected = hmac.new(
+            self.temp_url_key.encode("utf-8"), f"GET\n{expires}\n{path}".encode("utf-8"), hashlib.sha1
+        ).hexdigest()
+        return hmac.compare_digest(signature, expected)
+
+
+class _SwiftHandler(_Handler):
+    def _object_name(self, path):
+        prefix = self.service.path_base + "/"
+        return unquote(path[len(prefix):]) if path.startswith(prefix) else None
+
+    def _authorized(self):
+        return self.headers.get("X-Auth-Token") == self.service.token
+
+    def do_POST(self):
+        swift = self.service
+        parsed = urlparse(self.path)
+        body = self._body()
+        if parsed.path == "/v2.0/tokens":
+            expires = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 24 * 3600))
+            self._reply(200, {
+                "access": {
+                    "token": {"id": swift.token, "expires": expires},
+                    "serviceCatalog": [{
+                        "type": "object-store",
+                        "endpoints": [{"region": "LON", "publicURL": f"{swift.url}/v1/{swift.account}"}],
+                    }],
+                }
+            })
+            return
+        if parsed.query == "bulk-delete":
+            if not self._authorized():
+                self._reply(401)
+                return
+            deleted = not_found = 0
+            for line in body.decode("utf-8").splitlines():
+                # Each line is "<container>/<object>", URL-encoded
+                container, _, name = unquote(line.strip()).lstrip("/").partition("/")
+                with swift._lock:
+                    if container == swift.container and swift.objects.pop(name, None) is not None:
+                        deleted += 1
+                    else:
+                        not_found += 1
+            with swift._lock:
+                swift.deleted += deleted
+            self._reply(200, {
+                "Number Deleted": deleted, "Number Not Found": not_found,
+                "Response Status": "200 OK", "Response Body": "", "Errors": [],
+            })
+            return
+        self._reply(404)
+
+    def do_DELETE(self):
+        swift = self.service
+        if not self._authorized():
+            self._reply(401)
+            return
+        name = self._object_name(urlparse(self.path).path)
+        with swift._lock:
+            found = name is not None and swift.objects.pop(name, None) is not None
+            swift.deleted += found
+        self._reply(204 if found else 404)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        swift = self.service
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        if swift.latency:
+            time.sleep(swift.latency)
+
+        if parsed.path == f"/v1/{swift.account}/{swift.container}":
+            self._listing(query)
+            return
+
+        name = self._object_name(parsed.path)
+        if name is None or not swift.valid_signature(unquote(parsed.path), query):
+            self._reply(401)
+            return
+        size = swift.objects.get(name)
+        if size is None:
+            self._reply(404)
+            return
+
+        start, end, status = 0, size - 1, 200
+        byte_range = self.headers.get("Range", "")
+        if byte_range.startswith("bytes="):
+            first, _, last = byte_range[6:].partition("-")
+            start = int(first or 0)
+            end = min(int(last), size - 1) if last else size - 1
+            status = 206
+        headers = {"Content-Length": str(end - start + 1), "Accept-Ranges": "bytes", "ETag": f'"{swift.etag(name)}"'}
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+
+        started = time.monotonic()
+        sent = 0
+        try:
+            for piece in swift.content(name, start, end):
+                self.wfile.write(piece)
+                sent += len(piece)
+                if swift.bandwidth:
+                    ahead = sent / swift.bandwidth - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        with swift._lock:
+            swift.bytes_served += sent
+
+    def _listing(self, query):
+        swift = self.service
+        if not self._authorized():
+            self._reply(401)
+            return
+        prefix = query.get("prefix", [""])[0]
+        marker = query.get("marker", [""])[0]
+        limit = int(query.get("limit", ["10000"])[0])
+        with swift._lock:
+            names = sorted(name for name in swift.objects if name.startswith(prefix) and name > marker)
+        page = [
+            {"name": name, "bytes": swift.objects[name], "hash": swift.etag(name),
+             "content_type": "video/mp4", "last_modified": "2024-01-01T00:00:00.000000"}
+            for name in itertools.islice(names, limit)
+        ]
+        if not page:
+            self._reply(204)
+            return
+        self._reply(200, page)
+
+
+# --- YouTube ----------------------------------------------------------------------
+
+
+class FakeYouTube(_Server):
+    """
+    Resumable upload endpoint of videos.insert.
+
+    error_rate is the chance that a chunk is answered with 503;
+    quota_after makes every upload after that many completed ones fail
+    with a quotaExceeded 403.
+    """
+
+    def __init__(self, error_rate=0.0, quota_after=None, seed=0):
+        self.error_rate = error_rate
+        self.quota_after = quota_after
+        self.sessions = {}
+        self.completed = 0
+        self.bytes_received = 0
+        self.largest_chunk = 0
+        self.errors_injected = 0
+        self.videos = []  # (video id, snippet), oldest first
+        self.list_calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        super().__init__(_YouTubeHandler)
+
+    @property
+    def api_endpoint(self):
+        """client_options api_endpoint for googleapiclient.discovery.build."""
+        return f"{self.url}/"
+
+
+class _YouTubeHandler(_Handler):
+    def _quota_error(self):
+        self._reply(403, {"error": {"code": 403, "message": "quota", "errors": [{"reason": "quotaExceeded"}]}})
+
+    def do_POST(self):
+        youtube = self.service
+        parsed = urlparse(self.path)
+        body = self._body()
+        if not parsed.path.endswith("/videos") or "resumable" not in parsed.query:
+            self._reply(404)
+            return
+        with youtube._lock:
+            if youtube.quota_after is not None and youtube.completed >= youtube.quota_after:
+                self._quota_error()
+                return
+            session = uuid.uuid4().hex
+            size = int(self.headers.get("X-Upload-Content-Length") or 0)
+            youtube.sessions[session] = {"size": size, "received": 0, "meta": json.loads(body or b"{}")}
+        self._reply(200, headers={"Location": f"{youtube.url}/upload/session/{session}"})
+
+    def do_PUT(self):
+        youtube = self.service
+        session_id = urlparse(self.path).path.rsplit("/", 1)[-1]
+        body = self._body()
+        with youtube._lock:
+            session = youtube.sessions.get(session_id)
+        if session is None:
+            self._reply(404)
+            return
+
+        content_range = self.headers.get("Content-Range", "")
+        total = content_range.rsplit("/", 1)[-1]
+        if total.isdigit():
+            session["size"] = int(total)
+
+        if body:
+            with youtube._lock:
+                inject = youtube._random.random() < youtube.error_rate
+                if inject:
+                    youtube.errors_injected += 1
+            if inject:
+                self._reply(503, {"error": {"code": 503, "message": "backendError"}})
+                return
+            start = int(content_range[6:].split("-", 1)[0])
+            if start == session["received"]:
+                session["received"] += len(body)
+                with youtube._lock:
+                    youtube.bytes_received += len(body)
+                    youtube.largest_chunk = max(youtube.largest_chunk, len(body))
+
+        if session["size"] and session["received"] >= session["size"]:
+            video_id = f"vid{uuid.uuid4().hex[:11]}"
+            with youtube._lock:
+                youtube.completed += 1
+                youtube.sessions.pop(session_id, None)
+                youtube.videos.append((video_id, session["meta"].get("snippet", {})))
+            self._reply(200, {"kind": "youtube#video", "id": video_id})
+            return
+        headers = {"Range": f"bytes=0-{session['received'] - 1}"} if session["received"] else {}
+        self._reply(308, headers=headers)
+
+    def do_GET(self):
+        youtube = self.service
+        parsed = urlparse(self.path)
+        query = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+        with youtube._lock:
+            youtube.list_calls += 1
+            videos = list(reversed(youtube.videos))  # the uploads playlist is newest first
+        if parsed.path.endswith("/channels"):
+            self._reply(200, {"items": [{"id": "UCbench", "contentDetails": {"relatedPlaylists": {"uploads": "UUbench"}}}]})
+        elif parsed.path.endswith("/playlistItems"):
+            start = int(query.get("pageToken") or 0)
+            end = start + int(query.get("maxResults") or 5)
+            page = {"items": [{"contentDetails": {"videoId": video_id}} for video_id, _ in videos[start:end]]}
+            if end < len(videos):
+                page["nextPageToken"] = str(end)
+            self._reply(200, page)
+        elif parsed.path.endswith("/videos") and "id" in query and "maxResults" in query:
+            # Like the real API: maxResults is only for the filters that page
+            self._reply(400, {"error": {"code": 400, "message": "maxResults is not supported with id",
+                                        "errors": [{"reason": "incompatibleParameters"}]}})
+        elif parsed.path.endswith("/videos"):
+            snippets = dict(videos)
+            ids = [video_id for video_id in query.get("id", "").split(",") if video_id in snippets]
+            self._reply(200, {"items": [
+                {"id": video_id, "snippet": snippets[video_id], "status": {"uploadStatus": "processed"}}
+                for video_id in ids
+            ]})
+        else:
+            self._reply(404)
+
+
+# --- Site ------------------------------------------------------------------------
+
+
+class FakeSite(_Server):
+    """update_provider.php: GET ?id=&youtube_url= and POST {"items": [...]}."""
+
+    def __init__(self):
+        self.updates = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        super().__init__(_SiteHandler)
+
+    @property
+    def endpoint(self):
+        return f"{self.url}/update_provider.php"
+
+
+class _SiteHandler(_Handler):
+    def do_GET(self):
+        site = self.service
+        query = parse_qs(urlparse(self.path).query)
+        csv_id = query.get("id", [""])[0]
+        youtube_url = query.get("youtube_url", [""])[0]
+        if not csv_id or not youtube_url:
+            self._reply(400, {"ok": False, "error": "missing_parameters"})
+            return
+        with site._lock:
+            site.requests += 1
+            site.updates[csv_id] = youtube_url
+        self._reply(200, {"ok": True, "id": int(csv_id), "youtube_url": youtube_url})
+
+    def do_POST(self):
+        site = self.service
+        items = json.loads(self._body() or b"{}").get("items", [])
+        results = {}
+        with site._lock:
+            site.requests += 1
+            for item in items:
+                site.updates[str(item["id"])] = item["youtube_url"]
+                results[str(item["id"])] = "updated"
+        self._reply(200, {"ok": True, "updated": len(results), "results": results})
+
+
+def object_url_path(name):
+    """CSV `url` value of an object name (unencoded, like the real CSV)."""
+    return "/" + name
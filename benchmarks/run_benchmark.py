@@ -0,0 +1,288 @@
+"""
+End-to-end throughput benchmark of youtube_uploader.main() and
+cleanup_remote_files.main(), run against local fake services
+(see fake_services.py). Nothing leaves the machine.
+
+Examples:
+    python benchmarks/run_benchmark.py --rows 20 --size-mb 8
+    python benchmarks/run_benchmark.py --rows 50 --mode pipeline --bandwidth-mbps 40 --latency-ms 30
+    python benchmarks/run_benchmark.py --source stream --error-rate 0.05 --json result.json
+    python benchmarks/run_benchmark.py --rows 50 --mode async --bandwidth-mbps 40 --latency-ms 30
+    python benchmarks/run_benchmark.py --rows 60 --workers 3 --bandwidth-mbps 40
+    python benchmarks/run_benchmark.py --rows 200 --reconcile
+    python benchmarks/run_benchmark.py --rows 50 --inline-cleanup --latency-ms 30
+    python benchmarks/run_benchmark.py --rows 20 --mode async --limit-mbps 40
+
+Reports rows/min, MB/s and the peak RSS of the process. The fake servers run
+inside the same process, so the RSS includes them (they stream synthetic data
+and hold no file contents). With --workers, the upload stage runs that many
+forked uploader processes in multi-node mode (POSIX only); their RSS is not
+included. --reconcile then throws the run's state away (as if it crashed
+before anything was journaled) and times `youtube_uploader.py reconcile`.
+With --inline-cleanup the uploader deletes the objects itself
+(REMOTE_CLEANUP_ENABLED); the cleanup stage then shows what was left.
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_services import FakeSite, FakeSwift, FakeYouTube, object_url_path  # noqa: E402
+
+MIB = 1024 * 1024
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB on Linux
+    return round(peak / MIB if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def build_objects(args):
+    return {f"bench/lesson {i:05d}.mp4": int(args.size_mb * MIB) for i in range(args.rows - args.missing)}
+
+
+def write_csv(path, objects, missing):
+    names = list(objects) + [f"bench/missing {i:05d}.mp4" for i in range(missing)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "url", "length", "title", "added", "cat", "rabi", "uploaded", "youtube_url"])
+        for i, name in enumerate(names):
+            writer.writerow([
+                10000 + i, object_url_path(name), "10:00",
+                f"שיעור {i + 1}", "7/2/2023 0:00", "בדיקת ביצועים", "הרב בודק", "", "",
+            ])
+
+
+def configure_uploader(uploader, swift, youtube, site, args):
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+
+    # The upload URL comes from the discovery document's rootUrl, so point that at the fake
+    document = get_static_doc("youtube", "v3").replace("https://youtube.googleapis.com/", youtube.api_endpoint)
+
+    uploader.STORAGE_BASE = swift.url
+    uploader.STORAGE_PATH_BASE = swift.path_base
+    uploader.STORAGE_KEY = swift.temp_url_key
+    uploader.UPDATE_PROVIDER_ENDPOINT = site.endpoint
+    uploader.BASE_WEBSITE_URL = f"{site.url}/lesson/"
+    uploader.RUN_MODE = args.mode
+    uploader.YOUTUBE_UPLOAD_URL = f"{youtube.url}/upload/youtube/v3/videos"
+    uploader.UPLOAD_SOURCE = args.source
+    uploader.PROVIDER_BATCH_SIZE = args.provider_batch
+    uploader.PREFLIGHT_ENABLED = args.preflight
+    uploader.UPLOAD_CHUNK_SIZE = args.chunk_mb * MIB
+    uploader.UPLOAD_CHUNK_ADAPTIVE = not args.fixed_chunks
+    uploader.UPLOAD_SINGLE_REQUEST_AFTER = args.single_request_after
+    uploader.REMOTE_CLEANUP_ENABLED = args.inline_cleanup
+    uploader.DEDUP_ENABLED = args.dedup
+    if args.limit_mbps:
+        limit = args.limit_mbps * 1000 * 1000 / 8
+        uploader.BANDWIDTH_SCHEDULE = [("00:00", limit, limit)]
+    uploader.YOUTUBE_CREDENTIALS = [
+        {"name": "bench", "token_file": "", "client_secrets": "", "daily_quota": 10 ** 9},
+    ]
+
+    uploader.load_youtube_credentials = lambda *a, **k: Credentials(token="bench")
+    uploader.build_youtube = lambda creds: build_from_document(document, credentials=creds)
+
+
+def configure_cleanup(cleanup, swift, args):
+    cleanup.AUTH_URL = swift.auth_url
+    cleanup.USERNAME = "bench"
+    cleanup.API_KEY = "bench"
+    cleanup.CONTAINER_NAME = swift.container
+    cleanup.RUN_MODE = "async" if args.mode == "async" else "threads"
+    cleanup.USE_BULK_DELETE = not args.single_deletes
+
+
+def run_workers(uploader, workers):
+    """Upload stage as `workers` processes sharing videos.csv and the state database."""
+    def worker(worker_id):
+        # The workers share DOWNLOAD_FOLDER; each one caches in its own subfolder
+        uploader.WORKER_ID = worker_id
+        uploader.main()
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=worker, args=(f"bench-{i}",)) for i in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    failed = [process.exitcode for process in processes if process.exitcode]
+    if failed:
+        raise RuntimeError(f"{len(failed)} workers failed (exit codes {failed})")
+
+
+def run_stage(name, func):
+    started = time.monotonic()
+    error = None
+    try:
+        func()
+    except SystemExit as e:
+        error = f"exit {e.code}"
+    except Exception as e:  # reported, the other stage still runs
+        error = f"{type(e).__name__}: {e}"
+    return {"stage": name, "seconds": round(time.monotonic() - started, 3), "error": error}
+
+
+def count_uploaded(csv_path):
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        return sum(1 for row in csv.DictReader(f) if row.get("uploaded", "").strip().lower() == "yes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10, help="CSV rows (default 10)")
+    parser.add_argument("--missing", type=int, default=0, help="rows whose file does not exist on storage")
+    parser.add_argument("--size-mb", type=float, default=4, help="size of every video (default 4 MiB)")
+    parser.add_argument("--chunk-mb", type=int, default=8, help="UPLOAD_CHUNK_SIZE in MiB (default 8)")
+    parser.add_argument("--fixed-chunks", action="store_true", help="disable UPLOAD_CHUNK_ADAPTIVE")
+    parser.add_argument("--single-request-after", type=int, default=None, help="UPLOAD_SINGLE_REQUEST_AFTER")
+    parser.add_argument("--bandwidth-mbps", type=float, default=None,
+                        help="storage bandwidth per connection, in megabits per second (default unlimited)")
+    parser.add_argument("--limit-mbps", type=float, default=None,
+                        help="uploader BANDWIDTH_SCHEDULE limit for downloads and uploads, all day (Mbit/s)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="storage latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="chance of a 503 per upload chunk")
+    parser.add_argument("--quota-after", type=int, default=None, help="quotaExceeded after N uploads")
+    parser.add_argument("--mode", choices=["sequential", "pipeline", "async"], default="sequential")
+    parser.add_argument("--source", choices=["disk", "stream"], default="disk")
+    parser.add_argument("--provider-batch", type=int, default=0, help="PROVIDER_BATCH_SIZE (default 0)")
+    parser.add_argument("--preflight", action="store_true", help="enable PREFLIGHT_ENABLED")
+    parser.add_argument("--workers", type=int, default=1, help="uploader processes in multi-node mode (default 1)")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="forget the upload state and recover it with the reconcile command")
+    parser.add_argument("--inline-cleanup", action="store_true", help="enable REMOTE_CLEANUP_ENABLED")
+    parser.add_argument("--dedup", action="store_true", help="enable DEDUP_ENABLED")
+    parser.add_argument("--single-deletes", action="store_true", help="cleanup without bulk-delete")
+    parser.add_argument("--skip-cleanup", action="store_true", help="do not run cleanup_remote_files.main()")
+    parser.add_argument("--workdir", help="keep the run files here (default: a temporary folder)")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' log output")
+    args = parser.parse_args(argv)
+    args.missing = min(args.missing, args.rows)
+
+    if not args.verbose:
+        os.environ.setdefault("TQDM_DISABLE", "1")
+
+    objects = build_objects(args)
+    bandwidth = args.bandwidth_mbps * 1000 * 1000 / 8 if args.bandwidth_mbps else None
+    swift = FakeSwift(objects, temp_url_key="bench-key", bandwidth=bandwidth, latency=args.latency_ms / 1000)
+    youtube = FakeYouTube(error_rate=args.error_rate, quota_after=args.quota_after)
+    site = FakeSite()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="uploader-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        write_csv("videos.csv", objects, args.missing)
+
+        # Imported after chdir: both scripts open their log files on import
+        import youtube_uploader
+        import cleanup_remote_files
+        from metrics import METRICS
+
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+        configure_uploader(youtube_uploader, swift, youtube, site, args)
+        configure_cleanup(cleanup_remote_files, swift, args)
+
+        deleted_before = swift.deleted
+        if args.workers > 1:
+            upload = run_stage("upload", lambda: run_workers(youtube_uploader, args.workers))
+        else:
+            upload = run_stage("upload", youtube_uploader.main)
+        upload["peak_rss_mb"] = peak_rss_mb()
+        uploaded = count_uploaded("videos.csv")
+        upload["rows_uploaded"] = uploaded
+        upload["rows_per_minute"] = round(uploaded / upload["seconds"] * 60, 2) if upload["seconds"] else None
+        upload["download_mb_per_second"] = round(swift.bytes_served / MIB / upload["seconds"], 2)
+        upload["upload_mb_per_second"] = round(youtube.bytes_received / MIB / upload["seconds"], 2)
+        upload["videos_created"] = youtube.completed
+        upload["largest_chunk_mb"] = round(youtube.largest_chunk / MIB, 2)
+        upload["errors_injected"] = youtube.errors_injected
+        upload["site_requests"] = site.requests
+        upload["objects_deleted"] = swift.deleted - deleted_before
+        upload["metrics"] = METRICS.summary()
+
+        stages = [upload]
+        if args.reconcile:
+            write_csv("videos.csv", objects, args.missing)
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(youtube_uploader.STATE_DB_FILE + suffix):
+                    os.remove(youtube_uploader.STATE_DB_FILE + suffix)
+            calls_before = youtube.list_calls
+            reconcile = run_stage("reconcile", lambda: youtube_uploader.main("reconcile"))
+            reconcile["rows_backfilled"] = count_uploaded("videos.csv")
+            reconcile["api_calls"] = youtube.list_calls - calls_before
+            reconcile["rows_per_minute"] = (
+                round(reconcile["rows_backfilled"] / reconcile["seconds"] * 60, 2) if reconcile["seconds"] else None
+            )
+            reconcile["peak_rss_mb"] = peak_rss_mb()
+            stages.append(reconcile)
+        if not args.skip_cleanup:
+            deleted_before = swift.deleted
+            cleanup = run_stage("cleanup", cleanup_remote_files.main)
+            cleanup["peak_rss_mb"] = peak_rss_mb()
+            cleanup["objects_deleted"] = swift.deleted - deleted_before
+            cleanup["rows_per_minute"] = (
+                round(cleanup["objects_deleted"] / cleanup["seconds"] * 60, 2) if cleanup["seconds"] else None
+            )
+            stages.append(cleanup)
+    finally:
+        os.chdir(previous_dir)
+        for server in (swift, youtube, site):
+            server.close()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("json", "verbose")},
+        "workdir": workdir,
+        "stages": stages,
+    }
+
+    for stage in stages:
+        line = f"{stage['stage']:8} {stage['seconds']:8.2f}s  {stage.get('rows_per_minute')} rows/min"
+        if stage["stage"] == "upload":
+            line += (
+                f"  download {stage['download_mb_per_second']} MB/s"
+                f"  upload {stage['upload_mb_per_second']} MB/s"
+                f"  ({stage['rows_uploaded']}/{args.rows} rows uploaded, {stage['videos_created']} videos created"
+                f", {stage['objects_deleted']} objects deleted)"
+            )
+        elif stage["stage"] == "reconcile":
+            line += f"  ({stage['rows_backfilled']}/{args.rows} rows backfilled with {stage['api_calls']} API calls)"
+        else:
+            line += f"  ({stage['objects_deleted']} objects deleted)"
+        line += f"  peak RSS {stage['peak_rss_mb']} MB"
+        if stage["error"]:
+            line += f"  ERROR: {stage['error']}"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Startup cost of the scripts, each case measured in fresh interpreters:
+
+- import:     `import youtube_uploader` / `import cleanup_remote_files`
+- build:      first build_youtube() of a process, without and with the cached
+              discovery document (DISCOVERY_CACHE_FILE), next to a plain
+              googleapiclient build("youtube", "v3")
+- idle run:   youtube_uploader.main() on a CSV with nothing pending (a cron
+              run that finds no work)
+
+Examples:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --repeat 20 --json startup.json
+
+Reports the median and best time of every case and the heavy packages it
+loaded (Google client libraries, aiohttp, tqdm, pandas).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+HEAVY_PACKAGES = ("google", "googleapiclient", "google_auth_oauthlib", "aiohttp", "tqdm", "pandas", "asyncio")
+
+# Run by every child interpreter: {setup} then {timed}; prints a JSON result
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+{setup}
+started = time.perf_counter()
+{timed}
+seconds = time.perf_counter() - started
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+CASES = {
+    "import youtube_uploader": ("", "import youtube_uploader"),
+    "import cleanup_remote_files": ("", "import cleanup_remote_files"),
+    # googleapiclient is imported in the setup: only building the service is timed
+    "build_youtube (no cache)": (
+        "import os, youtube_uploader, googleapiclient.discovery\n"
+        "from google.oauth2.credentials import Credentials\n"
+        "if os.path.exists(youtube_uploader.DISCOVERY_CACHE_FILE): os.remove(youtube_uploader.DISCOVERY_CACHE_FILE)",
+        "youtube_uploader.build_youtube(Credentials(token='bench'))",
+    ),
+    "build_youtube (cached)": (
+        "import youtube_uploader, googleapiclient.discovery\nfrom google.oauth2.credentials import Credentials",
+        "youtube_uploader.build_youtube(Credentials(token='bench'))",
+    ),
+    "build('youtube', 'v3')": (
+        "import googleapiclient.discovery\nfrom google.oauth2.credentials import Credentials",
+        "googleapiclient.discovery.build('youtube', 'v3', credentials=Credentials(token='bench'))",
+    ),
+    "idle run": ("", "import youtube_uploader\nyoutube_uploader.main()"),
+}
+
+
+def write_idle_csv(path, rows=1000):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,url,length,title,added,cat,rabi,uploaded,youtube_url\n")
+        for i in range(rows):
+            f.write(f"{i},bench/{i}.mp4,10:00,שיעור {i},7/2/2023 0:00,בדיקה,הרב,yes,https://www.youtube.com/watch?v={i}\n")
+
+
+def run_case(setup, timed, workdir):
+    code = CHILD.format(root=REPO_ROOT, setup=setup, timed=timed, heavy=HEAVY_PACKAGES)
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=workdir, capture_output=True, text=True, check=True
+    ).stdout
+    wall = time.perf_counter() - started
+    result = json.loads(out.strip().splitlines()[-1])
+    result["wall"] = wall
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7, help="interpreters per case (default 7)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="uploader-startup-")
+    write_idle_csv(os.path.join(workdir, "videos.csv"))
+    report = {}
+    for name, (setup, timed) in CASES.items():
+        results = [run_case(setup, timed, workdir) for _ in range(args.repeat)]
+        timings = [r["seconds"] * 1000 for r in results]
+        walls = [r["wall"] * 1000 for r in results]
+        report[name] = {
+            "median_ms": round(statistics.median(timings), 1),
+            "best_ms": round(min(timings), 1),
+            "process_wall_median_ms": round(statistics.median(walls), 1),
+            "heavy_packages": results[-1]["heavy"],
+        }
+        print(
+            f"{name:30} {report[name]['median_ms']:8.1f} ms median  {report[name]['best_ms']:8.1f} ms best  "
+            f"(process {report[name]['process_wall_median_ms']:.0f} ms)  loaded: {', '.join(results[-1]['heavy']) or '-'}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"repeat": args.repeat, "workdir": workdir, "cases": report}, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Resumable upload chunks must be a multiple of 256 KiB (except the last one)
+CHUNK_ALIGN = 256 * 1024
+# A bigger chunk size is kept only if it is at least this much faster
+GROWTH_MARGIN = 0.05
+# Weight of the newest measurement in the per-size throughput average
+RATE_SMOOTHING = 0.3
+
+
+def align_chunk(size):
+    return max(CHUNK_ALIGN, size // CHUNK_ALIGN * CHUNK_ALIGN)
+
+
+class ChunkTuner:
+    """
+    Chooses the chunk size of resumable uploads at runtime.
+
+    The size doubles while full chunks keep getting faster, steps back (and
+    stops growing past that size) when throughput drops, and halves after a
+    failed chunk so a retry re-sends less. After `single_request_after`
+    error-free chunks in a row, size is -1: the rest of the file goes in one
+    request. Shared by all upload workers.
+    """
+
+    def __init__(self, initial, minimum, maximum, single_request_after=None, ceiling=None):
+        self._lock = threading.Lock()
+        self.minimum = align_chunk(minimum)
+        self.maximum = align_chunk(max(maximum, minimum))
+        self.single_request_after = single_request_after
+        self._size = self._clamp(initial)
+        self._ceiling = ceiling
+        self._rates = {}
+        self._clean = 0
+        self.errors = 0
+
+    @classmethod
+    def from_stats(cls, stats, initial, minimum, maximum, single_request_after=None):
+        """Start from the chunk size a previous run settled on (see stats())."""
+        if stats and stats.get("chunk_size"):
+            initial = stats["chunk_size"]
+            logger.info(f"📐 גודל מקטע התחלתי מהריצה הקודמת: {initial / (1024*1024):.2f} MB")
+        return cls(initial, minimum, maximum, single_request_after, ceiling=(stats or {}).get("ceiling"))
+
+    def _clamp(self, size):
+        return min(max(align_chunk(size), self.minimum), self.maximum)
+
+    @property
+    def size(self):
+        """Chunk size for the next request, or -1 for the rest of the file in one request."""
+        with self._lock:
+            if self.single_request_after and self._clean >= self.single_request_after:
+                return -1
+            return self._size
+
+    @property
+    def chunk_size(self):
+        """Current chunk size, ignoring single-request mode."""
+        with self._lock:
+            return self._size
+
+    def record(self, nbytes, seconds, chunk_size):
+        """A chunk of chunk_size was sent: nbytes were acknowledged in seconds."""
+        if chunk_size <= 0 or nbytes < chunk_size or seconds <= 0:
+            # Last (short) chunk or a single-request upload - nothing to learn
+            with self._lock:
+                self._clean += 1
+            return
+        rate = nbytes / seconds
+        with self._lock:
+            self._clean += 1
+            previous = self._rates.get(chunk_size)
+            self._rates[chunk_size] = rate if previous is None else previous + (rate - previous) * RATE_SMOOTHING
+            if chunk_size != self._size:
+                return
+
+            smaller = self._rates.get(self._clamp(chunk_size // 2))
+            if smaller is not None and chunk_size > self.minimum and self._rates[chunk_size] < smaller:
+                # Growing made it slower - step back and stay below this size
+                self._ceiling = chunk_size
+                self._size = self._clamp(chunk_size // 2)
+                logger.info(f"📐 גודל מקטע ירד ל-{self._size / (1024*1024):.2f} MB (תפוקה נמוכה יותר)")
+                return
+
+            bigger = self._clamp(chunk_size * 2)
+            if bigger > chunk_size and (self._ceiling is None or bigger < self._ceiling):
+                bigger_rate = self._rates.get(bigger)
+                if bigger_rate is None or bigger_rate > self._rates[chunk_size] * (1 + GROWTH_MARGIN):
+                    self._size = bigger
+                    logger.info(f"📐 גודל מקטע גדל ל-{self._size / (1024*1024):.2f} MB")
+
+    def failed(self):
+        """A chunk failed: halve the chunk size and leave single-request mode."""
+        with self._lock:
+            self.errors += 1
+            self._clean = 0
+            self._size = self._clamp(self._size // 2)
+            logger.info(f"📐 גודל מקטע ירד ל-{self._size / (1024*1024):.2f} MB אחרי שגיאה")
+
+    def stats(self):
+        """Summary saved for the next run's starting size."""
+        with self._lock:
+            return {
+                "chunk_size": self._size,
+                "ceiling": self._ceiling,
+                "errors": self.errors,
+                "rates": {str(size): round(rate) for size, rate in sorted(self._rates.items())},
+            }
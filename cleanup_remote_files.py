@@ -1,13 +1,23 @@
+import json
 import logging
 import os
 import sys
+import threading
 import time
-from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, Optional
 
-import pandas as pd
 import requests
 from requests import Response
-from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote, unquote
+
+from metrics import METRICS, start_metrics_server
+from rate_limit import TokenBucket
+from row_source import CsvRowSource
+from state_store import StateStore
 
 CSV_FILE = "videos.csv"
 LOG_FILE = "cleanup_log.log"
@@ -19,11 +29,44 @@ API_KEY = ""
 # Container (folder) holding the videos
 CONTAINER_NAME = "ateretMordecay"
 
+# Cached auth token / storage URL, reused until shortly before it expires
+TOKEN_CACHE_FILE = "rackspace_token.json"
+TOKEN_REFRESH_MARGIN_SECONDS = 600
+
+# State database shared with youtube_uploader.py - keep these equal to its
+# STATE_DB_FILE / STATE_DB_JOURNAL_MODE ("DELETE" on NFS/SMB) and LEASE_SECONDS
+STATE_DB_FILE = "videos_state.db"
+STATE_DB_JOURNAL_MODE = "WAL"
+# An uploader worker counts as running until this long after its last heartbeat
+LEASE_SECONDS = 300
+
 # Column name to mark deletion status
 DELETED_COLUMN = "remote_deleted"
 
-# Time to sleep between delete requests to avoid throttling
-DELETE_DELAY_SECONDS = 0.5
+# Number of delete requests in flight at once
+DELETE_CONCURRENCY = 8
+# Max delete requests per second (token bucket shared by all workers)
+DELETE_RATE_PER_SECOND = 10.0
+# Retries of a single delete answered with 429/503
+DELETE_THROTTLE_RETRIES = 5
+
+# "threads" or "async" (needs aiohttp): single deletes run as coroutines over
+# one connection pool instead of a thread pool. Bulk-delete is unchanged
+RUN_MODE = "threads"
+# Rows handed to one asyncio run at a time in async mode
+ASYNC_DELETE_ROWS = 1000
+
+# Use the Swift bulk-delete middleware (falls back to single deletes if missing)
+USE_BULK_DELETE = True
+# Swift accepts up to 10,000 objects per bulk-delete request
+BULK_DELETE_BATCH_SIZE = 10000
+# Objects per container listing page (Swift maximum: 10,000)
+LISTING_PAGE_SIZE = 10000
+
+# Serve Prometheus metrics on http://127.0.0.1:<port>/metrics (None = off)
+METRICS_PORT = None
+# JSON summary of the run's metrics, written when the run ends (None = off)
+METRICS_SUMMARY_FILE = "cleanup_metrics.json"
 
 
 logging.basicConfig(
@@ -37,14 +80,32 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class BulkDeleteUnsupported(RuntimeError):
+    """The storage endpoint does not have the bulk-delete middleware enabled."""
+
+
 class RackspaceClient:
-    def __init__(self, username: str, api_key: str):
+    def __init__(self, username: str, api_key: str, pool_size: int = DELETE_CONCURRENCY,
+                 rate_limiter: Optional[TokenBucket] = None):
         self.username = username
         self.api_key = api_key
         self._token: Optional[str] = None
         self._storage_url: Optional[str] = None
+        self._expires: Optional[float] = None
+        self._auth_lock = threading.Lock()
+        self.rate_limiter = rate_limiter
+
+        # One keep-alive connection pool shared by all delete workers
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def authenticate(self, force: bool = False) -> None:
+        if not force and self._load_cached_token():
+            logger.info("✅ נעשה שימוש בטוקן שמור, כתובת אחסון: %s", self._storage_url)
+            return
 
-    def authenticate(self) -> None:
         logger.info("🔐 מבצע אימות מול Rackspace Cloud Files...")
 
         payload = {
@@ -56,11 +117,12 @@ class RackspaceClient:
             }
         }
 
-        response = requests.post(AUTH_URL, json=payload, timeout=20)
+        response = self._session.post(AUTH_URL, json=payload, timeout=20)
         self._handle_response(response, "אימות נכשל")
 
         data = response.json()
         self._token = data["access"]["token"]["id"]
+        self._expires = self._parse_expires(data["access"]["token"].get("expires"))
 
         # Locate the object storage endpoint for the LON (UK) region
         service_catalog = data["access"].get("serviceCatalog", [])
@@ -91,6 +153,72 @@ class RackspaceClient:
 
         self._storage_url = endpoint["publicURL"].rstrip("/")
         logger.info("✅ אימות הצליח, כתובת אחסון: %s", self._storage_url)
+        self._save_cached_token()
+
+    @staticmethod
+    def _parse_expires(value: Optional[str]) -> Optional[float]:
+        if not value:
+            return None
+        try:
+            expires = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if expires.tzinfo is None:
+            expires = expires.replace(tzinfo=timezone.utc)
+        return expires.timestamp()
+
+    def _token_is_fresh(self) -> bool:
+        if not self._token:
+            return False
+        if self._expires is None:
+            return True
+        return self._expires - TOKEN_REFRESH_MARGIN_SECONDS > time.time()
+
+    def _load_cached_token(self) -> bool:
+        if not TOKEN_CACHE_FILE or not os.path.exists(TOKEN_CACHE_FILE):
+            return False
+        try:
+            with open(TOKEN_CACHE_FILE, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if cached.get("username") != self.username or not cached.get("expires"):
+            return False
+
+        self._token = cached.get("token")
+        self._storage_url = cached.get("storage_url")
+        self._expires = cached.get("expires")
+        if self._storage_url and self._token_is_fresh():
+            return True
+        self._token = self._storage_url = self._expires = None
+        return False
+
+    def _save_cached_token(self) -> None:
+        if not TOKEN_CACHE_FILE or self._expires is None:
+            return
+        try:
+            tmp_path = f"{TOKEN_CACHE_FILE}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "username": self.username,
+                        "token": self._token,
+                        "storage_url": self._storage_url,
+                        "expires": self._expires,
+                    },
+                    f,
+                )
+            os.replace(tmp_path, TOKEN_CACHE_FILE)
+        except OSError as exc:
+            logger.warning("⚠️ לא הצלחתי לשמור את הטוקן: %s", exc)
+
+    def _reauthenticate(self, stale_token: Optional[str]) -> None:
+        """Re-authenticate once, even if several workers notice the expiry together."""
+        with self._auth_lock:
+            if self._token == stale_token:
+                logger.info("🔄 הטוקן פג תוקף - מבצע אימות מחדש")
+                self.authenticate(force=True)
 
     @property
     def token(self) -> str:
@@ -111,30 +239,254 @@ class RackspaceClient:
         if not self._token:
             self.authenticate()
 
-        # Normalize path and ensure we don't duplicate slashes
-        object_path = object_path.strip()
-        if object_path.startswith("/"):
-            object_path = object_path[1:]
-
-        full_object_path = f"{CONTAINER_NAME}/{object_path}"
-
-        encoded_path = quote(full_object_path, safe="/:")
-        url = f"{self.storage_url}/{encoded_path}"
+        url = f"{self.storage_url}/{self.encode_object_path(object_path)}"
 
         logger.info("🗑️ מוחק בקשה: %s", url)
-        response = requests.delete(url, headers={"X-Auth-Token": self.token}, timeout=30)
+        with METRICS.timer("remote_delete_seconds", mode="single"):
+            response = self._throttled_request("DELETE", url)
 
         if response.status_code in (204, 404):
             if response.status_code == 204:
+                METRICS.inc("remote_delete_total", status="yes")
                 logger.info("✅ הקובץ נמחק מהשרת")
                 return "yes"
             else:
+                METRICS.inc("remote_delete_total", status="not_found")
                 logger.warning("⚠️ הקובץ לא נמצא בשרת (כבר נמחק?)")
                 return "not_found"
 
+        METRICS.inc("remote_delete_total", status="error")
         self._handle_response(response, "מחיקת קובץ נכשלה")
         return "error"
 
+    async def delete_object_async(self, http, object_path: str) -> str:
+        """delete_object() for RUN_MODE = "async", over a shared aiohttp session."""
+        if not object_path:
+            raise ValueError("Object path is empty")
+
+        url = f"{self.storage_url}/{self.encode_object_path(object_path)}"
+
+        logger.info("🗑️ מוחק בקשה: %s", url)
+        with METRICS.timer("remote_delete_seconds", mode="single"):
+            status, text = await self._throttled_request_async(http, "DELETE", url)
+
+        if status == 204:
+            METRICS.inc("remote_delete_total", status="yes")
+            logger.info("✅ הקובץ נמחק מהשרת")
+            return "yes"
+        if status == 404:
+            METRICS.inc("remote_delete_total", status="not_found")
+            logger.warning("⚠️ הקובץ לא נמצא בשרת (כבר נמחק?)")
+            return "not_found"
+
+        METRICS.inc("remote_delete_total", status="error")
+        if 200 <= status < 300:
+            return "error"
+        raise RuntimeError(f"מחיקת קובץ נכשלה: {status} | {text}")
+
+    @staticmethod
+    def encode_object_path(object_path: str) -> str:
+        """URL-encoded `CONTAINER_NAME/object` path of a CSV `url` value."""
+        # Normalize path and ensure we don't duplicate slashes
+        object_path = object_path.strip()
+        if object_path.startswith("/"):
+            object_path = object_path[1:]
+
+        full_object_path = f"{CONTAINER_NAME}/{object_path}"
+        return quote(full_object_path, safe="/:")
+
+    def list_objects(self, prefix: str = "") -> Iterator[dict]:
+        """
+        Yield the objects of CONTAINER_NAME whose name starts with prefix.
+
+        Each item is Swift's listing entry: {"name", "bytes", "hash", ...}.
+        Pages of LISTING_PAGE_SIZE objects are fetched with `marker`.
+        """
+        if not self._token:
+            self.authenticate()
+
+        url = f"{self.storage_url}/{quote(CONTAINER_NAME, safe='')}"
+        marker = ""
+        while True:
+            params = {"format": "json", "limit": LISTING_PAGE_SIZE, "prefix": prefix}
+            if marker:
+                params["marker"] = marker
+            response = self._throttled_request("GET", url, params=params, timeout=120)
+            if response.status_code == 204:
+                return
+            self._handle_response(response, "רשימת הקבצים בשרת נכשלה")
+            page = response.json()
+            for item in page:
+                yield item
+            if len(page) < LISTING_PAGE_SIZE:
+                return
+            marker = page[-1]["name"]
+
+    def bulk_delete(self, paths: Iterable[str]) -> Dict[str, str]:
+        """
+        Delete objects with the Swift bulk-delete middleware.
+
+        Args:
+            paths: CSV `url` values (relative object paths)
+
+        Returns:
+            {path: status} with status "yes", "not_found" or "error: ..."
+
+        Raises:
+            BulkDeleteUnsupported: if the middleware is not enabled
+        """
+        if not self._token:
+            self.authenticate()
+
+        encoded = {}
+        for path in paths:
+            if path:
+                encoded.setdefault(self.encode_object_path(path), []).append(path)
+        names = list(encoded)
+
+        results: Dict[str, str] = {}
+        for start in range(0, len(names), BULK_DELETE_BATCH_SIZE):
+            batch = names[start:start + BULK_DELETE_BATCH_SIZE]
+            logger.info("🗑️ מחיקה מרוכזת של %s קבצים", len(batch))
+            for name, status in self._bulk_delete_batch(batch).items():
+                for path in encoded[name]:
+                    results[path] = status
+        return results
+
+    def _bulk_delete_batch(self, names) -> Dict[str, str]:
+        with METRICS.timer("remote_delete_seconds", mode="bulk"):
+            response = self._throttled_request(
+                "POST",
+                f"{self.storage_url}/?bulk-delete",
+                data="\n".join(names).encode("utf-8"),
+                headers={"Content-Type": "text/plain", "Accept": "application/json"},
+                timeout=600,
+            )
+        if response.status_code in (404, 405, 501):
+            raise BulkDeleteUnsupported(f"bulk-delete rejected: HTTP {response.status_code}")
+        self._handle_response(response, "מחיקה מרוכזת נכשלה")
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or "Number Deleted" not in data:
+            # Without the middleware the POST is treated as an account metadata update
+            raise BulkDeleteUnsupported(f"bulk-delete not available: HTTP {response.status_code}")
+
+        response_status = str(data.get("Response Status", ""))
+        if response_status and not response_status.startswith("2") and not data.get("Errors"):
+            error = f"error: {response_status} | {data.get('Response Body', '')}".strip(" |")
+            METRICS.inc("remote_delete_total", len(names), status="error")
+            return {name: error for name in names}
+
+        def normalize(name):
+            return unquote(name).lstrip("/")
+
+        errors = {normalize(name): status for name, status in data.get("Errors", [])}
+        deleted = int(data.get("Number Deleted", 0))
+        not_found = int(data.get("Number Not Found", 0))
+        if deleted and not_found:
+            # Swift only reports a count for missing objects, not their names
+            logger.warning("⚠️ %s קבצים לא נמצאו בשרת (כבר נמחקו?) - מסומנים כנמחקו", not_found)
+        ok_status = "not_found" if not_found and not deleted else "yes"
+
+        results = {}
+        for name in names:
+            error = errors.get(normalize(name))
+            results[name] = f"error: {error}" if error else ok_status
+            METRICS.inc("remote_delete_total", status="error" if error else ok_status)
+        logger.info(
+            "✅ מחיקה מרוכזת: נמחקו %s | לא נמצאו %s | שגיאות %s", deleted, not_found, len(errors)
+        )
+        return results
+
+    def _throttled_request(self, method: str, url: str, headers: Optional[dict] = None,
+                           timeout: int = 30, **kwargs) -> Response:
+        """
+        Send a request through the rate limiter, backing off on 429/503.
+
+        The token is refreshed before it expires, and a 401 triggers one
+        re-authentication and retry.
+        """
+        if not self._token_is_fresh():
+            self._reauthenticate(self._token)
+        reauthenticated = False
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            token = self.token
+            response = self._session.request(
+                method, url, headers={"X-Auth-Token": token, **(headers or {})}, timeout=timeout, **kwargs
+            )
+            METRICS.inc("remote_http_responses_total", method=method, code=response.status_code)
+            if response.status_code == 401 and not reauthenticated:
+                reauthenticated = True
+                self._reauthenticate(token)
+                continue
+            if response.status_code not in (429, 503) or attempt == DELETE_THROTTLE_RETRIES:
+                if self.rate_limiter and response.ok:
+                    self._speed_up()
+                return response
+
+            METRICS.inc("remote_retries_total")
+            self._slow_down()
+            retry_after = response.headers.get("Retry-After", "")
+            wait_time = float(retry_after) if retry_after.isdigit() else min(2 ** attempt, 60)
+            attempt += 1
+            logger.warning(
+                "⚠️ השרת מבקש להאט (HTTP %s), ממתין %.1f שניות (ניסיון %s/%s)",
+                response.status_code, wait_time, attempt, DELETE_THROTTLE_RETRIES,
+            )
+            time.sleep(wait_time)
+
+    async def _throttled_request_async(self, http, method: str, url: str):
+        """_throttled_request() for coroutines. Returns (status, body text)."""
+        import asyncio
+
+        if not self._token_is_fresh():
+            await asyncio.to_thread(self._reauthenticate, self._token)
+        reauthenticated = False
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async()
+            token = self.token
+            async with http.request(method, url, headers={"X-Auth-Token": token}) as response:
+                status = response.status
+                text = await response.text()
+                retry_after = response.headers.get("Retry-After", "")
+            METRICS.inc("remote_http_responses_total", method=method, code=status)
+            if status == 401 and not reauthenticated:
+                reauthenticated = True
+                await asyncio.to_thread(self._reauthenticate, token)
+                continue
+            if status not in (429, 503) or attempt == DELETE_THROTTLE_RETRIES:
+                if self.rate_limiter and status < 400:
+                    self._speed_up()
+                return status, text
+
+            METRICS.inc("remote_retries_total")
+            self._slow_down()
+            wait_time = float(retry_after) if retry_after.isdigit() else min(2 ** attempt, 60)
+            attempt += 1
+            logger.warning(
+                "⚠️ השרת מבקש להאט (HTTP %s), ממתין %.1f שניות (ניסיון %s/%s)",
+                status, wait_time, attempt, DELETE_THROTTLE_RETRIES,
+            )
+            await asyncio.sleep(wait_time)
+
+    def _slow_down(self) -> None:
+        # Multiplicative decrease of the shared request rate
+        if self.rate_limiter and self.rate_limiter.rate:
+            self.rate_limiter.set_rate(max(self.rate_limiter.rate / 2, 0.5))
+
+    def _speed_up(self) -> None:
+        # Additive increase back towards the configured rate
+        rate = self.rate_limiter.rate
+        if rate and rate < DELETE_RATE_PER_SECOND:
+            self.rate_limiter.set_rate(min(rate + 0.1, DELETE_RATE_PER_SECOND))
+
     @staticmethod
     def _handle_response(response: Response, error_message: str) -> None:
         if response.ok:
@@ -146,12 +498,103 @@ class RackspaceClient:
         raise RuntimeError(f"{error_message}: {response.status_code} | {details}")
 
 
-def ensure_deleted_column(df: pd.DataFrame) -> pd.DataFrame:
-    if DELETED_COLUMN not in df.columns:
-        df[DELETED_COLUMN] = ""
-    else:
-        df[DELETED_COLUMN] = df[DELETED_COLUMN].fillna("")
-    return df
+class DeleteQueue:
+    """
+    Background deletes for callers that learn about objects one at a time
+    (youtube_uploader's inline cleanup). put() returns at once; at most
+    `concurrency` deletes run together, each result is passed to `record`
+    (called from the delete threads, like StateStore.record) for the row's
+    DELETED_COLUMN.
+    """
+
+    def __init__(self, record: Callable[..., None], concurrency: int = DELETE_CONCURRENCY):
+        concurrency = max(concurrency, 1)
+        self.record = record
+        self.client = RackspaceClient(
+            USERNAME,
+            API_KEY,
+            pool_size=concurrency,
+            rate_limiter=TokenBucket(DELETE_RATE_PER_SECOND, capacity=concurrency),
+        )
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="remote-delete")
+        self._auth_lock = threading.Lock()
+        self._authenticated = False
+        self._counters_lock = threading.Lock()
+        self.counters = {"queued": 0, "deleted": 0, "failed": 0}
+        self._pending = set()
+
+    def put(self, key: str, object_path: str) -> None:
+        with self._counters_lock:
+            self.counters["queued"] += 1
+            future = self._executor.submit(self._delete, key, object_path)
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future) -> None:
+        with self._counters_lock:
+            self._pending.discard(future)
+
+    def _delete(self, key: str, object_path: str) -> None:
+        try:
+            with self._auth_lock:
+                # Authenticated by the first delete, so a run with nothing to delete never does
+                if not self._authenticated:
+                    self.client.authenticate()
+                    self._authenticated = True
+            status = self.client.delete_object(object_path)
+        except Exception as exc:
+            logger.error("❌ שגיאה במחיקת %s: %s", object_path, exc)
+            status = f"error: {exc}"
+        self.record(key, **{DELETED_COLUMN: status})
+        with self._counters_lock:
+            self.counters["deleted" if status in ("yes", "not_found") else "failed"] += 1
+
+    def drain(self) -> None:
+        """Wait for the deletes queued so far; the queue stays open."""
+        with self._counters_lock:
+            pending = list(self._pending)
+        wait(pending)
+
+    def close(self) -> None:
+        """Wait for the queued deletes."""
+        self._executor.shutdown(wait=True)
+        logger.info(
+            "🗑️ ניקוי מהשרת: %s נמחקו, %s נכשלו (מתוך %s)",
+            self.counters["deleted"], self.counters["failed"], self.counters["queued"],
+        )
+
+
+async def delete_rows_async(client, rows, state, counters):
+    """
+    Single deletes as coroutines: DELETE_CONCURRENCY requests in flight over
+    one aiohttp session, results journaled by a single StateWriter task.
+    """
+    import asyncio
+
+    from async_engine import StateWriter, http_session
+
+    writer = StateWriter(state)
+    writer.start()
+    limit = asyncio.Semaphore(max(DELETE_CONCURRENCY, 1))
+
+    async def delete_row(http, row):
+        async with limit:
+            try:
+                status = await client.delete_object_async(http, row.url.strip())
+                writer.record(row.key, **{DELETED_COLUMN: status})
+            except Exception as exc:
+                logger.error("❌ שגיאה במחיקה עבור שורה %s: %s", row.index + 1, exc)
+                writer.record(row.key, **{DELETED_COLUMN: f"error: {exc}"})
+                status = "error"
+        counters["processed"] += 1
+        if status == "yes":
+            counters["deleted"] += 1
+
+    try:
+        async with http_session(DELETE_CONCURRENCY) as http:
+            await asyncio.gather(*(delete_row(http, row) for row in rows))
+    finally:
+        await writer.close()
 
 
 def main():
@@ -159,51 +602,139 @@ def main():
         logger.error("❌ קובץ CSV לא נמצא: %s", CSV_FILE)
         sys.exit(1)
 
-    df = pd.read_csv(CSV_FILE)
-    df = ensure_deleted_column(df)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
 
-    client = RackspaceClient(USERNAME, API_KEY)
+    state = StateStore(STATE_DB_FILE, STATE_DB_JOURNAL_MODE)
+    # Apply transitions journaled since the last export (e.g. uploads of a crashed run)
+    source = CsvRowSource(CSV_FILE, journal=state.current())
+
+    client = RackspaceClient(
+        USERNAME,
+        API_KEY,
+        pool_size=DELETE_CONCURRENCY,
+        rate_limiter=TokenBucket(DELETE_RATE_PER_SECOND, capacity=max(DELETE_CONCURRENCY, 1)),
+    )
     client.authenticate()
 
-    total_rows = len(df)
+    total_rows, _ = source.counts()
     logger.info("📄 קורא %s שורות מה-CSV", total_rows)
 
-    processed = 0
-    deleted = 0
-
-    for idx, row in df.iterrows():
-        uploaded_status = str(row.get("uploaded", "")).strip().lower()
-        youtube_url = str(row.get("youtube_url", "")).strip()
-        deleted_status = str(row.get(DELETED_COLUMN, "")).strip().lower()
-
-        if uploaded_status != "yes" or not youtube_url:
-            continue
-
-        if deleted_status == "yes":
-            logger.info("⏭️ שורה %s כבר נמחקה בעבר, מדלג", idx + 1)
-            continue
-
-        object_path = str(row.get("url", "")).strip()
-        if not object_path:
-            logger.warning("⚠️ אין נתיב לקובץ בשורה %s, מדלג", idx + 1)
-            continue
+    counters = {"processed": 0, "deleted": 0}
+    counters_lock = threading.Lock()
 
+    def delete_row(row):
         try:
-            status = client.delete_object(object_path)
-            if status == "yes":
-                df.at[idx, DELETED_COLUMN] = "yes"
-                deleted += 1
-            else:
-                df.at[idx, DELETED_COLUMN] = status
+            status = client.delete_object(row.url.strip())
+            state.record(row.key, **{DELETED_COLUMN: status})
         except Exception as exc:
-            logger.error("❌ שגיאה במחיקה עבור שורה %s: %s", idx + 1, exc)
-            df.at[idx, DELETED_COLUMN] = f"error: {exc}"  # Keep error for reference
-
-        processed += 1
-        time.sleep(DELETE_DELAY_SECONDS)
+            logger.error("❌ שגיאה במחיקה עבור שורה %s: %s", row.index + 1, exc)
+            state.record(row.key, **{DELETED_COLUMN: f"error: {exc}"})  # Keep error for reference
+            status = "error"
+        with counters_lock:
+            counters["processed"] += 1
+            if status == "yes":
+                counters["deleted"] += 1
 
-    df.to_csv(CSV_FILE, index=False)
+    def delete_batch(batch):
+        try:
+            results = client.bulk_delete(row.url.strip() for row in batch)
+        except BulkDeleteUnsupported:
+            raise
+        except Exception as exc:
+            logger.error("❌ שגיאה במחיקה מרוכזת: %s", exc)
+            results = {row.url.strip(): f"error: {exc}" for row in batch}
+        for row in batch:
+            status = results.get(row.url.strip(), "error: missing from bulk-delete result")
+            state.record(row.key, **{DELETED_COLUMN: status})
+            with counters_lock:
+                counters["processed"] += 1
+                if status == "yes":
+                    counters["deleted"] += 1
+
+    use_bulk = USE_BULK_DELETE
+    batch = []
+    async_rows = []
+    run_async = RUN_MODE == "async"
+    if run_async:
+        from async_engine import require_aiohttp
 
+        try:
+            require_aiohttp()
+        except RuntimeError as exc:
+            logger.warning("⚠️ %s - מוחק עם threads", exc)
+            run_async = False
+
+    def flush_async():
+        if async_rows:
+            import asyncio
+
+            asyncio.run(delete_rows_async(client, async_rows, state, counters))
+            async_rows.clear()
+
+    try:
+        with closing(source.rows(status="uploaded")) as rows, \
+                ThreadPoolExecutor(max_workers=DELETE_CONCURRENCY) as pool:
+            pending = set()
+
+            def submit_single(row):
+                nonlocal pending
+                if run_async:
+                    async_rows.append(row)
+                    if len(async_rows) >= ASYNC_DELETE_ROWS:
+                        flush_async()
+                    return
+                pending.add(pool.submit(delete_row, row))
+                # Keep the number of queued rows bounded
+                if len(pending) >= DELETE_CONCURRENCY * 4:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            def flush_batch():
+                nonlocal use_bulk
+                if not batch:
+                    return
+                try:
+                    delete_batch(batch)
+                except BulkDeleteUnsupported as exc:
+                    logger.warning("⚠️ %s - עובר למחיקה של קובץ אחד בכל בקשה", exc)
+                    use_bulk = False
+                    for row in batch:
+                        submit_single(row)
+                batch.clear()
+
+            for row in rows:
+                if not row.youtube_url.strip():
+                    continue
+
+                if row.remote_deleted.strip().lower() == "yes":
+                    logger.info("⏭️ שורה %s כבר נמחקה בעבר, מדלג", row.index + 1)
+                    continue
+
+                if not row.url.strip():
+                    logger.warning("⚠️ אין נתיב לקובץ בשורה %s, מדלג", row.index + 1)
+                    continue
+
+                if use_bulk:
+                    batch.append(row)
+                    if len(batch) >= BULK_DELETE_BATCH_SIZE:
+                        flush_batch()
+                else:
+                    submit_single(row)
+
+            flush_batch()
+            flush_async()
+    finally:
+        # A running uploader still writes the CSV when its last worker exits
+        workers = state.live_workers(LEASE_SECONDS)
+        if workers:
+            logger.info("📝 %s עובדי העלאה עדיין פעילים - המצב נשמר ביומן %s והעובד האחרון יכתוב את %s", len(workers), state.path, CSV_FILE)
+        else:
+            state.export_csv(CSV_FILE)
+        state.close()
+        if METRICS_SUMMARY_FILE:
+            METRICS.write_summary(METRICS_SUMMARY_FILE)
+
+    processed, deleted = counters["processed"], counters["deleted"]
     logger.info("✅ ניקוי הסתיים.\n📊 טופלו: %s\n🗑️ נמחקו: %s", processed, deleted)
 
 
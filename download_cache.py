@@ -0,0 +1,221 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-file metadata (size, ETag, failed uploads), kept inside the cache folder
+CACHE_INDEX_FILE = ".cache_index.json"
+PART_SUFFIX = ".part"
+# Sidecar files that belong to a cached video (segment map of a partial download)
+SIDECAR_SUFFIXES = (PART_SUFFIX, PART_SUFFIX + ".segments", PART_SUFFIX + ".segments.tmp")
+
+
+class DownloadCache:
+    """
+    Size-capped cache of downloaded videos in a folder.
+
+    Downloads go to `<name>.part` and are renamed into place by commit() once
+    complete, so a file under its final name is always whole. Files are
+    pinned while a row uses them; to make room for a new download, unpinned
+    files are evicted - those whose upload failed first, then the least
+    recently used. reserve() blocks while pinned files hold the space and
+    gives up when nothing can be freed.
+    """
+
+    def __init__(self, folder, max_bytes=None, min_free_bytes=0):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self._cond = threading.Condition()
+        self._pinned = set()
+        self._reserved = {}
+        self._index = None
+
+    # --- naming -----------------------------------------------------------------
+
+    def path_for(self, source):
+        """
+        Cache path of a remote file. The basename is prefixed with a hash of
+        the whole source path, so different folders sharing a file name never
+        collide.
+        """
+        name = os.path.basename(source.split("?", 1)[0]) or "video"
+        digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.folder, f"{digest}_{name}")
+
+    @staticmethod
+    def part_path(path):
+        return path + PART_SUFFIX
+
+    # --- metadata ---------------------------------------------------------------
+
+    def _index_path(self):
+        return os.path.join(self.folder, CACHE_INDEX_FILE)
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self._index_path(), "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        tmp_path = self._index_path() + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self._index_path())
+        except OSError as e:
+            logger.warning(f"⚠️ לא הצלחתי לשמור את אינדקס המטמון: {str(e)}")
+
+    # --- lookup / download ------------------------------------------------------
+
+    def lookup(self, path, size=None, etag=None):
+        """
+        Pin and return True if a complete copy of the file is cached.
+
+        A copy whose size (or recorded ETag) does not match the remote file is
+        removed.
+        """
+        with self._cond:
+            if not os.path.exists(path):
+                return False
+            meta = self._load_index().get(os.path.basename(path), {})
+            actual = os.path.getsize(path)
+            expected = size or meta.get("size")
+            if (expected and actual != expected) or (etag and meta.get("etag") and meta["etag"] != etag):
+                logger.warning(f"♻️ העותק השמור של {path} לא תואם לקובץ בשרת - מוריד מחדש")
+                self._remove(path)
+                return False
+            self._pinned.add(path)
+            os.utime(path)  # LRU order
+            return True
+
+    def reserve(self, path, size=None, timeout=None):
+        """
+        Make room for downloading `size` bytes into path and pin it.
+
+        Blocks while the space is held by pinned files (e.g. downloads waiting
+        for upload).
+
+        Returns:
+            False if the space cannot be freed (or timeout expired)
+        """
+        size = size or 0
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            self._pinned.add(path)
+            while True:
+                if self._make_room(path, size):
+                    self._reserved[path] = size
+                    return True
+                others_pinned = len(self._pinned) > 1
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if not others_pinned or (remaining is not None and remaining <= 0):
+                    self._pinned.discard(path)
+                    return False
+                logger.info("💽 אין מספיק מקום למטמון ההורדות - ממתין שקבצים יועלו ויפנו מקום")
+                self._cond.wait(min(remaining, 30) if remaining is not None else 30)
+
+    def commit(self, path, size=None, etag=None):
+        """Move a finished `.part` download into place."""
+        part = self.part_path(path)
+        actual = os.path.getsize(part)
+        if size and actual != size:
+            raise IOError(f"Downloaded {actual} bytes, expected {size}")
+        os.replace(part, path)
+        with self._cond:
+            self._reserved.pop(path, None)
+            self._load_index()[os.path.basename(path)] = {"size": actual, "etag": etag, "failures": 0}
+            self._save_index()
+            self._cond.notify_all()
+
+    def release(self, path, failed=False):
+        """Unpin a file. A failed upload makes it the first candidate for eviction."""
+        with self._cond:
+            self._pinned.discard(path)
+            self._reserved.pop(path, None)
+            if failed and os.path.exists(path):
+                meta = self._load_index().setdefault(os.path.basename(path), {})
+                meta["failures"] = meta.get("failures", 0) + 1
+                self._save_index()
+            self._cond.notify_all()
+
+    def remove(self, path):
+        """Delete a file (e.g. after a successful upload). Returns the bytes freed."""
+        with self._cond:
+            freed = self._remove(path)
+            self._pinned.discard(path)
+            self._reserved.pop(path, None)
+            self._cond.notify_all()
+            return freed
+
+    # --- internals (called with the lock held) ----------------------------------
+
+    def _remove(self, path):
+        freed = 0
+        for candidate in (path,) + tuple(path + suffix for suffix in SIDECAR_SUFFIXES):
+            try:
+                freed += os.path.getsize(candidate)
+                os.remove(candidate)
+            except OSError:
+                pass
+        if self._load_index().pop(os.path.basename(path), None) is not None:
+            self._save_index()
+        return freed
+
+    def _entries(self):
+        """{cached path: (bytes on disk, last used)} of every file in the folder."""
+        entries = {}
+        if not os.path.isdir(self.folder):
+            return entries
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or entry.name.startswith(CACHE_INDEX_FILE):
+                continue
+            path = entry.path
+            for suffix in SIDECAR_SUFFIXES:
+                if path.endswith(suffix):
+                    path = path[:-len(suffix)]
+                    break
+            stat = entry.stat()
+            used, last = entries.get(path, (0, 0))
+            entries[path] = (used + stat.st_size, max(last, stat.st_mtime))
+        return entries
+
+    def _make_room(self, path, size):
+        entries = self._entries()
+        # Space still to be written by downloads in progress (the new one included)
+        pending = {p: r for p, r in self._reserved.items() if p != path}
+        pending[path] = size
+        outstanding = sum(max(r - entries.get(p, (0, 0))[0], 0) for p, r in pending.items())
+
+        # A file larger than the cap is allowed in on its own
+        cap = max(self.max_bytes, size) if self.max_bytes else None
+
+        def fits():
+            used = sum(b for b, _ in entries.values())
+            if cap and used + outstanding > cap:
+                return False
+            return shutil.disk_usage(self.folder).free - outstanding >= self.min_free_bytes
+
+        if fits():
+            return True
+
+        index = self._load_index()
+        candidates = [p for p in entries if p not in self._pinned]
+        # Failed uploads first, then least recently used
+        candidates.sort(key=lambda p: (-index.get(os.path.basename(p), {}).get("failures", 0), entries[p][1]))
+        for candidate in candidates:
+            freed = self._remove(candidate)
+            del entries[candidate]
+            logger.info(f"🧹 פונה מהמטמון: {candidate} ({freed / (1024*1024):.2f} MB)")
+            if fits():
+                return True
+        return False
@@ -0,0 +1,145 @@
+import csv
+import logging
+import re
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Characters removed from titles: anything but word characters, whitespace,
+# Hebrew letters / niqqud and basic punctuation
+TITLE_FORBIDDEN_CHARS = re.compile(r"[^\w\s\u0590-\u05fe\-\.,;:!?()\"'’״׳]")
+NEWLINES_TO_SPACES = str.maketrans({"\n": " ", "\r": " "})
+
+DESCRIPTION_INTRO = "דפי מקורות וקובץ שמע בעמוד השיעור באתר הישיבה"
+
+# Validation issues. Rows with a REJECTING issue are not uploaded
+EMPTY_TITLE = "empty_title"
+TITLE_TRUNCATED = "title_truncated"
+BAD_DATE = "bad_date"
+REJECTING = {EMPTY_TITLE}
+
+
+class MetadataBuilder:
+    """
+    Builds the YouTube title and description of CSV rows.
+
+    The title pattern is compiled once and every distinct `added` value is
+    parsed once, so validate() checks all pending rows in a single pass
+    before any network I/O; the run then builds each row's metadata from the
+    same caches.
+    """
+
+    def __init__(self, base_website_url="", max_title_length=100):
+        self.base_website_url = base_website_url
+        self.max_title_length = max_title_length
+        self._dates = {}
+
+    def title(self, row):
+        """
+        Returns:
+            (title, issue): title is None when nothing is left after cleaning;
+            issue is EMPTY_TITLE, TITLE_TRUNCATED or None
+        """
+        # rabi + cat + title
+        rabi = str(row.get("rabi", "")).strip()
+        cat = str(row.get("cat", "")).strip()
+        title = str(row.get("title", "")).strip()
+        # הגנה - אם title ריק נסה לפחות cat/rabi
+        if not title and (rabi or cat):
+            title = cat or rabi
+        video_title = f"{rabi} - {cat} - {title}" if rabi and cat else (f"{cat} - {title}" if cat else title)
+
+        video_title = TITLE_FORBIDDEN_CHARS.sub("", video_title).translate(NEWLINES_TO_SPACES)
+        if not video_title.strip():
+            return None, EMPTY_TITLE
+        if len(video_title) > self.max_title_length:
+            # The end of the title (the lesson name) is the part worth keeping
+            return video_title[-self.max_title_length:], TITLE_TRUNCATED
+        return video_title, None
+
+    def added_date(self, value):
+        """
+        `added` as shown in the description: "M/D/YYYY 0:00" becomes
+        "DD/MM/YYYY", other values are kept as they are.
+
+        Returns:
+            (text, valid)
+        """
+        value = str(value or "").strip()
+        cached = self._dates.get(value)
+        if cached is None:
+            cached = self._dates[value] = self._parse_date(value)
+        return cached
+
+    @staticmethod
+    def _parse_date(value):
+        if " 0:00" not in value:
+            return value, True
+        try:
+            month, day, year = value.replace(" 0:00", "").split("/")
+            return datetime(int(year), int(month), int(day)).strftime("%d/%m/%Y"), True
+        except ValueError:
+            return value, False
+
+    def description(self, row):
+        csv_id = str(row.get("id", "")).strip()
+        added_date, _ = self.added_date(row.get("added", ""))
+
+        description = DESCRIPTION_INTRO
+        if csv_id:
+            description += f"\n\nקישור לשיעור באתר הישיבה:\n{self.base_website_url}{csv_id}"
+        if added_date:
+            description += f"\n\nתאריך: {added_date}"
+        return description
+
+    def validate(self, rows):
+        """Check the metadata of every row in one pass. Returns a MetadataReport."""
+        report = MetadataReport()
+        for row in rows:
+            report.checked += 1
+            title, issue = self.title(row)
+            if issue == EMPTY_TITLE:
+                report.add(row, EMPTY_TITLE, "")
+            elif issue == TITLE_TRUNCATED:
+                report.add(row, TITLE_TRUNCATED, title)
+            added, valid = self.added_date(row.get("added", ""))
+            if not valid:
+                report.add(row, BAD_DATE, added)
+        return report
+
+
+class MetadataReport:
+    """Problems found by MetadataBuilder.validate(), one entry per (row, issue)."""
+
+    def __init__(self):
+        self.checked = 0
+        self.issues = []
+        self.rejected = set()
+
+    def add(self, row, issue, detail):
+        self.issues.append((row.index + 1, row.key, issue, detail))
+        if issue in REJECTING:
+            self.rejected.add(row.key)
+
+    def counts(self):
+        counts = {}
+        for _, _, issue, _ in self.issues:
+            counts[issue] = counts.get(issue, 0) + 1
+        return counts
+
+    def log(self):
+        counts = self.counts()
+        logger.info(
+            f"🧾 בדיקת כותרות ותיאורים: {self.checked} שורות | "
+            f"{len(self.rejected)} יידחו (כותרת ריקה) | "
+            f"{counts.get(TITLE_TRUNCATED, 0)} כותרות יקוצצו | {counts.get(BAD_DATE, 0)} תאריכים לא תקינים"
+        )
+
+    def write(self, path):
+        """CSV of every issue: row number, row key, issue, detail."""
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(["row", "key", "issue", "detail"])
+            writer.writerows(self.issues)
+        if self.issues:
+            logger.info(f"🧾 דוח הבעיות נכתב לקובץ {path}")
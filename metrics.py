@@ -0,0 +1,167 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Help text of the metrics exposed on /metrics
+METRIC_HELP = {
+    "download_bytes_total": "Bytes downloaded from storage",
+    "download_seconds": "Time spent downloading one file",
+    "download_retries_total": "Download attempts that were retried",
+    "download_http_responses_total": "HTTP responses received while downloading",
+    "upload_bytes_total": "Bytes acknowledged by YouTube",
+    "upload_seconds": "Time spent uploading one video",
+    "upload_retries_total": "Upload chunks that were retried",
+    "upload_http_errors_total": "HTTP errors returned by the YouTube API",
+    "provider_notify_total": "Site provider updates by result",
+    "provider_notify_seconds": "Time spent on one site provider request",
+    "remote_delete_total": "Remote file deletions by status",
+    "remote_delete_seconds": "Time spent deleting one remote file",
+    "remote_http_responses_total": "HTTP responses received from Cloud Files",
+    "remote_retries_total": "Cloud Files requests retried after 429/503",
+    "bandwidth_wait_seconds_total": "Time transfers waited for the bandwidth limit",
+    "quota_units_total": "YouTube quota units spent",
+    "quota_units_refunded_total": "YouTube quota units refunded for calls that were not made",
+    "rows_total": "CSV rows processed by result",
+}
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Thread-safe in-process counters and timing summaries.
+
+    Updating a metric is a dict update under a lock, so instrumentation can
+    stay on in production. Metrics are rendered in the Prometheus text format
+    by render() and as a JSON-friendly dict by summary().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            count, total, longest = self._timings.get(key, (0, 0.0, 0.0))
+            self._timings[key] = (count + 1, total + seconds, max(longest, seconds))
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    def value(self, name, **labels):
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def total(self, name):
+        """Sum of a counter over all its label values."""
+        with self._lock:
+            return sum(value for (metric, _), value in self._counters.items() if metric == name)
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            timings = sorted(self._timings.items())
+
+        def labels_text(labels):
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{labels_text(labels)} {value}")
+        for (name, labels), (count, total, _) in timings:
+            header(name, "summary")
+            lines.append(f"{name}_count{labels_text(labels)} {count}")
+            lines.append(f"{name}_sum{labels_text(labels)} {total:.6f}")
+        elapsed = time.time() - self.started
+        lines.append("# TYPE process_run_seconds gauge")
+        lines.append(f"process_run_seconds {elapsed:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """{"counters": {...}, "timings": {...}} keyed by `name{label=value,...}`."""
+        def flat(name, labels):
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+        with self._lock:
+            counters = {flat(*key): value for key, value in sorted(self._counters.items())}
+            timings = {
+                flat(*key): {"count": count, "seconds": round(total, 3), "max_seconds": round(longest, 3)}
+                for key, (count, total, longest) in sorted(self._timings.items())
+            }
+        elapsed = time.time() - self.started
+        result = {"elapsed_seconds": round(elapsed, 3), "counters": counters, "timings": timings}
+        for direction in ("download", "upload"):
+            moved = self.total(f"{direction}_bytes_total")
+            if moved and elapsed:
+                result[f"{direction}_mb_per_second"] = round(moved / (1024 * 1024) / elapsed, 3)
+        return result
+
+    def write_summary(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        logger.info(f"📈 סיכום מדדים נכתב לקובץ {path}")
+
+
+# Registry shared by all modules of a run
+METRICS = Metrics()
+
+
+def start_metrics_server(port, metrics=METRICS, host="127.0.0.1"):
+    """Serve metrics.render() on http://host:port/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"📈 מדדים זמינים בכתובת http://{host}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,147 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Default daily quota of a Google Cloud project
+DAILY_QUOTA_UNITS = 10000
+
+# Quota cost of the API calls the uploader makes
+QUOTA_COSTS = {
+    "videos.insert": 1600,
+    "videos.list": 1,
+    "playlistItems.list": 1,
+    "channels.list": 1,
+}
+
+try:
+    from zoneinfo import ZoneInfo
+
+    PACIFIC = ZoneInfo("America/Los_Angeles")
+except Exception:  # no tz database (e.g. Windows without the tzdata package)
+    PACIFIC = timezone(timedelta(hours=-8), "PST")
+
+
+def quota_day(now=None):
+    """YouTube quota resets at midnight Pacific time - the ledger is keyed by that date."""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(PACIFIC).strftime("%Y-%m-%d")
+
+
+def seconds_until_reset(now=None):
+    """Seconds until the next midnight Pacific time, when YouTube quotas reset."""
+    now = (now or datetime.now(timezone.utc)).astimezone(PACIFIC)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(midnight.timestamp() - now.timestamp(), 0)
+
+
+class QuotaExceeded(Exception):
+    """YouTube rejected a call because the credential's quota is used up."""
+
+
+def is_quota_response(status, content):
+    """True for an API error response caused by an exhausted quota / daily upload limit."""
+    if status not in (403, 429):
+        return False
+    text = str(content or b"")
+    return any(reason in text for reason in ("quotaExceeded", "dailyLimitExceeded", "uploadLimitExceeded"))
+
+
+def is_quota_error(error):
+    """True for an HttpError caused by an exhausted quota / daily upload limit."""
+    status = getattr(getattr(error, "resp", None), "status", None)
+    return is_quota_response(status, getattr(error, "content", b""))
+
+
+class Credential:
+    """One OAuth token (channel / project) and its daily quota."""
+
+    def __init__(self, name, creds, service_factory, daily_quota=DAILY_QUOTA_UNITS):
+        self.name = name
+        self.creds = creds
+        self.daily_quota = daily_quota
+        self._service_factory = service_factory
+        self._local = threading.local()
+
+    def service(self):
+        # googleapiclient services are not thread-safe - one per thread
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self._service_factory(self.creds)
+        return service
+
+
+class CredentialPool:
+    """
+    Hands out credentials that still have quota for a call.
+
+    Units are spent in the state store ledger when a credential is reserved
+    (and refunded if the call was not made), so workers on several threads
+    or processes sharing the database never overspend a credential. The
+    credential with the most units left is picked first.
+    """
+
+    def __init__(self, credentials, state):
+        if not credentials:
+            raise ValueError("Credential pool is empty")
+        self.credentials = list(credentials)
+        self.state = state
+
+    def remaining(self, day=None):
+        """Units left today per credential name."""
+        used = self.state.quota_used(day or quota_day())
+        return {c.name: c.daily_quota - used.get(c.name, 0) for c in self.credentials}
+
+    def has_quota(self, call_type="videos.insert"):
+        cost = QUOTA_COSTS.get(call_type, 1)
+        return any(units >= cost for units in self.remaining().values())
+
+    @property
+    def exhausted(self):
+        return not self.has_quota()
+
+    def reserve(self, call_type="videos.insert", credential=None):
+        """
+        Spend the units of one call on a credential - the given one, or the
+        one with the most units left. Returns the credential or None.
+        """
+        day = quota_day()
+        cost = QUOTA_COSTS.get(call_type, 1)
+        remaining = self.remaining(day)
+        candidates = [credential] if credential is not None else self.credentials
+        for credential in sorted(candidates, key=lambda c: remaining[c.name], reverse=True):
+            if remaining[credential.name] < cost:
+                break
+            if self.state.spend_quota(credential.name, day, call_type, cost, limit=credential.daily_quota):
+                METRICS.inc("quota_units_total", cost, credential=credential.name, call_type=call_type)
+                return credential
+        return None
+
+    def spend(self, credential, call_type, calls=1):
+        """Book calls that do not need a reservation (cheap read calls)."""
+        units = QUOTA_COSTS.get(call_type, 1) * calls
+        self.state.spend_quota(credential.name, quota_day(), call_type, units)
+        METRICS.inc("quota_units_total", units, credential=credential.name, call_type=call_type)
+
+    def refund(self, credential, call_type="videos.insert"):
+        units = QUOTA_COSTS.get(call_type, 1)
+        self.state.spend_quota(credential.name, quota_day(), call_type, -units)
+        METRICS.inc("quota_units_refunded_total", units, credential=credential.name, call_type=call_type)
+
+    def mark_exhausted(self, credential):
+        """YouTube says the credential is out of quota - book the rest of its day."""
+        day = quota_day()
+        left = self.remaining(day)[credential.name]
+        if left > 0:
+            self.state.spend_quota(credential.name, day, "exhausted", left)
+        logger.warning(f"🚫 נגמרה המכסה היומית של '{credential.name}'")
+
+    def log_report(self):
+        day = quota_day()
+        for name, call_type, units in self.state.quota_report(day):
+            logger.info(f"📊 מכסה {day} | {name} | {call_type}: {units} יחידות")
+        for name, units in self.remaining(day).items():
+            logger.info(f"📊 נותרו ל-'{name}': {max(units, 0)} יחידות")
@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`;
+    acquire() blocks until the requested amount is available. A rate of
+    None disables limiting.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._capacity = capacity if capacity is not None else (rate or 0)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate, capacity=None):
+        with self._lock:
+            self._refill()
+            self._rate = rate
+            self._capacity = capacity if capacity is not None else (rate or 0)
+            self._tokens = min(self._tokens, self._capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._rate:
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        else:
+            # Nothing is owed while unlimited
+            self._tokens = self._capacity
+        self._updated = now
+
+    def _take(self, amount):
+        """Take amount tokens if available; otherwise return the seconds to wait."""
+        with self._lock:
+            if not self._rate:
+                return 0
+            self._refill()
+            # Requests larger than the bucket are let through once it is full
+            needed = min(amount, self._capacity)
+            if self._tokens >= needed:
+                self._tokens -= amount
+                return 0
+            return (needed - self._tokens) / self._rate
+
+    def acquire(self, amount=1):
+        while True:
+            wait = self._take(amount)
+            if not wait:
+                return
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self, amount=1):
+        """acquire() for coroutines: waits with asyncio.sleep instead of blocking the loop."""
+        import asyncio
+
+        while True:
+            wait = self._take(amount)
+            if not wait:
+                return
+            await asyncio.sleep(min(wait, 1.0))
+
+
+def _format_rate(rate):
+    return f"{rate / (1000 * 1000):.1f} MB/s" if rate else "ללא הגבלה"
+
+
+class BandwidthGovernor:
+    """
+    Download ("ingress") and upload ("egress") byte budgets shared by every
+    transfer of the process.
+
+    schedule is a list of (start "HH:MM", ingress, egress) in bytes per
+    second, None meaning unlimited. An entry applies from its start time
+    (local time) until the next one; the last entry wraps past midnight.
+    The current entry is looked up again while transfers run (at most once
+    a second), so the limits switch over without a restart.
+    """
+
+    def __init__(self, schedule, burst_seconds=1.0):
+        periods = []
+        for start, ingress, egress in schedule:
+            hours, minutes = (int(part) for part in start.split(":"))
+            if not (0 <= hours < 24 and 0 <= minutes < 60):
+                raise ValueError(f"Bad start time in bandwidth schedule: {start!r}")
+            periods.append((hours * 60 + minutes, ingress, egress))
+        if not periods:
+            raise ValueError("Bandwidth schedule is empty")
+        self._periods = sorted(periods)
+        self._burst_seconds = burst_seconds
+        self._buckets = {"ingress": TokenBucket(None), "egress": TokenBucket(None)}
+        self._lock = threading.Lock()
+        self._rates = None
+        self._checked = 0
+        self._update()
+
+    def rates(self, now=None):
+        """(ingress, egress) limits at `now` (default: the current local time)."""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        # Before the first start time, yesterday's last entry still applies
+        current = self._periods[-1]
+        for period in self._periods:
+            if period[0] <= minute:
+                current = period
+        return current[1], current[2]
+
+    def _update(self):
+        with self._lock:
+            if self._rates is not None and time.monotonic() - self._checked < 1:
+                return
+            self._checked = time.monotonic()
+            rates = self.rates()
+            if rates == self._rates:
+                return
+            self._rates = rates
+            for direction, rate in zip(("ingress", "egress"), rates):
+                self._buckets[direction].set_rate(rate, capacity=rate * self._burst_seconds if rate else None)
+        logger.info(f"🚦 מגבלת רוחב פס: הורדה {_format_rate(rates[0])} | העלאה {_format_rate(rates[1])}")
+
+    def limit(self, direction):
+        """The limit in force for `direction`, in bytes per second (None = unlimited)."""
+        self._update()
+        return self._rates[0 if direction == "ingress" else 1]
+
+    def _take(self, direction, nbytes):
+        self._update()
+        wait = self._buckets[direction]._take(nbytes)
+        if wait:
+            METRICS.inc("bandwidth_wait_seconds_total", min(wait, 1.0), direction=direction)
+        return wait
+
+    def acquire(self, direction, nbytes):
+        """Block until nbytes may be transferred in `direction` ("ingress" / "egress")."""
+        while True:
+            wait = self._take(direction, nbytes)
+            if not wait:
+                return
+            # Short sleeps, so a schedule change also releases waiting transfers
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self, direction, nbytes):
+        """acquire() for coroutines."""
+        import asyncio
+
+        while True:
+            wait = self._take(direction, nbytes)
+            if not wait:
+                return
+            await asyncio.sleep(min(wait, 1.0))
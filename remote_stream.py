@@ -0,0 +1,193 @@
+import io
+import logging
+import os
+import time
+
+import requests
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+logger = logging.getLogger(__name__)
+
+# How many recently read bytes are kept in memory so that a chunk YouTube did
+# not acknowledge can be re-sent without going back to the source
+STREAM_WINDOW_BYTES = 1024 * 1024 * 16
+STREAM_READ_SIZE = 1024 * 1024
+
+
+class RemoteRangeStream(io.RawIOBase):
+    """
+    Read-only, seekable file-like view over a remote object.
+
+    Bytes are pulled sequentially from a single streaming GET. The last
+    STREAM_WINDOW_BYTES are kept in memory; seeking outside that window (or a
+    dropped connection) re-opens the source with a Range header from the
+    requested offset.
+
+    Args:
+        url_factory: Callable returning a (freshly signed) URL for the object
+        size: Object size in bytes, probed from the server when omitted
+        bandwidth: Optional rate_limit.BandwidthGovernor the reads are paced by
+    """
+
+    def __init__(self, url_factory, size=None, window_bytes=STREAM_WINDOW_BYTES,
+                 max_retries=5, timeout=30, bandwidth=None):
+        super().__init__()
+        self._url_factory = url_factory
+        self._url = url_factory()
+        self._window_bytes = window_bytes
+        self._max_retries = max_retries
+        self._timeout = timeout
+        self._bandwidth = bandwidth
+
+        self._pos = 0
+        self._response = None
+        self._stream_pos = 0
+        self._window = bytearray()
+        self._window_start = 0
+
+        self.etag = None
+        self.size = size if size is not None else self._probe_size()
+
+    def _probe_size(self):
+        r = requests.head(self._url, timeout=self._timeout, allow_redirects=True)
+        if r.status_code in (401, 403):
+            self._url = self._url_factory()
+            r = requests.head(self._url, timeout=self._timeout, allow_redirects=True)
+        r.raise_for_status()
+        self.etag = r.headers.get("etag", "").strip('"') or None
+        size = r.headers.get("content-length")
+        if size is None:
+            raise ValueError(f"Server did not report Content-Length for {self._url}")
+        return int(size)
+
+    # --- io.RawIOBase interface -------------------------------------------------
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._pos
+        size = min(size, self.size - self._pos)
+        if size <= 0:
+            return b""
+
+        out = bytearray()
+
+        # Serve what we can from the in-memory window
+        window_end = self._window_start + len(self._window)
+        if self._window_start <= self._pos < window_end:
+            start = self._pos - self._window_start
+            piece = self._window[start:start + size]
+            out += piece
+            self._pos += len(piece)
+
+        while len(out) < size:
+            piece = self._read_source(size - len(out))
+            out += piece
+            self._pos += len(piece)
+
+        return bytes(out)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._close_response()
+        self._window = bytearray()
+        super().close()
+
+    # --- source handling --------------------------------------------------------
+
+    def _close_response(self):
+        if self._response is not None:
+            try:
+                self._response.close()
+            except Exception:
+                pass
+            self._response = None
+
+    def _open_source(self, offset):
+        """(Re)open the source at the given offset with a Range request."""
+        self._close_response()
+        for refresh in (False, True):
+            if refresh:
+                self._url = self._url_factory()
+            r = requests.get(
+                self._url,
+                headers={"Range": f"bytes={offset}-"},
+                stream=True,
+                timeout=self._timeout,
+            )
+            if r.status_code in (401, 403) and not refresh:
+                # Signed URL expired - sign again and retry once
+                r.close()
+                continue
+            r.raise_for_status()
+            if offset and r.status_code != 206:
+                r.close()
+                raise RuntimeError("Source server ignored the Range header")
+            break
+
+        self._response = r
+        self._stream_pos = offset
+        # The window must stay contiguous with the stream
+        if self._stream_pos != self._window_start + len(self._window):
+            self._window = bytearray()
+            self._window_start = offset
+
+    def _read_source(self, size):
+        """Read up to `size` bytes at self._pos from the remote stream."""
+        for attempt in range(self._max_retries):
+            try:
+                if self._response is None or self._stream_pos != self._pos:
+                    if attempt:
+                        logger.info(f"🔁 מתחבר מחדש למקור מבייט {self._pos}")
+                    self._open_source(self._pos)
+                data = self._response.raw.read(min(size, STREAM_READ_SIZE), decode_content=True)
+                if not data:
+                    raise IOError(f"Source closed the stream at byte {self._stream_pos}")
+                self._stream_pos += len(data)
+                self._remember(data)
+                if self._bandwidth is not None:
+                    self._bandwidth.acquire("ingress", len(data))
+                return data
+            except (requests.exceptions.RequestException, Urllib3HTTPError, IOError) as e:
+                self._close_response()
+                response = getattr(e, "response", None)
+                if response is not None and response.status_code < 500:
+                    raise
+                if attempt >= self._max_retries - 1:
+                    raise
+                wait_time = min(2 ** attempt, 30)
+                logger.warning(f"⚠️ ניתוק בקריאה מהמקור ({str(e)}). ממתין {wait_time} שניות...")
+                time.sleep(wait_time)
+
+    def _remember(self, data):
+        self._window += data
+        overflow = len(self._window) - self._window_bytes
+        if overflow > 0:
+            del self._window[:overflow]
+            self._window_start += overflow
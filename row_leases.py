@@ -0,0 +1,63 @@
+import logging
+import os
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class RowLeases:
+    """
+    Row claiming for several uploader processes sharing one state database.
+
+    A worker processes a row only after claim() leased it. A background
+    thread renews the worker's leases every heartbeat_seconds, so the rows of
+    a worker that died are reclaimed by the others ttl seconds later. Finished
+    rows stay leased as done until every worker of the run has left.
+    """
+
+    def __init__(self, state, worker_id, ttl, heartbeat_seconds):
+        self.state = state
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.heartbeat_seconds = heartbeat_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        others = self.state.join_workers(self.worker_id, self.ttl)
+        logger.info(f"🤝 עובד {self.worker_id} הצטרף לריצה ({others} עובדים נוספים פעילים)")
+        self._thread = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.state.heartbeat(self.worker_id, self.ttl)
+            except Exception as e:
+                # The next beat tries again; leases only expire after ttl
+                logger.warning(f"⚠️ חידוש החכירות נכשל: {str(e)}")
+
+    def claim(self, row_id):
+        return self.state.claim_row(row_id, self.worker_id, self.ttl)
+
+    def finish(self, row_id):
+        self.state.finish_row(row_id, self.worker_id)
+
+    def stop(self):
+        """
+        Leave the run and release unfinished rows.
+
+        Returns:
+            True if this was the last live worker (the one that writes the CSV)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        remaining = self.state.leave_workers(self.worker_id, self.ttl)
+        logger.info(f"👋 עובד {self.worker_id} סיים ({remaining} עובדים עדיין פעילים)")
+        return remaining == 0
@@ -0,0 +1,97 @@
+import csv
+
+from state_store import row_key
+
+# CSV columns exposed on VideoRow (missing columns read as "")
+ROW_FIELDS = (
+    "id", "url", "length", "title", "added", "cat", "rabi",
+    "uploaded", "youtube_url", "provider_updated", "remote_deleted",
+)
+
+
+class VideoRow:
+    """One CSV row. `index` is the 0-based data row number in the file."""
+
+    __slots__ = ("index",) + ROW_FIELDS
+
+    def __init__(self, index, **values):
+        self.index = index
+        for field in ROW_FIELDS:
+            setattr(self, field, values.get(field, ""))
+
+    @property
+    def key(self):
+        return row_key(self.id, self.index)
+
+    def get(self, name, default=""):
+        return getattr(self, name, default)
+
+
+class CsvRowSource:
+    """
+    Streaming reader over the videos CSV.
+
+    Rows are parsed one at a time with the csv module; rows filtered out by
+    `status` are skipped before a VideoRow is built. Values journaled in the
+    state store (see state_store.StateStore.current) override the CSV.
+    """
+
+    def __init__(self, path, journal=None):
+        self.path = path
+        self.journal = journal or {}
+
+    def _records(self):
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            positions = {name: pos for pos, name in enumerate(header) if name in ROW_FIELDS}
+            yield positions
+            for idx, record in enumerate(reader):
+                yield idx, record
+
+    def _is_uploaded(self, positions, idx, record):
+        id_pos = positions.get("id")
+        overlay = self.journal.get(row_key(record[id_pos] if id_pos is not None and id_pos < len(record) else "", idx))
+        if overlay and "uploaded" in overlay:
+            value = overlay["uploaded"]
+        else:
+            pos = positions.get("uploaded")
+            value = record[pos] if pos is not None and pos < len(record) else ""
+        return value.strip().lower() == "yes"
+
+    def rows(self, status="pending"):
+        """
+        Yield VideoRow objects.
+
+        Args:
+            status: "pending" (skip rows with uploaded == yes), "uploaded"
+                (only those) or "all"
+        """
+        records = self._records()
+        positions = next(records)
+        for idx, record in records:
+            if status != "all":
+                uploaded = self._is_uploaded(positions, idx, record)
+                if uploaded != (status == "uploaded"):
+                    continue
+            values = {name: record[pos] for name, pos in positions.items() if pos < len(record)}
+            row = VideoRow(idx, **values)
+            overlay = self.journal.get(row.key)
+            if overlay:
+                for field, value in overlay.items():
+                    setattr(row, field, value)
+            yield row
+
+    def __iter__(self):
+        return self.rows("all")
+
+    def counts(self):
+        """Return (total rows, uploaded rows) with a single streaming pass."""
+        total = uploaded = 0
+        records = self._records()
+        positions = next(records)
+        for idx, record in records:
+            total += 1
+            if self._is_uploaded(positions, idx, record):
+                uploaded += 1
+        return total, uploaded
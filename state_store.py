@@ -0,0 +1,426 @@
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STATE_DB_FILE = "videos_state.db"
+
+# Columns whose transitions are journaled instead of rewriting the CSV
+TRACKED_FIELDS = ("uploaded", "youtube_url", "provider_updated", "remote_deleted")
+
+
+def row_key(csv_id, idx):
+    """Journal key of a CSV row: its `id`, or its position when the id is empty."""
+    csv_id = str(csv_id or "").strip()
+    return csv_id if csv_id else f"#{idx}"
+
+
+class StateStore:
+    """
+    Append-only journal of per-row status transitions, kept in SQLite (WAL).
+
+    Every call to record() appends one row per field; the current state of a
+    CSV row is the latest value journaled for each field. export_csv() folds
+    the journal back into the CSV with an atomic rename and then compacts the
+    journal, so a crash at any point leaves either the old or the new CSV plus
+    a journal that can be replayed on top of it.
+    """
+
+    def __init__(self, path=STATE_DB_FILE, journal_mode="WAL"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        # WAL needs shared memory between the processes - "DELETE" for a database on NFS/SMB
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transitions (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                row_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                ts REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS transitions_row ON transitions (row_id)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS upload_sessions (
+                session_key TEXT PRIMARY KEY,
+                uri TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quota_usage (
+                credential TEXT NOT NULL,
+                day TEXT NOT NULL,
+                call_type TEXT NOT NULL,
+                units INTEGER NOT NULL,
+                PRIMARY KEY (credential, day, call_type)
+            )
+            """
+        )
+
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS content_index (
+                fingerprint TEXT PRIMARY KEY,
+                youtube_url TEXT NOT NULL,
+                row_id TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS run_settings (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS workers (
+                worker TEXT PRIMARY KEY,
+                started REAL NOT NULL,
+                heartbeat REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS row_leases (
+                row_id TEXT PRIMARY KEY,
+                worker TEXT NOT NULL,
+                expires REAL NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record(self, row_id, **fields):
+        """Journal new values for a row. All fields are written in one transaction."""
+        unknown = set(fields) - set(TRACKED_FIELDS)
+        if unknown:
+            raise ValueError(f"Untracked fields: {', '.join(sorted(unknown))}")
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "INSERT INTO transitions (row_id, field, value, ts) VALUES (?, ?, ?, ?)",
+                    [(row_id, field, str(value), now) for field, value in fields.items()],
+                )
+
+    def get(self, row_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field, value FROM transitions WHERE row_id = ? ORDER BY seq", (row_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def current(self):
+        """Latest journaled values of every row: {row_id: {field: value}}."""
+        state = {}
+        with self._lock:
+            for row_id, field, value in self._conn.execute(
+                "SELECT row_id, field, value FROM transitions ORDER BY seq"
+            ):
+                state.setdefault(row_id, {})[field] = value
+        return state
+
+    def export_csv(self, csv_path):
+        """
+        Write the journaled state back into csv_path atomically and compact the journal.
+
+        Returns:
+            Number of rows whose values were changed in the CSV
+        """
+        with self._lock:
+            last_seq = self._conn.execute("SELECT MAX(seq) FROM transitions").fetchone()[0]
+        if last_seq is None:
+            return 0
+
+        state = {}
+        with self._lock:
+            for row_id, field, value in self._conn.execute(
+                "SELECT row_id, field, value FROM transitions WHERE seq <= ? ORDER BY seq", (last_seq,)
+            ):
+                state.setdefault(row_id, {})[field] = value
+
+        tmp_path = f"{csv_path}.tmp"
+        changed = 0
+        with open(csv_path, newline="", encoding="utf-8-sig") as src, \
+                open(tmp_path, "w", newline="", encoding="utf-8") as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst, lineterminator="\n")
+            header = next(reader, [])
+            for field in TRACKED_FIELDS:
+                if field not in header and any(field in values for values in state.values()):
+                    header.append(field)
+            columns = {name: pos for pos, name in enumerate(header)}
+            id_pos = columns.get("id")
+            writer.writerow(header)
+
+            for idx, record in enumerate(reader):
+                record += [""] * (len(header) - len(record))
+                values = state.get(row_key(record[id_pos] if id_pos is not None else "", idx))
+                if values:
+                    for field, value in values.items():
+                        record[columns[field]] = value
+                    changed += 1
+                writer.writerow(record)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        os.replace(tmp_path, csv_path)
+
+        # Everything up to last_seq is now in the CSV
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM transitions WHERE seq <= ?", (last_seq,))
+        logger.info(f"💾 מצב {changed} שורות נכתב לקובץ {csv_path}")
+        return changed
+
+    # --- YouTube resumable upload sessions --------------------------------------
+
+    def get_upload_session(self, session_key):
+        """Return (uri, offset, created) of a saved upload session, or None."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT uri, offset, created FROM upload_sessions WHERE session_key = ?", (session_key,)
+            ).fetchone()
+
+    def save_upload_session(self, session_key, uri, offset):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO upload_sessions (session_key, uri, offset, created, updated)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (session_key) DO UPDATE SET
+                    offset = excluded.offset,
+                    updated = excluded.updated,
+                    created = CASE WHEN upload_sessions.uri = excluded.uri
+                                   THEN upload_sessions.created ELSE excluded.created END,
+                    uri = excluded.uri
+                """,
+                (session_key, uri, offset, now, now),
+            )
+
+    def drop_upload_session(self, session_key):
+        with self._lock:
+            self._conn.execute("DELETE FROM upload_sessions WHERE session_key = ?", (session_key,))
+
+    def purge_upload_sessions(self, max_age_seconds):
+        """Forget sessions older than max_age_seconds. Returns the number removed."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM upload_sessions WHERE created < ?", (time.time() - max_age_seconds,)
+            )
+            return cursor.rowcount
+
+    # --- YouTube API quota ledger ----------------------------------------------
+
+    def quota_used(self, day):
+        """Units spent per credential on a quota day: {credential: units}."""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT credential, SUM(units) FROM quota_usage WHERE day = ? GROUP BY credential", (day,)
+            ).fetchall())
+
+    def quota_report(self, day):
+        """Units spent on a quota day broken down by call type: [(credential, call_type, units)]."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT credential, call_type, units FROM quota_usage WHERE day = ? ORDER BY credential, call_type",
+                (day,),
+            ).fetchall()
+
+    def spend_quota(self, credential, day, call_type, units, limit=None):
+        """
+        Add units to a credential's ledger for the day (negative units refund).
+
+        With a limit, the units are only spent if the day's total stays within
+        it; the check and the write happen in one transaction so several
+        processes sharing the database cannot overspend.
+
+        Returns:
+            True if the units were recorded
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                if limit is not None:
+                    used = self._conn.execute(
+                        "SELECT COALESCE(SUM(units), 0) FROM quota_usage WHERE credential = ? AND day = ?",
+                        (credential, day),
+                    ).fetchone()[0]
+                    if used + units > limit:
+                        return False
+                self._conn.execute(
+                    """
+                    INSERT INTO quota_usage (credential, day, call_type, units) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (credential, day, call_type) DO UPDATE SET units = units + excluded.units
+                    """,
+                    (credential, day, call_type, units),
+                )
+                return True
+
+    # --- Content deduplication index -------------------------------------------
+
+    def find_content(self, fingerprints):
+        """Return (youtube_url, row_id) of the first fingerprint already uploaded, or None."""
+        with self._lock:
+            for fingerprint in fingerprints:
+                found = self._conn.execute(
+                    "SELECT youtube_url, row_id FROM content_index WHERE fingerprint = ?", (fingerprint,)
+                ).fetchone()
+                if found:
+                    return found
+        return None
+
+    def index_content(self, fingerprints, youtube_url, row_id):
+        """Map fingerprints to an uploaded video. The first video indexed for a fingerprint wins."""
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO content_index (fingerprint, youtube_url, row_id, created) VALUES (?, ?, ?, ?)",
+                    [(fingerprint, youtube_url, row_id, now) for fingerprint in fingerprints if fingerprint],
+                )
+
+    def indexed_rows(self):
+        """Row ids that already have a fingerprint in the index."""
+        with self._lock:
+            return {row_id for (row_id,) in self._conn.execute("SELECT DISTINCT row_id FROM content_index")}
+
+    # --- Values learned by one run for the next ---------------------------------
+
+    def get_setting(self, name, default=None):
+        """JSON value saved by set_setting(), or default."""
+        with self._lock:
+            found = self._conn.execute("SELECT value FROM run_settings WHERE name = ?", (name,)).fetchone()
+        return json.loads(found[0]) if found else default
+
+    def set_setting(self, name, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO run_settings (name, value, updated) VALUES (?, ?, ?)",
+                (name, json.dumps(value), time.time()),
+            )
+
+    # --- Row leases of multi-node runs ------------------------------------------
+
+    def join_workers(self, worker, ttl):
+        """
+        Register a worker. Workers without a heartbeat for ttl seconds are
+        dropped; when no live worker is left, the previous run's leases are
+        cleared so every pending row can be claimed again.
+
+        Returns:
+            Number of other live workers
+        """
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute("DELETE FROM workers WHERE heartbeat < ? AND worker != ?", (now - ttl, worker))
+                others = self._conn.execute("SELECT COUNT(*) FROM workers WHERE worker != ?", (worker,)).fetchone()[0]
+                if not others:
+                    self._conn.execute("DELETE FROM row_leases")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO workers (worker, started, heartbeat) VALUES (?, ?, ?)", (worker, now, now)
+                )
+                return others
+
+    def heartbeat(self, worker, ttl):
+        """Keep a worker alive and extend every lease it holds by ttl seconds."""
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute("UPDATE workers SET heartbeat = ? WHERE worker = ?", (now, worker))
+                self._conn.execute(
+                    "UPDATE row_leases SET expires = ? WHERE worker = ? AND done = 0", (now + ttl, worker)
+                )
+
+    def live_workers(self, ttl):
+        """Names of the registered workers with a heartbeat in the last ttl seconds."""
+        with self._lock:
+            return [
+                worker for (worker,) in self._conn.execute(
+                    "SELECT worker FROM workers WHERE heartbeat >= ?", (time.time() - ttl,)
+                )
+            ]
+
+    def leave_workers(self, worker, ttl):
+        """
+        Unregister a worker and give up the leases of rows it did not finish.
+
+        Returns:
+            Number of live workers still running
+        """
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute("DELETE FROM workers WHERE worker = ?", (worker,))
+                self._conn.execute("DELETE FROM row_leases WHERE worker = ? AND done = 0", (worker,))
+                return self._conn.execute(
+                    "SELECT COUNT(*) FROM workers WHERE heartbeat >= ?", (now - ttl,)
+                ).fetchone()[0]
+
+    def claim_row(self, row_id, worker, ttl):
+        """
+        Lease a row for ttl seconds. Fails while another worker holds a live
+        lease or once the row was finished in this run; an expired lease (its
+        worker died) is taken over.
+
+        Returns:
+            True if the row is now leased to worker
+        """
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                lease = self._conn.execute(
+                    "SELECT worker, expires, done FROM row_leases WHERE row_id = ?", (row_id,)
+                ).fetchone()
+                if lease is not None:
+                    holder, expires, done = lease
+                    if done or (holder != worker and expires >= now):
+                        return False
+                    if holder != worker:
+                        logger.info(f"♻️ החכירה של {holder} על שורה {row_id} פגה - השורה נלקחת מחדש")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO row_leases (row_id, worker, expires, done) VALUES (?, ?, ?, 0)",
+                    (row_id, worker, now + ttl),
+                )
+                return True
+
+    def finish_row(self, row_id, worker):
+        """Mark a leased row as handled, so no worker claims it again in this run."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE row_leases SET done = 1 WHERE row_id = ? AND worker = ?", (row_id, worker)
+                )
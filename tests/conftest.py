@@ -0,0 +1,14 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def uploader(tmp_path, monkeypatch):
+    """youtube_uploader, imported inside tmp_path (it opens its log file on import)."""
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module("youtube_uploader")
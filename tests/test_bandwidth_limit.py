@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+MIB = 1024 * 1024
+
+
+@pytest.mark.parametrize("mode", ["sequential", "async"])
+def test_paced_uploads_leave_the_chunk_size_alone(mode, uploader, tmp_path, monkeypatch):
+    pytest.importorskip("googleapiclient")
+    if mode == "async":
+        pytest.importorskip("aiohttp")
+    import run_benchmark
+
+    monkeypatch.setattr(uploader, "_chunk_tuner", None)
+    monkeypatch.setattr(uploader, "_bandwidth_governor", None)
+    report = run_benchmark.main([
+        "--rows", "3", "--size-mb", "12", "--chunk-mb", "4", "--mode", mode,
+        "--limit-mbps", "80", "--skip-cleanup", "--workdir", str(tmp_path / "bench"),
+    ])
+    upload = report["stages"][0]
+    assert upload["error"] is None and upload["rows_uploaded"] == 3
+    # At most about one second of the 10 MB/s limit per chunk
+    assert upload["largest_chunk_mb"] <= 10 * 1000 * 1000 / MIB
+    tuner = uploader.chunk_tuner()
+    assert tuner.chunk_size >= 4 * MIB
+    assert tuner.stats()["rates"] == {}
@@ -0,0 +1,62 @@
+import os
+from types import SimpleNamespace
+
+from download_cache import DownloadCache
+
+
+def _download(cache, path, size):
+    assert cache.reserve(path, size)
+    with open(cache.part_path(path), "wb") as f:
+        f.write(b"x" * size)
+    cache.commit(path, size)
+
+
+def test_workers_sharing_a_download_folder_keep_each_others_files(uploader, tmp_path, monkeypatch):
+    monkeypatch.setattr(uploader, "DOWNLOAD_FOLDER", str(tmp_path / "downloads"))
+    caches = []
+    for worker_id in ("node-1", "node-2"):
+        monkeypatch.setattr(uploader, "_row_leases", SimpleNamespace(worker_id=worker_id))
+        os.makedirs(uploader.download_folder())
+        caches.append(DownloadCache(uploader.download_folder(), max_bytes=100))
+    first, second = caches
+    assert first.folder != second.folder
+
+    # One worker's finished download waits for its upload, another one is half written
+    waiting = first.path_for("/videos/a.mp4")
+    _download(first, waiting, 60)
+    in_flight = first.path_for("/videos/b.mp4")
+    assert first.reserve(in_flight, 30)
+    with open(first.part_path(in_flight), "wb") as f:
+        f.write(b"x" * 10)
+
+    # The other worker fills its own cap without evicting them
+    _download(second, second.path_for("/videos/c.mp4"), 90)
+    second.release(second.path_for("/videos/c.mp4"))
+    _download(second, second.path_for("/videos/d.mp4"), 90)
+
+    assert os.path.getsize(waiting) == 60
+    assert os.path.getsize(first.part_path(in_flight)) == 10
+    assert not os.path.exists(second.path_for("/videos/c.mp4"))
+
+
+def test_single_process_caches_in_download_folder(uploader, tmp_path, monkeypatch):
+    monkeypatch.setattr(uploader, "DOWNLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(uploader, "_row_leases", None)
+    assert uploader.download_folder() == str(tmp_path)
+
+
+def test_folders_of_workers_that_left_are_purged(uploader, tmp_path, monkeypatch):
+    from state_store import StateStore
+
+    monkeypatch.setattr(uploader, "DOWNLOAD_FOLDER", str(tmp_path / "downloads"))
+    monkeypatch.setattr(uploader, "_row_leases", SimpleNamespace(worker_id="node-1"))
+    state = StateStore(str(tmp_path / "state.db"))
+    state.join_workers("node-1", 300)
+    state.join_workers("node-2", 300)
+    for worker_id in ("node-1", "node-2", "node-3"):
+        os.makedirs(tmp_path / "downloads" / worker_id)
+
+    uploader.purge_worker_folders(state)
+
+    assert sorted(os.listdir(tmp_path / "downloads")) == ["node-1", "node-2"]
+    state.close()
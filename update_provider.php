@@ -8,6 +8,14 @@
  * Response:
  *   { "ok": true, "id": 14434, "youtube_url": "https://www.youtube.com/watch?v=XXXX" }
  *
+ * Batch usage (POST, Content-Type: application/json):
+ *   { "items": [ { "id": 14434, "youtube_url": "https://www.youtube.com/watch?v=XXXX" }, ... ] }
+ *
+ * Batch response (all rows are updated in a single transaction):
+ *   { "ok": true, "updated": 1, "results": { "14434": "updated", "99999": "not_found" } }
+ *   Per-id results: "updated", "not_found" or "invalid", keyed by each id exactly
+ *   as it was sent (e.g. "007" stays "007").
+ *
  * SECURITY:
  * - Consider restricting by an auth token or IP allowlist in production.
  * - Use HTTPS only.
@@ -15,12 +23,193 @@
 
 header('Content-Type: application/json; charset=utf-8');
 
+// Max items accepted in one POST
+const MAX_BATCH_ITEMS = 500;
+
 function respond($code, array $data) {
     http_response_code((int) $code);
     echo json_encode($data, JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES);
     exit;
 }
 
+function db_connect() {
+    // DB credentials (provided)
+    $dbHost = 'localhost';
+    $dbName = '';
+    $dbUser = '';
+    $dbPass = '';
+    $dbCharset = 'utf8mb4';
+
+    $conn = mysqli_init();
+    mysqli_options($conn, MYSQLI_OPT_INT_AND_FLOAT_NATIVE, 1);
+
+    if (!mysqli_real_connect($conn, $dbHost, $dbUser, $dbPass, $dbName)) {
+        respond(500, [
+            'ok' => false,
+            'error' => 'db_connection_failed',
+            'message' => mysqli_connect_error(),
+        ]);
+    }
+
+    if (!mysqli_set_charset($conn, $dbCharset)) {
+        respond(500, [
+            'ok' => false,
+            'error' => 'db_charset_failed',
+            'message' => mysqli_error($conn),
+        ]);
+    }
+
+    return $conn;
+}
+
+function handle_batch() {
+    $payload = json_decode(file_get_contents('php://input'), true);
+    $items = is_array($payload) && isset($payload['items']) && is_array($payload['items'])
+        ? $payload['items']
+        : null;
+
+    if ($items === null || count($items) === 0) {
+        respond(400, [
+            'ok' => false,
+            'error' => 'missing_parameters',
+            'message' => 'Required JSON body: {"items": [{"id": int, "youtube_url": string}, ...]}'
+        ]);
+    }
+
+    if (count($items) > MAX_BATCH_ITEMS) {
+        respond(413, [
+            'ok' => false,
+            'error' => 'batch_too_large',
+            'message' => 'At most ' . MAX_BATCH_ITEMS . ' items per request',
+        ]);
+    }
+
+    // Validate items; the last URL wins if an id is repeated
+    $results = [];
+    $urls = [];
+    $keys = [];  // id => the id strings the client sent for it
+    foreach ($items as $item) {
+        $id = isset($item['id']) ? (int) $item['id'] : 0;
+        $youtubeUrl = isset($item['youtube_url']) ? trim((string) $item['youtube_url']) : '';
+        $key = isset($item['id']) ? (string) $item['id'] : '';
+        if ($id <= 0 || $youtubeUrl === '' || !filter_var($youtubeUrl, FILTER_VALIDATE_URL)) {
+            $results[$key] = 'invalid';
+            continue;
+        }
+        $urls[$id] = $youtubeUrl;
+        $keys[$id][$key] = true;
+    }
+
+    if (count($urls) === 0) {
+        respond(400, [
+            'ok' => false,
+            'error' => 'invalid_items',
+            'results' => (object) $results,
+        ]);
+    }
+
+    $conn = db_connect();
+    $ids = array_keys($urls);
+    $placeholders = implode(',', array_fill(0, count($ids), '?'));
+
+    if (!mysqli_begin_transaction($conn)) {
+        respond(500, [
+            'ok' => false,
+            'error' => 'db_transaction_failed',
+            'message' => mysqli_error($conn),
+        ]);
+    }
+
+    // Which ids exist (affected_rows does not count rows whose provider is unchanged)
+    $stmt = mysqli_prepare($conn, "SELECT id FROM mm_jmultimedia WHERE id IN ($placeholders) FOR UPDATE");
+    if (!$stmt) {
+        mysqli_rollback($conn);
+        respond(500, [
+            'ok' => false,
+            'error' => 'prepare_failed',
+            'message' => mysqli_error($conn),
+        ]);
+    }
+    mysqli_stmt_bind_param($stmt, str_repeat('i', count($ids)), ...$ids);
+    mysqli_stmt_execute($stmt);
+    $found = [];
+    $res = mysqli_stmt_get_result($stmt);
+    while ($row = mysqli_fetch_row($res)) {
+        $found[(int) $row[0]] = true;
+    }
+    mysqli_stmt_close($stmt);
+
+    $existing = array_values(array_filter($ids, function ($id) use ($found) {
+        return isset($found[$id]);
+    }));
+
+    if (count($existing) > 0) {
+        // Single multi-row UPDATE: provider = CASE id WHEN ? THEN ? ... END
+        $cases = implode(' ', array_fill(0, count($existing), 'WHEN ? THEN ?'));
+        $inList = implode(',', array_fill(0, count($existing), '?'));
+        $sql = "UPDATE mm_jmultimedia SET provider = CASE id $cases END WHERE id IN ($inList)";
+        $stmt = mysqli_prepare($conn, $sql);
+        if (!$stmt) {
+            mysqli_rollback($conn);
+            respond(500, [
+                'ok' => false,
+                'error' => 'prepare_failed',
+                'message' => mysqli_error($conn),
+            ]);
+        }
+
+        $types = '';
+        $params = [];
+        foreach ($existing as $id) {
+            $types .= 'is';
+            $params[] = $id;
+            $params[] = $urls[$id];
+        }
+        $types .= str_repeat('i', count($existing));
+        foreach ($existing as $id) {
+            $params[] = $id;
+        }
+        mysqli_stmt_bind_param($stmt, $types, ...$params);
+
+        if (!mysqli_stmt_execute($stmt)) {
+            $error = mysqli_stmt_error($stmt);
+            mysqli_rollback($conn);
+            respond(500, [
+                'ok' => false,
+                'error' => 'db_update_failed',
+                'message' => $error,
+            ]);
+        }
+        mysqli_stmt_close($stmt);
+    }
+
+    if (!mysqli_commit($conn)) {
+        respond(500, [
+            'ok' => false,
+            'error' => 'db_commit_failed',
+            'message' => mysqli_error($conn),
+        ]);
+    }
+    mysqli_close($conn);
+
+    // Echo the ids as sent, so the client finds "007" under "007" and not "7"
+    foreach ($ids as $id) {
+        foreach (array_keys($keys[$id]) as $key) {
+            $results[(string) $key] = isset($found[$id]) ? 'updated' : 'not_found';
+        }
+    }
+
+    respond(200, [
+        'ok' => true,
+        'updated' => count($existing),
+        'results' => (object) $results,
+    ]);
+}
+
+if ($_SERVER['REQUEST_METHOD'] === 'POST') {
+    handle_batch();
+}
+
 // Validate input
 $id = isset($_GET['id']) ? (int) $_GET['id'] : 0;
 $youtubeUrl = isset($_GET['youtube_url']) ? trim($_GET['youtube_url']) : '';
@@ -42,31 +231,7 @@ if (!filter_var($youtubeUrl, FILTER_VALIDATE_URL)) {
     ]);
 }
 
-// DB credentials (provided)
-$dbHost = 'localhost';
-$dbName = '';
-$dbUser = '';
-$dbPass = '';
-$dbCharset = 'utf8mb4';
-
-$conn = mysqli_init();
-mysqli_options($conn, MYSQLI_OPT_INT_AND_FLOAT_NATIVE, 1);
-
-if (!mysqli_real_connect($conn, $dbHost, $dbUser, $dbPass, $dbName)) {
-    respond(500, [
-        'ok' => false,
-        'error' => 'db_connection_failed',
-        'message' => mysqli_connect_error(),
-    ]);
-}
-
-if (!mysqli_set_charset($conn, $dbCharset)) {
-    respond(500, [
-        'ok' => false,
-        'error' => 'db_charset_failed',
-        'message' => mysqli_error($conn),
-    ]);
-}
+$conn = db_connect();
 
 $sql = "UPDATE mm_jmultimedia SET provider = ? WHERE id = ?";
 $stmt = mysqli_prepare($conn, $sql);
@@ -1,26 +1,52 @@
 import os
-import pandas as pd
+import re
+import argparse
 import requests
-from tqdm import tqdm
 import pickle
 import urllib.parse
 import logging
 import time
 import hmac
 import hashlib
+import json
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime, timezone
-import re  # ניקוי כותרות
+import mimetypes
+import shutil
 
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+# googleapiclient, google-auth, tqdm and aiohttp are imported by the code
+# paths that use them - runs with nothing to upload never load them
+from chunk_tuner import ChunkTuner, align_chunk
+from download_cache import DownloadCache
+from metadata import EMPTY_TITLE, TITLE_TRUNCATED, MetadataBuilder
+from metrics import METRICS, start_metrics_server
+from quota import Credential, CredentialPool, QuotaExceeded, is_quota_error, seconds_until_reset
+from rate_limit import BandwidthGovernor
+from remote_stream import RemoteRangeStream
+from row_leases import RowLeases, default_worker_id
+from row_source import CsvRowSource
+from state_store import StateStore
 
 CSV_FILE = "videos.csv"
 DOWNLOAD_FOLDER = "downloads"
 LOG_FILE = "upload_log.log"
-SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+# youtube.readonly lists the channel's videos for `reconcile` - a token.pickle
+# created before it was added must be deleted (and authorized again)
+SCOPES = ["https://www.googleapis.com/auth/youtube.upload", "https://www.googleapis.com/auth/youtube.readonly"]
+
+# Compact copy of the YouTube discovery document bundled with googleapiclient,
+# read whenever a service is built. Rebuilt when googleapiclient changes
+DISCOVERY_CACHE_FILE = "youtube_v3_discovery.json"
+
+# YouTube credentials pool - one entry per channel / Google Cloud project.
+# Each row is uploaded with whichever credential still has quota left today.
+YOUTUBE_CREDENTIALS = [
+    {"name": "main", "token_file": "token.pickle", "client_secrets": "credentials.json", "daily_quota": 10000},
+]
 
 # Storage configuration
 STORAGE_BASE = "https://storage101.lon3.clouddrive.com"
@@ -29,8 +55,14 @@ STORAGE_KEY = ""
 STORAGE_EXPIRES_SECONDS = 5700  # 5700 seconds = ~95 minutes
 
 BASE_WEBSITE_URL = ""
-# Endpoint on site to update DB provider field (GET)
+# Endpoint on site to update DB provider field (GET, or POST for batches)
 UPDATE_PROVIDER_ENDPOINT = ""
+# 0 = one GET per uploaded video; N > 0 = buffer N videos and send them as one POST
+PROVIDER_BATCH_SIZE = 0
+# After a failed batch, wait this long before the buffer is sent again
+PROVIDER_RETRY_SECONDS = 60
+# update_provider.php accepts at most this many items per POST
+PROVIDER_MAX_BATCH_ITEMS = 500
 
 # Setup logging
 logging.basicConfig(
@@ -44,6 +76,116 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 MAX_TITLE_LENGTH = 100
+# Titles / descriptions of all pending rows are checked before the run starts;
+# the problems found are written here (None = log only)
+METADATA_REPORT_FILE = "metadata_report.csv"
+
+# Match pending rows against the videos already on the channels before
+# uploading (what `python youtube_uploader.py reconcile` does on its own)
+RECONCILE_BEFORE_RUN = False
+# Items per playlistItems.list page and ids per videos.list call (API maximum: 50)
+RECONCILE_PAGE_SIZE = 50
+
+# Run mode: "sequential" (row by row), "pipeline" (download of the next rows
+# overlaps the upload of the current one) or "async" (asyncio + aiohttp)
+RUN_MODE = "sequential"
+PIPELINE_DOWNLOAD_WORKERS = 2
+PIPELINE_UPLOAD_WORKERS = 1
+# Max number of downloaded files waiting for an upload worker
+PIPELINE_QUEUE_SIZE = 2
+
+# RUN_MODE = "async": rows in flight per stage, over one shared connection pool
+ASYNC_DOWNLOADS = 4
+ASYNC_UPLOADS = 2
+ASYNC_NOTIFICATIONS = 4
+# Resumable upload endpoint the async mode talks to directly (no googleapiclient)
+YOUTUBE_UPLOAD_URL = "https://www.googleapis.com/upload/youtube/v3/videos"
+
+# Upload source: "disk" (download to DOWNLOAD_FOLDER first) or "stream"
+# (read the signed URL in chunks straight into the YouTube upload session)
+UPLOAD_SOURCE = "disk"
+UPLOAD_CHUNK_SIZE = 1024 * 1024 * 8
+
+# Tune the upload chunk size while uploading (starting from the size the
+# previous run settled on, or UPLOAD_CHUNK_SIZE on the first run)
+UPLOAD_CHUNK_ADAPTIVE = True
+UPLOAD_CHUNK_MIN = 1024 * 1024
+UPLOAD_CHUNK_MAX = 1024 * 1024 * 128
+# After this many error-free chunks in a row, send the rest of each file in a
+# single request (disk uploads only). None = always upload in chunks
+UPLOAD_SINGLE_REQUEST_AFTER = None
+
+# YouTube keeps resumable upload sessions for about a week
+UPLOAD_SESSION_MAX_AGE_SECONDS = 6 * 24 * 3600
+
+# When every credential is out of quota: False = stop (the next run continues),
+# True = sleep until the quota resets at midnight Pacific time and carry on
+QUOTA_WAIT_FOR_RESET = False
+# Extra wait after the reset, in case the clocks are not exactly in sync
+QUOTA_RESET_GRACE_SECONDS = 300
+
+# Upload order of pending rows: [] keeps the CSV order, otherwise a list of
+# (column, "asc" / "desc"), e.g. [("added", "desc")] for the newest lectures first
+UPLOAD_PRIORITY = []
+# Categories (`cat` values) uploaded before all others, in this order
+PRIORITY_CATEGORIES = []
+ADDED_DATE_FORMATS = ("%m/%d/%Y %H:%M", "%m/%d/%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+# Skip rows whose content was already uploaded (matched by storage ETag + size,
+# or size + hash of the first and last MiB); the row is linked to the existing
+# video. Off by default: it costs a HEAD (or two Range GETs) per row
+DEDUP_ENABLED = False
+# Fingerprint rows uploaded before the index existed (one HEAD request per row)
+DEDUP_BACKFILL = False
+
+# Check pending rows against a listing of the storage container before the run
+# (uses the Rackspace credentials set in cleanup_remote_files.py)
+PREFLIGHT_ENABLED = False
+# With more top-level folders than this, the whole container is listed at once
+PREFLIGHT_MAX_PREFIXES = 20
+
+# Delete a row's storage object as soon as its upload and site update
+# succeeded, in the background while the run goes on (uses the Rackspace
+# credentials set in cleanup_remote_files.py)
+REMOTE_CLEANUP_ENABLED = False
+# Delete requests in flight at once for the inline cleanup
+REMOTE_CLEANUP_CONCURRENCY = 2
+# DOWNLOAD_FOLDER is a managed cache: at most this many bytes (None = no cap),
+# and a download waits (or is postponed) if it would leave less free disk space
+# than DOWNLOAD_MIN_FREE_BYTES. Files of failed uploads are evicted first, then
+# the least recently used.
+DOWNLOAD_CACHE_MAX_BYTES = 1024 * 1024 * 1024 * 20
+DOWNLOAD_MIN_FREE_BYTES = 1024 * 1024 * 1024 * 2
+
+# Serve Prometheus metrics on http://127.0.0.1:<port>/metrics (None = off)
+METRICS_PORT = None
+# JSON summary of the run's metrics, written when the run ends (None = off)
+METRICS_SUMMARY_FILE = "upload_metrics.json"
+
+# Parallel Range requests per download (files below the minimum use one stream)
+DOWNLOAD_SEGMENTS = 4
+DOWNLOAD_SEGMENT_MIN_BYTES = 1024 * 1024 * 16
+
+# Bandwidth limits shared by all downloads / uploads of the process, as a list
+# of (start "HH:MM", download bytes/s, upload bytes/s); None = unlimited. Each
+# entry applies from its start (local time) until the next one and the limits
+# switch over while the run goes on. [] = no limits. For example 5 MB/s by day
+# and unlimited at night:
+#   [("07:00", 5 * 1000 * 1000, 5 * 1000 * 1000), ("22:00", None, None)]
+BANDWIDTH_SCHEDULE = []
+
+# State database (journal, upload sessions, quota ledger). WAL does not work
+# over NFS/SMB - use "DELETE" when the database is on network storage
+STATE_DB_FILE = "videos_state.db"
+STATE_DB_JOURNAL_MODE = "WAL"
+
+# Multi-node mode: several uploaders (on one or more machines) share CSV_FILE
+# and STATE_DB_FILE and claim rows through leases. Each process needs its own
+# WORKER_ID ("auto" = hostname-pid; None = single process, no leases)
+WORKER_ID = None
+# A worker's rows are reclaimed by the others this long after its last heartbeat
+LEASE_SECONDS = 300
+LEASE_HEARTBEAT_SECONDS = 60
 
 
 def generate_storage_url(video_path):
@@ -92,37 +234,149 @@ def notify_site_update_provider(csv_id: str, youtube_url: str) -> bool:
             "id": csv_id,
             "youtube_url": youtube_url,
         }
-        resp = requests.get(UPDATE_PROVIDER_ENDPOINT, params=params, timeout=15)
+        with METRICS.timer("provider_notify_seconds", mode="single"):
+            resp = requests.get(UPDATE_PROVIDER_ENDPOINT, params=params, timeout=15)
         if resp.status_code == 200:
+            METRICS.inc("provider_notify_total", result="yes")
             logger.info("🛰️ עודכן provider באתר עבור id=%s", csv_id)
             return True
         else:
+            METRICS.inc("provider_notify_total", result=f"http_{resp.status_code}")
             logger.warning("⚠️ עדכון provider נכשל (HTTP %s): %s", resp.status_code, resp.text[:300])
             return False
     except Exception as e:
+        METRICS.inc("provider_notify_total", result="error")
         logger.warning("⚠️ כשל בעדכון provider באתר: %s", str(e))
         return False
 
 
-def authenticate_youtube():
-    logger.info("🔐 מאמת את YouTube API...")
+def provider_result(results, csv_id):
+    """
+    The site's batch result for a CSV id. update_provider.php echoes each id
+    as sent; older versions key it by the id as an integer ("007" -> "7").
+    """
+    csv_id = str(csv_id)
+    if csv_id in results:
+        return results[csv_id]
+    try:
+        return results.get(str(int(csv_id)), "missing")
+    except ValueError:
+        return "missing"
+
+
+class ProviderNotifier:
+    """
+    Buffers (id, youtube_url) pairs and sends them to UPDATE_PROVIDER_ENDPOINT
+    as one JSON POST per batch.
+
+    provider_updated is journaled per row after each flush. Pairs that could
+    not be delivered (network error / 5xx) are marked "error" and kept in the
+    buffer, so the next flush retries them; a batch the site refused (4xx or
+    a reply without ok) is marked "error" and dropped. Rows added with an
+    object path go to the inline cleanup once the site is updated.
+    """
+
+    def __init__(self, state, batch_size=PROVIDER_BATCH_SIZE):
+        self.state = state
+        self.batch_size = max(batch_size, 1)
+        self._buffer = {}
+        self._lock = threading.Lock()
+        self._retry_at = 0
+
+    def add(self, key, csv_id, youtube_url, object_path=None):
+        if not csv_id or not youtube_url:
+            return
+        with self._lock:
+            self._buffer[key] = (csv_id, youtube_url, object_path)
+            if len(self._buffer) < self.batch_size or time.monotonic() < self._retry_at:
+                return
+        self.flush()
+
+    def flush(self):
+        while True:
+            # Taken out under the lock and sent without it, so add() never waits on the POST
+            with self._lock:
+                if not self._buffer:
+                    return
+                batch = dict(list(self._buffer.items())[:PROVIDER_MAX_BATCH_ITEMS])
+                for key in batch:
+                    del self._buffer[key]
+            if not self._send(batch):
+                return
+
+    def _send(self, batch):
+        """POST one batch. Returns False when it was put back for a retry."""
+        items = [{"id": csv_id, "youtube_url": url} for csv_id, url, _ in batch.values()]
+        try:
+            with METRICS.timer("provider_notify_seconds", mode="batch"):
+                resp = requests.post(UPDATE_PROVIDER_ENDPOINT, json={"items": items}, timeout=60)
+        except Exception as e:
+            logger.warning("⚠️ כשל בעדכון provider מרוכז באתר: %s", str(e))
+            resp = None
+
+        if resp is None or resp.status_code >= 500:
+            if resp is not None:
+                logger.warning("⚠️ עדכון provider מרוכז נכשל (HTTP %s): %s", resp.status_code, resp.text[:300])
+            # Back into the buffer for the next flush; a newer add() of a row wins
+            METRICS.inc("provider_notify_total", len(batch), result="error")
+            with self._lock:
+                self._retry_at = time.monotonic() + PROVIDER_RETRY_SECONDS
+                for key, item in batch.items():
+                    self._buffer.setdefault(key, item)
+            for key in batch:
+                self.state.record(key, provider_updated="error")
+            return False
+
+        try:
+            data = resp.json() if resp.status_code == 200 else None
+        except ValueError:
+            data = None
+        if not data or not data.get("ok"):
+            # Refused by the site (e.g. 400 invalid_items) - sending it again would not help
+            logger.warning("⚠️ האתר דחה עדכון provider מרוכז (HTTP %s): %s", resp.status_code, resp.text[:300])
+            METRICS.inc("provider_notify_total", len(batch), result=f"http_{resp.status_code}")
+            for key in batch:
+                self.state.record(key, provider_updated="error")
+            return True
+
+        results = data.get("results", {})
+        updated = 0
+        for key, (csv_id, _, object_path) in batch.items():
+            result = provider_result(results, csv_id)
+            ok = result == "updated"
+            METRICS.inc("provider_notify_total", result="yes" if ok else result)
+            self.state.record(key, provider_updated="yes" if ok else "error")
+            if ok:
+                queue_remote_delete(key, object_path)
+            # Rejected ids (not_found / invalid) are not retried in this run
+            updated += ok
+        logger.info("🛰️ עודכן provider באתר עבור %s/%s סרטונים", updated, len(batch))
+        return True
+
+
+def load_youtube_credentials(token_file="token.pickle", client_secrets_file="credentials.json"):
+    logger.info(f"🔐 מאמת את YouTube API ({token_file})...")
     creds = None
 
-    if os.path.exists("token.pickle"):
-        with open("token.pickle", "rb") as token:
+    if os.path.exists(token_file):
+        with open(token_file, "rb") as token:
             creds = pickle.load(token)
         logger.info("✅ טוקן נמצא ונטען")
-        logger.info("💡 אם אתה רוצה להתחבר לפרויקט חדש, מחק את קובץ token.pickle")
+        logger.info(f"💡 אם אתה רוצה להתחבר לפרויקט חדש, מחק את קובץ {token_file}")
 
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
+            from google.auth.transport.requests import Request
+
             logger.info("🔄 מרענן טוקן...")
             creds.refresh(Request())
         else:
+            from google_auth_oauthlib.flow import InstalledAppFlow
+
             logger.info("🌐 מבקש הרשאות חדשות...")
             try:
                 flow = InstalledAppFlow.from_client_secrets_file(
-                    "credentials.json", SCOPES
+                    client_secrets_file, SCOPES
                 )
                 creds = flow.run_local_server(port=0)
             except Exception as e:
@@ -133,26 +387,333 @@ def authenticate_youtube():
                     logger.error("1. היכנס ל-Google Cloud Console")
                     logger.error("2. לך ל-APIs & Services > OAuth consent screen")
                     logger.error("3. הוסף את עצמך ל-Test users")
-                    logger.error("4. מחק את token.pickle והפעל מחדש")
+                    logger.error(f"4. מחק את {token_file} והפעל מחדש")
                     logger.error("=" * 60)
                 raise
-        with open("token.pickle", "wb") as token:
+        with open(token_file, "wb") as token:
             pickle.dump(creds, token)
         logger.info("✅ אימות הושלם בהצלחה")
 
-    return build("youtube", "v3", credentials=creds)
+    return creds
+
+
+_discovery_document = None
+
+
+def youtube_discovery_document():
+    """
+    The YouTube v3 discovery document (JSON text). Read from
+    DISCOVERY_CACHE_FILE when the installed googleapiclient wrote it, else
+    built from the document bundled with googleapiclient and cached.
+
+    Returns:
+        None if googleapiclient has no bundled documents (older versions)
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        try:
+            from googleapiclient.discovery_cache import get_static_doc
+            from googleapiclient.version import __version__
+        except ImportError:
+            return None
+        version = f"googleapiclient {__version__} youtube v3"
+        try:
+            with open(DISCOVERY_CACHE_FILE, encoding="utf-8") as f:
+                if f.readline().rstrip("\n") == version:
+                    _discovery_document = f.read()
+        except OSError:
+            pass
+        if _discovery_document is None:
+            bundled = get_static_doc("youtube", "v3")
+            if bundled is None:
+                return None
+            # The whole document, so every method and schema the client may need stays in it
+            _discovery_document = json.dumps(json.loads(bundled), separators=(",", ":"))
+            try:
+                tmp_path = f"{DISCOVERY_CACHE_FILE}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(f"{version}\n{_discovery_document}")
+                os.replace(tmp_path, DISCOVERY_CACHE_FILE)
+            except OSError as e:
+                logger.warning(f"⚠️ לא הצלחתי לשמור את מסמך ה-discovery ב-{DISCOVERY_CACHE_FILE}: {str(e)}")
+    return _discovery_document
+
+
+def build_youtube(creds):
+    # googleapiclient service objects are not thread-safe - build one per worker
+    from googleapiclient.discovery import build, build_from_document
+
+    document = youtube_discovery_document()
+    if document is None:
+        return build("youtube", "v3", credentials=creds)
+    return build_from_document(document, credentials=creds)
+
+
+def authenticate_youtube():
+    return build_youtube(load_youtube_credentials())
+
 
+def load_credential_pool(state):
+    credentials = []
+    for entry in YOUTUBE_CREDENTIALS:
+        creds = load_youtube_credentials(
+            entry.get("token_file", "token.pickle"),
+            entry.get("client_secrets", "credentials.json"),
+        )
+        credentials.append(Credential(
+            entry["name"], creds, build_youtube, daily_quota=entry.get("daily_quota", 10000)
+        ))
+    pool = CredentialPool(credentials, state)
+    for name, units in pool.remaining().items():
+        logger.info(f"📊 מכסה פנויה היום עבור '{name}': {units} יחידות")
+    return pool
+
+
+_download_cache = None
+
+
+def download_cache():
+    """The download cache shared by this process's transfer threads."""
+    global _download_cache
+    if _download_cache is None:
+        _download_cache = DownloadCache(download_folder(), DOWNLOAD_CACHE_MAX_BYTES, DOWNLOAD_MIN_FREE_BYTES)
+    return _download_cache
+
+
+def download_folder():
+    """
+    DOWNLOAD_FOLDER, or this worker's own subfolder of it in multi-node mode:
+    a cache evicts whatever is in its folder, so workers on one machine never
+    share one.
+    """
+    if _row_leases is None:
+        return DOWNLOAD_FOLDER
+    return os.path.join(DOWNLOAD_FOLDER, _row_leases.worker_id)
+
+
+def purge_worker_folders(state):
+    """
+    Remove the download subfolders of workers that are no longer running
+    (with WORKER_ID = "auto" every process gets a new one).
+    """
+    if _row_leases is None or not os.path.isdir(DOWNLOAD_FOLDER):
+        return
+    live = set(state.live_workers(LEASE_SECONDS))
+    for entry in os.scandir(DOWNLOAD_FOLDER):
+        if entry.is_dir() and entry.name not in live and entry.name != _row_leases.worker_id:
+            logger.info(f"🧹 מוחק את תיקיית ההורדות של עובד שכבר לא פעיל: {entry.path}")
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+_row_leases = None
+
+
+def start_row_leases(state):
+    """Join the multi-node run when WORKER_ID is set. Returns the number of other live workers."""
+    global _row_leases
+    if not WORKER_ID:
+        return 0
+    worker_id = default_worker_id() if WORKER_ID == "auto" else WORKER_ID
+    _row_leases = RowLeases(state, worker_id, LEASE_SECONDS, LEASE_HEARTBEAT_SECONDS)
+    return _row_leases.start()
+
+
+def claim_row(row):
+    """Lease a row to this worker (always True outside multi-node mode)."""
+    return _row_leases is None or _row_leases.claim(row.key)
+
+
+def finish_row(key):
+    """The row was handled by this worker - other workers skip it for the rest of the run."""
+    if _row_leases is not None:
+        _row_leases.finish(key)
+
+
+_remote_cleaner = None
+
+
+def remote_cleaner(state=None):
+    """
+    The inline cleanup's DeleteQueue (None with REMOTE_CLEANUP_ENABLED off).
+    Created by the first call with a state store.
+    """
+    global _remote_cleaner
+    if _remote_cleaner is None and REMOTE_CLEANUP_ENABLED and state is not None:
+        # Imported here: the cleanup script configures its own log file on import
+        from cleanup_remote_files import DeleteQueue
+
+        _remote_cleaner = DeleteQueue(state.record, REMOTE_CLEANUP_CONCURRENCY)
+    return _remote_cleaner
+
+
+def cleanup_path(job):
+    """The storage object the inline cleanup deletes for a job, or None."""
+    url_path = job.get("url_path", "")
+    if remote_cleaner() is None or not url_path or url_path.startswith("http"):
+        return None
+    return url_path
+
+
+def queue_remote_delete(key, object_path):
+    """Hand a row whose site update succeeded to the inline cleanup."""
+    if object_path and remote_cleaner() is not None:
+        remote_cleaner().put(key, object_path)
+
+
+_bandwidth_governor = None
+
+
+def bandwidth_governor():
+    """The BandwidthGovernor shared by all transfers (None without BANDWIDTH_SCHEDULE)."""
+    global _bandwidth_governor
+    if _bandwidth_governor is None and BANDWIDTH_SCHEDULE:
+        _bandwidth_governor = BandwidthGovernor(BANDWIDTH_SCHEDULE)
+    return _bandwidth_governor
+
+
+_chunk_tuner = None
+
+
+def chunk_tuner(state=None):
+    """
+    The ChunkTuner shared by all upload workers. The first call with a state
+    store starts it from the chunk size saved by the previous run.
+    """
+    global _chunk_tuner
+    if _chunk_tuner is None:
+        stats = state.get_setting("upload_chunk_tuning") if state is not None else None
+        _chunk_tuner = ChunkTuner.from_stats(
+            stats, UPLOAD_CHUNK_SIZE, UPLOAD_CHUNK_MIN, UPLOAD_CHUNK_MAX, UPLOAD_SINGLE_REQUEST_AFTER
+        )
+    return _chunk_tuner
+
+
+def storage_url_factory(url_path, full_url):
+    """Callable returning a usable URL for the row - re-signed on every call for storage paths."""
+    if url_path.startswith("http"):
+        return lambda: full_url
+    return lambda: generate_storage_url(url_path)
+
+
+def segment_map_path(out_path):
+    return f"{out_path}.segments"
+
+
+_write_lock = threading.Lock()
+
+
+def _write_at(fd, data, offset):
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            written = os.pwrite(fd, view, offset)
+        else:
+            # Windows has no pwrite - serialize seek + write instead
+            with _write_lock:
+                os.lseek(fd, offset, os.SEEK_SET)
+                written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+
+def _probe_download(url, url_factory):
+    """Return (url, size, accepts_ranges) using a one-byte Range request."""
+    for refresh in (False, True):
+        if refresh:
+            url = url_factory()
+        r = requests.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=30)
+        r.close()
+        METRICS.inc("download_http_responses_total", code=r.status_code)
+        if r.status_code in (401, 403) and url_factory and not refresh:
+            continue
+        r.raise_for_status()
+        break
+    content_range = r.headers.get("content-range", "")
+    if r.status_code == 206 and "/" in content_range and not content_range.endswith("/*"):
+        return url, int(content_range.rsplit("/", 1)[1]), True
+    return url, int(r.headers.get("content-length", 0)), False
+
+
+def _load_segment_map(out_path, size):
+    path = segment_map_path(out_path)
+    if os.path.exists(path) and os.path.exists(out_path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("size") == size:
+                return data["segments"]
+        except (ValueError, KeyError):
+            pass
+    return None
+
+
+def _save_segment_map(out_path, size, segments):
+    path = segment_map_path(out_path)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"size": size, "segments": segments}, f)
+    os.replace(path + ".tmp", path)
+
+
+def trim_segmented_download(out_path, size):
+    """
+    Prepare a `.part` left by the segmented downloader for a sequential resume.
 
-def download_file(url, out_path, max_retries=3):
+    The file was truncated to full size up front, so its length says nothing
+    about what was written: it is cut back to the finished prefix recorded in
+    the segment map, and the map is removed.
+    """
+    path = segment_map_path(out_path)
+    if not os.path.exists(path):
+        return
+    written = 0
+    for start, end, done in sorted(_load_segment_map(out_path, size) or []):
+        if start != written:
+            break
+        written = start + done
+        if written <= end:
+            break
+    if os.path.exists(out_path):
+        with open(out_path, "r+b") as f:
+            f.truncate(written)
+    os.remove(path)
+    logger.info(f"♻️ ממשיך הורדה קודמת מבייט {written} ({written / (1024*1024):.2f} MB)")
+
+
+def download_file(url, out_path, max_retries=3, url_factory=None, size=None):
+    """
+    Download url into out_path.
+
+    When the server supports Range requests the file is split into
+    DOWNLOAD_SEGMENTS ranges fetched concurrently and written in place at their
+    offsets. Progress is kept in `<out_path>.segments`, so an interrupted
+    download resumes only the missing ranges. url_factory is used to re-sign
+    the URL when it expires mid-download. A known size (from the container
+    listing) skips the probe request, since the storage supports ranges.
+    """
     logger.info(f"⬇️ מתחיל הורדה: {url}")
     logger.info(f"📁 יעד: {out_path}")
-    
+    started = time.monotonic()
+
+    if DOWNLOAD_SEGMENTS > 1:
+        if size:
+            accepts_ranges = True
+        else:
+            url, size, accepts_ranges = _probe_download(url, url_factory)
+        if accepts_ranges and (size >= DOWNLOAD_SEGMENT_MIN_BYTES or os.path.exists(segment_map_path(out_path))):
+            _download_segmented(url, out_path, size, max_retries, url_factory)
+            METRICS.observe("download_seconds", time.monotonic() - started)
+            return True
+
+    bandwidth = bandwidth_governor()
     for attempt in range(max_retries):
         try:
             r = requests.get(url, stream=True, timeout=30)
+            METRICS.inc("download_http_responses_total", code=r.status_code)
             r.raise_for_status()
             total_size = int(r.headers.get('content-length', 0))
 
+            from tqdm import tqdm
+
             with open(out_path, 'wb') as f, tqdm(
                 desc=os.path.basename(out_path),
                 total=total_size,
@@ -164,12 +725,17 @@ def download_file(url, out_path, max_retries=3):
                     if chunk:
                         f.write(chunk)
                         bar.update(len(chunk))
+                        METRICS.inc("download_bytes_total", len(chunk))
+                        if bandwidth is not None:
+                            bandwidth.acquire("ingress", len(chunk))
 
+            METRICS.observe("download_seconds", time.monotonic() - started)
             logger.info(f"✅ הורדה הושלמה: {out_path}")
             return True
         except requests.exceptions.RequestException as e:
             logger.warning(f"⚠️ נכשל ניסיון הורדה {attempt + 1}/{max_retries}: {str(e)}")
             if attempt < max_retries - 1:
+                METRICS.inc("download_retries_total")
                 wait_time = (attempt + 1) * 5
                 logger.info(f"⏳ ממתין {wait_time} שניות לפני ניסיון חוזר...")
                 time.sleep(wait_time)
@@ -178,9 +744,211 @@ def download_file(url, out_path, max_retries=3):
                 raise
 
 
-def resumable_upload(youtube, file_path, title, description, tags, max_retries=5):
+def _download_segmented(url, out_path, size, max_retries, url_factory):
+    segments = _load_segment_map(out_path, size)
+    if segments is None:
+        step = max(-(-size // DOWNLOAD_SEGMENTS), 1)
+        # [start, end (inclusive), bytes done]
+        segments = [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+        with open(out_path, "wb") as f:
+            f.truncate(size)
+        _save_segment_map(out_path, size, segments)
+    else:
+        missing = sum(end - start + 1 - done for start, end, done in segments)
+        logger.info(f"♻️ ממשיך הורדה קודמת, חסרים {missing / (1024*1024):.2f} MB")
+
+    lock = threading.Lock()
+    current = {"url": url, "saved_at": time.monotonic()}
+    bandwidth = bandwidth_governor()
+
+    def refresh_url(stale):
+        with lock:
+            if url_factory and current["url"] == stale:
+                current["url"] = url_factory()
+                logger.info("🔏 ה-URL החתום פג תוקף - נחתם מחדש")
+            return current["url"]
+
+    def fetch(segment):
+        for attempt in range(max_retries):
+            start, end, done = segment
+            if start + done > end:
+                return
+            seg_url = current["url"]
+            try:
+                r = requests.get(seg_url, headers={"Range": f"bytes={start + done}-{end}"}, stream=True, timeout=30)
+                METRICS.inc("download_http_responses_total", code=r.status_code)
+                if r.status_code in (401, 403) and url_factory:
+                    r.close()
+                    refresh_url(seg_url)
+                    continue
+                r.raise_for_status()
+                if r.status_code != 206:
+                    raise RuntimeError("Server ignored the Range header")
+                with r:
+                    for chunk in r.iter_content(chunk_size=1024*1024):
+                        if not chunk:
+                            continue
+                        _write_at(fd, chunk, start + segment[2])
+                        bar.update(len(chunk))
+                        METRICS.inc("download_bytes_total", len(chunk))
+                        if bandwidth is not None:
+                            bandwidth.acquire("ingress", len(chunk))
+                        with lock:
+                            segment[2] += len(chunk)
+                            if time.monotonic() - current["saved_at"] > 1:
+                                _save_segment_map(out_path, size, segments)
+                                current["saved_at"] = time.monotonic()
+                if start + segment[2] <= end:
+                    raise IOError(f"Segment {start}-{end} ended early")
+                return
+            except (requests.exceptions.RequestException, IOError) as e:
+                logger.warning(f"⚠️ נכשל ניסיון הורדת מקטע {start}-{end} ({attempt + 1}/{max_retries}): {str(e)}")
+                if attempt >= max_retries - 1:
+                    raise
+                METRICS.inc("download_retries_total")
+                time.sleep((attempt + 1) * 5)
+        raise RuntimeError(f"Segment {segment[0]}-{segment[1]} could not be downloaded")
+
+    from tqdm import tqdm
+
+    fd = os.open(out_path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    try:
+        with tqdm(
+            desc=os.path.basename(out_path),
+            total=size,
+            initial=sum(done for _, _, done in segments),
+            unit='B',
+            unit_scale=True,
+            unit_divisor=1024
+        ) as bar, ThreadPoolExecutor(max_workers=DOWNLOAD_SEGMENTS) as pool:
+            for future in [pool.submit(fetch, segment) for segment in segments]:
+                future.result()
+    except Exception:
+        with lock:
+            _save_segment_map(out_path, size, segments)
+        logger.error("❌ ההורדה נכשלה - ההתקדמות נשמרה ותמשיך בריצה הבאה")
+        raise
+    finally:
+        os.close(fd)
+
+    os.remove(segment_map_path(out_path))
+    logger.info(f"✅ הורדה הושלמה: {out_path}")
+    return True
+
+
+def open_stream_media(url_path, full_url):
+    """
+    Build a MediaIoBaseUpload that reads the video straight from storage.
+
+    The signed URL is regenerated through generate_storage_url whenever the
+    source has to be re-requested, so long uploads outlive STORAGE_EXPIRES_SECONDS.
+    """
+    stream = RemoteRangeStream(
+        storage_url_factory(url_path, full_url),
+        window_bytes=max(UPLOAD_CHUNK_SIZE * 2, 1024 * 1024 * 16),
+        bandwidth=bandwidth_governor(),
+    )
+    file_name = os.path.basename(urllib.parse.urlparse(full_url).path)
+    mimetype = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    logger.info(f"🌊 העלאה בזרימה ישירה מהאחסון ({stream.size / (1024*1024):.2f} MB)")
+    from adaptive_media import AdaptiveMediaIoBaseUpload
+
+    if UPLOAD_CHUNK_ADAPTIVE:
+        return AdaptiveMediaIoBaseUpload(stream, mimetype, chunk_tuner())
+    return AdaptiveMediaIoBaseUpload(stream, mimetype, chunksize=UPLOAD_CHUNK_SIZE)
+
+
+def file_fingerprint(path, sample_bytes=1024 * 1024):
+    """Cheap content fingerprint: size plus SHA-1 of the first and last MiB."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(sample_bytes))
+        if size > sample_bytes:
+            f.seek(max(size - sample_bytes, sample_bytes))
+            digest.update(f.read(sample_bytes))
+    return f"{size}:{digest.hexdigest()}"
+
+
+def _sample_fingerprint(url, size, sample_bytes):
+    """The file_fingerprint of a remote object, read with two Range requests."""
+    digest = hashlib.sha1()
+    ranges = [(0, min(sample_bytes, size) - 1)]
+    if size > sample_bytes:
+        ranges.append((max(size - sample_bytes, sample_bytes), size - 1))
+    for start, end in ranges:
+        r = requests.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=60)
+        r.raise_for_status()
+        if r.status_code != 206:
+            return None
+        digest.update(r.content)
+    return f"{size}:{digest.hexdigest()}"
+
+
+def remote_fingerprints(url_factory, sample_bytes=1024 * 1024):
+    """
+    Content fingerprints of a storage object, without downloading it.
+
+    Cloud Files returns the object's MD5 as its ETag, so a HEAD request is
+    enough; objects without an ETag fall back to the file_fingerprint sample.
+    """
+    url = url_factory()
+    r = requests.head(url, timeout=30, allow_redirects=True)
+    if r.status_code in (401, 403):
+        url = url_factory()
+        r = requests.head(url, timeout=30, allow_redirects=True)
+    r.raise_for_status()
+    size = int(r.headers.get("content-length", 0))
+    etag = r.headers.get("etag", "").strip('"')
+    if etag:
+        return [f"etag:{size}:{etag}"]
+    if size:
+        sample = _sample_fingerprint(url, size, sample_bytes)
+        if sample:
+            return [sample]
+    return []
+
+
+def _query_upload_session(request, uri, size):
+    """
+    Ask YouTube how much of a saved resumable session it has committed.
+
+    Returns:
+        ("resume", offset), ("done", response) or (None, None) if the session is gone
+    """
+    resp, content = request.http.request(
+        uri, method="PUT", headers={"Content-Range": f"bytes */{size}", "Content-Length": "0"}
+    )
+    if resp.status == 308:
+        committed = resp.get("range", "")
+        return "resume", int(committed.rsplit("-", 1)[1]) + 1 if committed else 0
+    if resp.status in (200, 201):
+        return "done", json.loads(content)
+    return None, None
+
+
+def resumable_upload(youtube, file_path, title, description, tags, max_retries=5, media=None,
+                     sessions=None, session_key=None, refund=None):
+    """
+    Upload a video with a resumable session.
+
+    When a session store (state_store.StateStore) and session_key are given,
+    the session URI and last acknowledged offset are persisted after every
+    chunk, and a session saved by a previous run is resumed instead of
+    starting a new videos.insert.
+
+    refund is called (once) when the videos.insert reserved by the caller
+    was not made: a saved session was resumed or had already finished, or
+    YouTube never accepted a new session.
+    """
+    from googleapiclient.errors import HttpError
+    from tqdm import tqdm
+
+    from adaptive_media import AdaptiveMediaFileUpload
+
     logger.info(f"📤 מתחיל העלאה ליוטיוב: {title}")
-    
+    started = time.monotonic()
+
     body = {
         "snippet": {
             "title": title,
@@ -192,230 +960,1326 @@ def resumable_upload(youtube, file_path, title, description, tags, max_retries=5
         }
     }
 
-    media = MediaFileUpload(file_path, chunksize=1024*1024*8, resumable=True)
+    if media is None:
+        if UPLOAD_CHUNK_ADAPTIVE:
+            media = AdaptiveMediaFileUpload(file_path, chunk_tuner())
+        else:
+            media = AdaptiveMediaFileUpload(file_path, chunksize=UPLOAD_CHUNK_SIZE)
+    # Tuned media report every chunk's throughput and failures to their tuner
+    tuner = media.tuner
+    bandwidth = bandwidth_governor()
     request = youtube.videos().insert(
         part="snippet,status",
         body=body,
         media_body=media
     )
 
-    file_size = os.path.getsize(file_path)
+    file_size = media.size()
     uploaded = 0
-    
-    with tqdm(total=file_size, unit="B", unit_scale=True, desc="⬆️ Uploading", initial=0) as bar:
-        response = None
-        retry_count = 0
+    response = None
+
+    def release_reservation():
+        nonlocal refund
+        if refund is not None:
+            refund()
+            refund = None
+
+    saved = sessions.get_upload_session(session_key) if sessions and session_key else None
+    if saved:
+        saved_uri, saved_offset, _ = saved
+        try:
+            outcome, value = _query_upload_session(request, saved_uri, file_size)
+        except Exception as e:
+            logger.warning(f"⚠️ לא הצלחתי לבדוק סשן העלאה שמור: {str(e)}")
+            outcome, value = None, None
+        if outcome == "done":
+            logger.info("✅ ההעלאה כבר הושלמה בריצה קודמת")
+            response = value
+            uploaded = file_size
+            release_reservation()
+        elif outcome == "resume":
+            logger.info(f"♻️ ממשיך סשן העלאה קודם מבייט {value} ({value / (1024*1024):.2f} MB)")
+            request.resumable_uri = saved_uri
+            request.resumable_progress = value
+            uploaded = value
+            release_reservation()
+        else:
+            logger.info("⌛ סשן ההעלאה השמור פג תוקף - מתחיל העלאה חדשה")
+            sessions.drop_upload_session(session_key)
+
+    try:
+        with tqdm(total=file_size, unit="B", unit_scale=True, desc="⬆️ Uploading", initial=uploaded) as bar:
+            retry_count = 0
         
-        while response is None and retry_count < max_retries:
-            try:
-                error = None
-                while response is None:
-                    try:
-                        status, response = request.next_chunk()
-                        if status:
-                            uploaded = status.resumable_progress
-                            bar.update(status.resumable_progress - bar.n)
-                    except HttpError as e:
-                        error = e
-                        if e.resp.status in [500, 502, 503, 504]:
-                            # Server error - retry
-                            logger.warning(f"⚠️ שגיאת שרת: {e.resp.status}. מנסה להמשיך...")
-                            time.sleep(2 ** retry_count)  # Exponential backoff
-                            break
-                        else:
-                            raise
+            while response is None and retry_count < max_retries:
+                try:
+                    error = None
+                    while response is None:
+                        try:
+                            limit = bandwidth.limit("egress") if bandwidth is not None else None
+                            # A chunk is one request sent at line rate: at most about one
+                            # second of the limit, so the uplink is only briefly saturated
+                            chunk_size = media.next_chunk_size(
+                                request.resumable_progress, align_chunk(int(limit)) if limit else None
+                            )
+                            if limit:
+                                bandwidth.acquire("egress", min(chunk_size, file_size - request.resumable_progress))
+                            chunk_started = time.monotonic()
+                            status, response = request.next_chunk()
+                            # Paced chunks say nothing about the line rate
+                            if tuner and not limit:
+                                sent = (status.resumable_progress if status else file_size) - uploaded
+                                tuner.record(sent, time.monotonic() - chunk_started, chunk_size)
+                            if status:
+                                METRICS.inc("upload_bytes_total", status.resumable_progress - uploaded)
+                                uploaded = status.resumable_progress
+                                bar.update(status.resumable_progress - bar.n)
+                                if sessions and session_key and request.resumable_uri:
+                                    sessions.save_upload_session(session_key, request.resumable_uri, uploaded)
+                        except HttpError as e:
+                            error = e
+                            METRICS.inc("upload_http_errors_total", code=e.resp.status)
+                            if is_quota_error(e):
+                                # Retrying only burns time - let the caller switch credential
+                                raise QuotaExceeded(str(e)) from e
+                            if e.resp.status in [500, 502, 503, 504]:
+                                # Server error - retry
+                                logger.warning(f"⚠️ שגיאת שרת: {e.resp.status}. מנסה להמשיך...")
+                                METRICS.inc("upload_retries_total")
+                                if tuner:
+                                    tuner.failed()
+                                time.sleep(2 ** retry_count)  # Exponential backoff
+                                break
+                            else:
+                                raise
                 
-                if response is not None:
-                    logger.info(f"✅ הועלה בהצלחה! Video ID: {response['id']}")
-                    logger.info(f"🔗 https://www.youtube.com/watch?v={response['id']}")
-                    break
+                    if response is not None:
+                        METRICS.inc("upload_bytes_total", file_size - uploaded)
+                        uploaded = file_size
+                        METRICS.observe("upload_seconds", time.monotonic() - started)
+                        logger.info(f"✅ הועלה בהצלחה! Video ID: {response['id']}")
+                        logger.info(f"🔗 https://www.youtube.com/watch?v={response['id']}")
+                        break
                     
-            except HttpError as e:
-                retry_count += 1
-                if retry_count >= max_retries:
-                    logger.error(f"❌ ההעלאה נכשלה לאחר {max_retries} ניסיונות: {str(e)}")
+                except QuotaExceeded:
                     raise
-                else:
-                    wait_time = min(2 ** retry_count, 60)  # Max 60 seconds
-                    logger.warning(f"⚠️ שגיאה בהעלאה (ניסיון {retry_count}/{max_retries}): {str(e)}")
-                    logger.info(f"⏳ ממתין {wait_time} שניות לפני ניסיון חוזר...")
-                    time.sleep(wait_time)
+
+                except HttpError as e:
+                    retry_count += 1
+                    if retry_count >= max_retries:
+                        logger.error(f"❌ ההעלאה נכשלה לאחר {max_retries} ניסיונות: {str(e)}")
+                        raise
+                    else:
+                        METRICS.inc("upload_retries_total")
+                        wait_time = min(2 ** retry_count, 60)  # Max 60 seconds
+                        logger.warning(f"⚠️ שגיאה בהעלאה (ניסיון {retry_count}/{max_retries}): {str(e)}")
+                        logger.info(f"⏳ ממתין {wait_time} שניות לפני ניסיון חוזר...")
+                        time.sleep(wait_time)
                     
-            except Exception as e:
-                retry_count += 1
-                if retry_count >= max_retries:
-                    logger.error(f"❌ שגיאה לא צפויה: {str(e)}")
-                    raise
-                else:
-                    wait_time = min(2 ** retry_count, 60)
-                    logger.warning(f"⚠️ שגיאה (ניסיון {retry_count}/{max_retries}): {str(e)}")
-                    logger.info(f"⏳ ממתין {wait_time} שניות לפני ניסיון חוזר...")
-                    time.sleep(wait_time)
+                except Exception as e:
+                    retry_count += 1
+                    if tuner:
+                        tuner.failed()
+                    if retry_count >= max_retries:
+                        logger.error(f"❌ שגיאה לא צפויה: {str(e)}")
+                        raise
+                    else:
+                        METRICS.inc("upload_retries_total")
+                        wait_time = min(2 ** retry_count, 60)
+                        logger.warning(f"⚠️ שגיאה (ניסיון {retry_count}/{max_retries}): {str(e)}")
+                        logger.info(f"⏳ ממתין {wait_time} שניות לפני ניסיון חוזר...")
+                        time.sleep(wait_time)
+    except QuotaExceeded:
+        # The caller books the rest of the credential's day
+        raise
+    except BaseException:
+        if request.resumable_uri is None:
+            release_reservation()
+        raise
+    if response is None and request.resumable_uri is None:
+        release_reservation()
 
+    if response is not None and sessions and session_key:
+        sessions.drop_upload_session(session_key)
     return response
 
 
-def main():
-    logger.info("=" * 60)
-    logger.info("🚀 מתחיל תהליך העלאה ליוטיוב")
-    logger.info("=" * 60)
-    
+_metadata_builder = None
+
+
+def metadata_builder():
+    """The MetadataBuilder of the run (shared caches for titles and dates)."""
+    global _metadata_builder
+    if _metadata_builder is None:
+        _metadata_builder = MetadataBuilder(BASE_WEBSITE_URL, MAX_TITLE_LENGTH)
+    return _metadata_builder
+
+
+def build_video_title(idx, row):
+    # Title: rabi + cat + title, cleaned and cut to MAX_TITLE_LENGTH
+    video_title, issue = metadata_builder().title(row)
+    if issue == EMPTY_TITLE:
+        logger.warning(f"שורה {idx + 1}: לא נמצאה כותרת תקינה! דילוג")
+    elif issue == TITLE_TRUNCATED:
+        logger.info(f"✂️ שורה {idx + 1}: הכותרת קוצרה ל-{MAX_TITLE_LENGTH} התווים האחרונים")
+    return video_title
+
+
+def build_description(row):
+    return metadata_builder().description(row)
+
+
+# Keys of the rows validate_metadata() rejected; scheduled_rows() skips them
+_rejected_rows = frozenset()
+
+
+def validate_metadata(source):
+    """
+    Build the metadata of every pending row before the run starts, log a
+    summary and write the problems to METADATA_REPORT_FILE.
+
+    Returns:
+        The MetadataReport (its `rejected` rows are skipped by the run)
+    """
+    global _rejected_rows
+    started = time.monotonic()
+    with closing(source.rows()) as rows:
+        report = metadata_builder().validate(rows)
+    logger.info(f"🧾 {report.checked} שורות נבדקו ב-{(time.monotonic() - started) * 1000:.0f}ms")
+    report.log()
+    if METADATA_REPORT_FILE:
+        report.write(METADATA_REPORT_FILE)
+    _rejected_rows = frozenset(report.rejected)
+    return report
+
+
+def object_name(url_path):
+    """Name of a CSV `url` value inside the storage container (paths may be URL-encoded)."""
+    return urllib.parse.unquote(url_path.strip().lstrip("/"))
+
+
+def preflight_remote_objects(source, state):
+    """
+    Check every pending storage row against a listing of the container.
+
+    One listing page covers 10,000 objects, so missing files are found without
+    a failed download per row; they are recorded as "Not url" up front.
+
+    Returns:
+        {object name: (size, etag)} of the listed objects, or None if the
+        listing failed (the download then finds missing files as before)
+    """
+    # Imported here: the cleanup script configures its own log file on import
+    from cleanup_remote_files import API_KEY, USERNAME, RackspaceClient
+
+    keys = {}
+    with closing(source.rows()) as rows:
+        for row in rows:
+            url_path = row.url.strip()
+            if url_path and not url_path.startswith("http"):
+                keys.setdefault(object_name(url_path), []).append(row.key)
+    if not keys:
+        return {}
+
+    prefixes = {name.split("/", 1)[0] + "/" if "/" in name else name for name in keys}
+    if len(prefixes) > PREFLIGHT_MAX_PREFIXES:
+        prefixes = {""}
+
+    index = {}
     try:
-        youtube = authenticate_youtube()
-        df = pd.read_csv(CSV_FILE)
-        # Ensure tracking columns exist
-        if "uploaded" not in df.columns:
-            df["uploaded"] = ""
-        df["uploaded"] = df["uploaded"].fillna("").astype(str)
-        if "provider_updated" not in df.columns:
-            df["provider_updated"] = ""
-        df["provider_updated"] = df["provider_updated"].fillna("").astype(str)
-        
-        # Ensure 'uploaded' column exists and fill NaN values with empty string
-        if "uploaded" not in df.columns:
-            df["uploaded"] = ""
-        df["uploaded"] = df["uploaded"].fillna("").astype(str)
-        
-        logger.info(f"📊 נמצאו {len(df)} שורות בקובץ CSV")
-        
-        uploaded_count = len(df[df["uploaded"].str.lower() == "yes"])
-        remaining_count = len(df) - uploaded_count
-        logger.info(f"✅ כבר הועלו: {uploaded_count} | 📤 נותרו: {remaining_count}")
+        client = RackspaceClient(USERNAME, API_KEY)
+        for prefix in sorted(prefixes):
+            for item in client.list_objects(prefix):
+                if "name" in item:
+                    index[item["name"]] = (int(item.get("bytes") or 0), item.get("hash") or None)
+    except Exception as e:
+        logger.warning(f"⚠️ הבדיקה המקדימה מול האחסון נכשלה, ממשיך בלעדיה: {str(e)}")
+        return None
 
-        os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+    missing = [name for name in keys if name not in index]
+    for name in missing:
+        for key in keys[name]:
+            state.record(key, uploaded="Not url")
+    needed = sum(index[name][0] for name in keys if name in index)
+    logger.info(
+        f"🔎 בדיקה מקדימה: {len(keys) - len(missing)} קבצים קיימים ({needed / (1024**3):.2f} GB), "
+        f"{len(missing)} חסרים סומנו 'Not url'"
+    )
+    if UPLOAD_SOURCE == "disk":
+        free = shutil.disk_usage(download_folder()).free
+        if needed > free:
+            logger.info(f"💽 פנויים {free / (1024**3):.2f} GB - ההורדות יתחלקו לפי המקום (קבצים נמחקים אחרי כל העלאה)")
+    return index
 
-        for idx, row in df.iterrows():
-            # Skip if already uploaded
-            if str(row.get("uploaded", "")).lower() == "yes":
-                title_text = str(row.get("title", "N/A")).strip()
-                logger.info(f"⏭️ דילוג על שורה {idx + 1}: כבר הועלה - {title_text}")
-                continue
 
-            # Build title: rabi + cat + title
-            rabi = str(row.get("rabi", "")).strip()
-            cat = str(row.get("cat", "")).strip()
-            title = str(row.get("title", "")).strip()
-            # הגנה - אם title ריק נסה לפחות cat/rabi או שנהג title גנרי
-            if not title and (rabi or cat):
-                title = f"{cat or rabi}"
-            video_title = f"{rabi} - {cat} - {title}" if rabi and cat else (f"{cat} - {title}" if cat else title)
-            # ודא שהכותרת לא ריקה
-            if not video_title or not video_title.strip():
-                logger.warning(f"שורה {idx + 1}: לא נמצאה כותרת תקינה! דילוג")
+def prepare_row(row, total, remote_index=None):
+    """
+    Build everything needed to process a pending CSV row (title, description, URLs).
+
+    Returns:
+        A job dict, or None if the row should be skipped
+    """
+    idx = row.index
+    url_path = str(row.get("url", "")).strip()
+    remote = None
+    if remote_index is not None and url_path and not url_path.startswith("http"):
+        remote = remote_index.get(object_name(url_path))
+        if remote is None:
+            logger.info(f"⏭️ שורה {idx + 1}: הקובץ לא קיים באחסון (בדיקה מקדימה) - דילוג")
+            return None
+
+    video_title = build_video_title(idx, row)
+    if not video_title:
+        return None
+
+    logger.info(f"\n{'=' * 60}")
+    logger.info(f"📹 מעבד שורה {idx + 1}/{total}: {video_title}")
+    logger.info(f"{'=' * 60}")
+
+    # Build full URL with dynamic signature
+    if not url_path.startswith("http"):
+        # Generate signed URL
+        full_url = generate_storage_url(url_path)
+        logger.info(f"🔗 URL מלא (חתום): {full_url}")
+    else:
+        # Already a full URL, use as is
+        full_url = url_path
+        logger.info(f"🔗 URL מלא: {full_url}")
+
+    return {
+        "idx": idx,
+        "key": row.key,
+        "csv_id": str(row.get("id", "")).strip(),
+        "title": video_title,
+        "description": build_description(row),
+        "url_path": url_path,
+        "full_url": full_url,
+        # Cache file name is unique per source path (see DownloadCache.path_for)
+        "local_file": download_cache().path_for(url_path),
+        # Size and ETag from the container listing (a size of 0 is a large-object manifest)
+        "remote_size": remote[0] if remote and remote[0] else None,
+        "remote_etag": remote[1] if remote and remote[0] else None,
+    }
+
+
+def record_upload(job, state, youtube_url, notifier=None, result="uploaded"):
+    """
+    Journal a row as uploaded to youtube_url and update the site (now or with
+    the next batch). With the inline cleanup on, remote_deleted = "pending"
+    is journaled in the same update and the object is deleted once the site
+    update succeeded.
+    """
+    METRICS.inc("rows_total", result=result)
+    update = {"uploaded": "yes"}
+    object_path = cleanup_path(job) if youtube_url else None
+    if youtube_url:
+        logger.info(f"🔗 נשמר קישור: {youtube_url}")
+        update["youtube_url"] = youtube_url
+        if notifier is not None:
+            # Sent with the next batch, which records yes / error
+            update["provider_updated"] = "pending"
+        else:
+            # Notify site to update provider in DB and mark in CSV
+            notified = notify_site_update_provider(job["csv_id"], youtube_url)
+            update["provider_updated"] = "yes" if notified else "error"
+            if not notified:
+                object_path = None
+    if object_path:
+        update["remote_deleted"] = "pending"
+    state.record(job["key"], **update)
+    logger.info("📌 סומן כ-uploaded ✅ ונשמר ביומן המצב")
+    if notifier is not None and youtube_url:
+        notifier.add(job["key"], job["csv_id"], youtube_url, object_path)
+    elif object_path:
+        queue_remote_delete(job["key"], object_path)
+
+
+def link_duplicate(job, state, notifier=None):
+    """
+    Look the row's content up in the dedup index; a known video is linked to
+    the row instead of being downloaded and uploaded again.
+
+    Returns:
+        True if the row was linked to an existing video
+    """
+    try:
+        if job.get("remote_etag"):
+            job["fingerprints"] = [f"etag:{job['remote_size']}:{job['remote_etag']}"]
+        else:
+            job["fingerprints"] = remote_fingerprints(storage_url_factory(job["url_path"], job["full_url"]))
+    except Exception as e:
+        # Missing files etc. are reported by the download itself
+        logger.warning(f"⚠️ לא הצלחתי לחשב טביעת אצבע לשורה {job['idx'] + 1}: {str(e)}")
+        return False
+
+    found = state.find_content(job["fingerprints"])
+    if not found:
+        return False
+    youtube_url, original_key = found
+    logger.info(f"♻️ תוכן זהה כבר הועלה (שורה {original_key}) - מקשר ל-{youtube_url} בלי הורדה והעלאה")
+    record_upload(job, state, youtube_url, notifier, result="duplicate")
+    return True
+
+
+def backfill_content_index(source, state):
+    """Fingerprint rows uploaded before the dedup index existed."""
+    indexed = state.indexed_rows()
+    added = 0
+    with closing(source.rows(status="uploaded")) as rows:
+        for row in rows:
+            youtube_url = row.youtube_url.strip()
+            if not youtube_url or row.key in indexed or row.remote_deleted.strip().lower() == "yes":
                 continue
-            
-            # ניקוי תווים אסורים בכותרת
-            video_title = re.sub(r"[^\w\s\u0590-\u05fe\-\.,;:!?()\"'’״׳]", "", video_title)
-            video_title = video_title.replace('\n', ' ').replace('\r', ' ')
-            logger.debug(f"שורה {idx+1}, כותרת לשידור לאחר ניקוי: >>{video_title}<<")
-            if not video_title or not video_title.strip():
-                logger.warning(f"שורה {idx + 1}: לא נמצאה כותרת תקינה גם אחרי ניקוי! דילוג")
+            url_path = str(row.url).strip()
+            full_url = url_path if url_path.startswith("http") else ""
+            try:
+                fingerprints = remote_fingerprints(storage_url_factory(url_path, full_url))
+            except Exception as e:
+                logger.warning(f"⚠️ טביעת אצבע נכשלה עבור שורה {row.index + 1}: {str(e)}")
                 continue
-            
-            # בדיקת אורך כותרת
-            if len(video_title) > MAX_TITLE_LENGTH:
-                logger.warning(f"שורה {idx + 1}: הכותרת ארוכה מדי ({len(video_title)} תווים). מקצץ ל-100 התווים האחרונים.")
-                logger.warning(f"כותרת מקורית: {video_title}")
-                video_title = video_title[-MAX_TITLE_LENGTH:]  # לוקח את 100 התווים האחרונים
-                logger.warning(f"כותרת לאחר קיצוץ: {video_title}")
-            
-            logger.info(f"\n{'=' * 60}")
-            logger.info(f"📹 מעבד שורה {idx + 1}/{len(df)}: {video_title}")
-            logger.info(f"{'=' * 60}")
-
-            # Build full URL with dynamic signature
-            url_path = str(row.get("url", "")).strip()
-            if not url_path.startswith("http"):
-                # Generate signed URL
-                full_url = generate_storage_url(url_path)
-                logger.info(f"🔗 URL מלא (חתום): {full_url}")
-            else:
-                # Already a full URL, use as is
-                full_url = url_path
-                logger.info(f"🔗 URL מלא: {full_url}")
-            
-            parsed = urllib.parse.urlparse(full_url)
-            file_name = os.path.basename(parsed.path)  # filename only without ?params
-            # Remove query parameters from filename
-            if "?" in file_name:
-                file_name = file_name.split("?")[0]
-            local_file = os.path.join(DOWNLOAD_FOLDER, file_name)
-
-            # Check if file already exists
-            if os.path.exists(local_file):
-                file_size = os.path.getsize(local_file)
-                logger.info(f"✅ קובץ כבר קיים: {local_file} ({file_size / (1024*1024):.2f} MB)")
-                logger.info("⏭️ דילוג על הורדה, ממשיך להעלאה...")
-            else:
-                # Download file
-                try:
-                    download_file(full_url, local_file)
-                except Exception as e:
-                    err_msg = str(e)
-                    logger.error(f"❌ שגיאה בהורדה: {err_msg}")
-                    if "Client Error: Not Found for url" in err_msg:
-                        df.at[idx, "uploaded"] = "Not url"
-                        df.to_csv(CSV_FILE, index=False)
-                        logger.info(f"✅ נשמר בקובץ CSV עם 'Not url' בעמודת uploaded עבור שורה {idx+1}")
-                    logger.error(f"⏭️ דילוג על שורה {idx + 1}")
+            state.index_content(fingerprints, youtube_url, row.key)
+            added += 1
+    logger.info(f"♻️ נוספו {added} סרטונים קיימים לאינדקס הכפילויות")
+
+
+def channel_uploads(credential, pool):
+    """
+    Videos on a credential's channel, newest first: (video_id, title, description).
+
+    The channel's uploads playlist is paged RECONCILE_PAGE_SIZE items at a
+    time, and the video ids of each page are looked up with one videos.list
+    call. Videos whose upload failed or was rejected are left out.
+    """
+    youtube = credential.service()
+    pool.spend(credential, "channels.list")
+    channels = youtube.channels().list(part="contentDetails", mine=True).execute(num_retries=3)
+    for channel in channels.get("items", []):
+        playlist_id = channel["contentDetails"]["relatedPlaylists"]["uploads"]
+        page_token = None
+        while True:
+            pool.spend(credential, "playlistItems.list")
+            page = youtube.playlistItems().list(
+                part="contentDetails", playlistId=playlist_id, maxResults=RECONCILE_PAGE_SIZE, pageToken=page_token
+            ).execute(num_retries=3)
+            video_ids = [item["contentDetails"]["videoId"] for item in page.get("items", [])]
+            if video_ids:
+                pool.spend(credential, "videos.list")
+                # No maxResults: the API refuses it together with id
+                videos = youtube.videos().list(part="snippet,status", id=",".join(video_ids)).execute(num_retries=3)
+                for video in videos.get("items", []):
+                    if video.get("status", {}).get("uploadStatus") in ("failed", "rejected", "deleted"):
+                        continue
+                    snippet = video.get("snippet", {})
+                    yield video["id"], snippet.get("title", ""), snippet.get("description", "")
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                break
+
+
+def reconcile_uploads(pool, source, state, notifier=None):
+    """
+    Backfill pending rows whose video is already on a channel - e.g. the run
+    stopped after YouTube accepted the upload but before it was journaled.
+
+    A video is matched by the lesson link in its description
+    (BASE_WEBSITE_URL + id) or, when it has none, by its title if exactly one
+    row has that title. Videos already linked to a row are never matched.
+
+    Returns:
+        Number of rows backfilled
+    """
+    from googleapiclient.errors import HttpError
+
+    started = time.monotonic()
+    builder = metadata_builder()
+    by_link, by_title, title_counts, linked = {}, {}, {}, set()
+    with closing(source.rows(status="all")) as rows:
+        for row in rows:
+            title, _ = builder.title(row)
+            if title:
+                title_counts[title] = title_counts.get(title, 0) + 1
+            if row.uploaded.strip().lower() == "yes":
+                if row.youtube_url.strip():
+                    linked.add(row.youtube_url.strip().rsplit("v=", 1)[-1])
+                continue
+            csv_id = str(row.id).strip()
+            if BASE_WEBSITE_URL and csv_id:
+                by_link[f"{BASE_WEBSITE_URL}{csv_id}"] = row
+            if title:
+                by_title[title] = row
+    # A title shared by several rows cannot tell which of them a video belongs to
+    by_title = {title: row for title, row in by_title.items() if title_counts[title] == 1}
+    pending = {row.key for row in by_link.values()} | {row.key for row in by_title.values()}
+    if not pending:
+        logger.info("🔎 אין שורות ממתינות להתאמה מול הערוץ")
+        return 0
+
+    link_pattern = re.compile(re.escape(BASE_WEBSITE_URL) + r"(\S+)") if BASE_WEBSITE_URL else None
+    logger.info(f"🔎 מחפש {len(pending)} שורות ממתינות בין הסרטונים שכבר בערוצים...")
+    matched = set()
+    scanned = 0
+    for credential in pool.credentials:
+        try:
+            for video_id, title, description in channel_uploads(credential, pool):
+                scanned += 1
+                if video_id in linked:
+                    continue
+                link = link_pattern.search(description) if link_pattern else None
+                row = by_link.get(link.group(0)) if link else by_title.get(title)
+                if row is None or row.key in matched or not claim_row(row):
                     continue
+                try:
+                    youtube_url = f"https://www.youtube.com/watch?v={video_id}"
+                    logger.info(f"🔎 שורה {row.index + 1} כבר הועלתה: {youtube_url}")
+                    job = {"key": row.key, "csv_id": str(row.id).strip(), "url_path": row.url.strip()}
+                    record_upload(job, state, youtube_url, notifier, result="reconciled")
+                finally:
+                    finish_row(row.key)
+                matched.add(row.key)
+                linked.add(video_id)
+                if len(matched) == len(pending):
+                    break
+        except HttpError as e:
+            if e.resp.status == 403 and "insufficient" in str(e).lower():
+                logger.error(
+                    f"❌ לטוקן של '{credential.name}' אין הרשאת youtube.readonly - "
+                    f"מחק את קובץ הטוקן שלו (token_file ב-YOUTUBE_CREDENTIALS) והתחבר מחדש"
+                )
+            else:
+                logger.error(f"❌ שגיאה בקריאת הסרטונים של '{credential.name}': {str(e)}")
+        if len(matched) == len(pending):
+            break
+    logger.info(
+        f"🔎 נבדקו {scanned} סרטונים ב-{time.monotonic() - started:.1f} שניות | "
+        f"{len(matched)} שורות סומנו כמועלות בלי העלאה חוזרת"
+    )
+    return len(matched)
+
+
+def fetch_row_file(job, state, notifier=None):
+    """Make sure the row's video is in DOWNLOAD_FOLDER. Returns True if it is ready for upload."""
+    idx = job["idx"]
+    local_file = job["local_file"]
+
+    if DEDUP_ENABLED and link_duplicate(job, state, notifier):
+        return False
+
+    if UPLOAD_SOURCE == "stream":
+        # No local copy - just make sure the source is reachable and get its size
+        try:
+            job["media"] = open_stream_media(job["url_path"], job["full_url"])
+            return True
+        except Exception as e:
+            return _handle_fetch_error(job, state, e)
+
+    cache = download_cache()
+    url_factory = storage_url_factory(job["url_path"], job["full_url"])
+    try:
+        size, accepts_ranges = job.get("remote_size"), True
+        if not size:
+            _, size, accepts_ranges = _probe_download(job["full_url"], url_factory)
+
+        # Reuse a complete cached copy of the same size
+        if cache.lookup(local_file, size, job.get("remote_etag")):
+            logger.info(f"✅ קובץ כבר קיים: {local_file} ({os.path.getsize(local_file) / (1024*1024):.2f} MB)")
+            logger.info("⏭️ דילוג על הורדה, ממשיך להעלאה...")
+            return True
+
+        if not cache.reserve(local_file, size):
+            logger.warning(f"💽 אין מספיק מקום פנוי להורדת {size / (1024*1024):.2f} MB - שורה {idx + 1} תטופל בריצה הבאה")
+            return False
+
+        # Download into <file>.part; it gets its final name only when complete
+        try:
+            download_file(
+                job["full_url"],
+                cache.part_path(local_file),
+                url_factory=url_factory,
+                size=size if accepts_ranges else None,
+            )
+            cache.commit(local_file, size, job.get("remote_etag"))
+        except Exception:
+            cache.release(local_file)
+            raise
+        return True
+    except Exception as e:
+        return _handle_fetch_error(job, state, e)
+
+
+def _handle_fetch_error(job, state, e):
+    idx = job["idx"]
+    err_msg = str(e)
+    logger.error(f"❌ שגיאה בהורדה: {err_msg}")
+    if "Client Error: Not Found for url" in err_msg:
+        METRICS.inc("rows_total", result="not_url")
+        state.record(job["key"], uploaded="Not url")
+        logger.info(f"✅ נשמר 'Not url' בעמודת uploaded עבור שורה {idx+1}")
+    else:
+        METRICS.inc("rows_total", result="download_failed")
+    logger.error(f"⏭️ דילוג על שורה {idx + 1}")
+    return False
+
+
+def upload_session_key(job, credential, fingerprint):
+    return f"{job['key']}:{credential.name}:{fingerprint}"
+
+
+def saved_session_owner(pool, state, job, fingerprint):
+    """
+    The credential that created the upload session an earlier run saved for
+    this row and file, or None. Only that credential can resume it.
+    """
+    for credential in pool.credentials:
+        if state.get_upload_session(upload_session_key(job, credential, fingerprint)):
+            return credential
+    return None
+
+
+def upload_row_file(pool, job, state, notifier=None):
+    """Upload a downloaded row to YouTube and record the result in the CSV."""
+    local_file = job["local_file"]
+    failed = True
 
-            # Build description
-            csv_id = str(row.get("id", "")).strip()
-            added_date = str(row.get("added", "")).strip()
-            
-            # Remove " 0:00" from date if exists
-            if added_date and " 0:00" in added_date:
-                added_date = added_date.replace(" 0:00", "")
-                date_obj = datetime.strptime(added_date, "%m/%d/%Y")
-                added_date = date_obj.strftime("%d/%m/%Y")
-            
-            website_link = BASE_WEBSITE_URL + csv_id if csv_id else ""
-            
-            description = "דפי מקורות וקובץ שמע בעמוד השיעור באתר הישיבה"
-            if website_link:
-                description += f"\n\nקישור לשיעור באתר הישיבה:\n{website_link}"
-            if added_date:
-                description += f"\n\nתאריך: {added_date}"
-
-            # Upload to YouTube
+    # Upload to YouTube
+    try:
+        media = job.get("media")
+        if media is not None:
+            stream = media.stream()
+            fingerprint = f"remote:{stream.size}:{stream.etag or ''}"
+        else:
+            fingerprint = file_fingerprint(local_file)
+
+        owner = saved_session_owner(pool, state, job, fingerprint)
+        while True:
+            credential = pool.reserve("videos.insert", owner)
+            if credential is None and owner is not None:
+                logger.warning(f"⌛ ל-'{owner.name}' אין מכסה להמשך סשן ההעלאה השמור - מתחיל העלאה חדשה")
+                state.drop_upload_session(upload_session_key(job, owner, fingerprint))
+                owner = None
+                continue
+            if credential is None:
+                if wait_for_quota(pool, notifier):
+                    continue
+                logger.warning(f"⏸️ אין מכסה פנויה - שורה {job['idx'] + 1} תועלה בריצה הבאה")
+                failed = False
+                return
             try:
                 response = resumable_upload(
-                    youtube,
+                    credential.service(),
                     local_file,
-                    video_title,
-                    description,
-                    ""  # No tags field in new CSV format
+                    job["title"],
+                    job["description"],
+                    "",  # No tags field in new CSV format
+                    media=media,
+                    sessions=state,
+                    session_key=upload_session_key(job, credential, fingerprint),
+                    refund=lambda credential=credential: pool.refund(credential, "videos.insert"),
                 )
-                
-                if response:
-                    youtube_video_id = response.get("id") if isinstance(response, dict) else None
-                    if youtube_video_id:
-                        youtube_url = f"https://www.youtube.com/watch?v={youtube_video_id}"
-                        df.at[idx, "youtube_url"] = youtube_url
-                        logger.info(f"🔗 נשמר קישור: {youtube_url}")
-                        # Notify site to update provider in DB and mark in CSV
-                        notified = notify_site_update_provider(csv_id, youtube_url)
-                        df.at[idx, "provider_updated"] = "yes" if notified else "error"
-                    df.at[idx, "uploaded"] = "yes"
-                    df.to_csv(CSV_FILE, index=False)
-                    logger.info("📌 סומן כ-uploaded ✅ ונשמר לקובץ CSV")
-                    
-                    # Delete file after successful upload
-                    try:
-                        if os.path.exists(local_file):
-                            file_size = os.path.getsize(local_file)
-                            os.remove(local_file)
-                            logger.info(f"🗑️ קובץ נמחק: {local_file} ({file_size / (1024*1024):.2f} MB)")
-                    except Exception as e:
-                        logger.warning(f"⚠️ לא הצלחתי למחוק את הקובץ {local_file}: {str(e)}")
+                break
+            except QuotaExceeded:
+                pool.mark_exhausted(credential)
+
+        if response:
+            failed = False
+            youtube_video_id = response.get("id") if isinstance(response, dict) else None
+            youtube_url = f"https://www.youtube.com/watch?v={youtube_video_id}" if youtube_video_id else None
+            record_upload(job, state, youtube_url, notifier)
+            if youtube_url:
+                fingerprints = list(job.get("fingerprints", []))
+                if media is None:
+                    fingerprints.append(fingerprint)
+                state.index_content(fingerprints, youtube_url, job["key"])
+
+            # Delete file after successful upload
+            if media is None:
+                file_size = download_cache().remove(local_file)
+                logger.info(f"🗑️ קובץ נמחק: {local_file} ({file_size / (1024*1024):.2f} MB)")
+        else:
+            logger.error("❌ ההעלאה נכשלה")
+
+    except Exception as e:
+        logger.error(f"❌ שגיאה בהעלאה: {str(e)}")
+        logger.error(f"⏭️ ממשיך לשורה הבאה...")
+    finally:
+        if failed:
+            METRICS.inc("rows_total", result="upload_failed")
+        media = job.pop("media", None)
+        if media is not None:
+            media.stream().close()
+        else:
+            # Kept for the next run; a failed upload is evicted first when space is needed
+            download_cache().release(local_file, failed=failed)
+
+
+def _priority_value(row, column):
+    value = str(row.get(column) or "").strip()
+    if column == "added":
+        for fmt in ADDED_DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                pass
+        return datetime.min
+    return value
+
+
+def prioritize_rows(rows):
+    """Sort pending rows by UPLOAD_PRIORITY and PRIORITY_CATEGORIES (stable)."""
+    rows = list(rows)
+    for column, direction in reversed(UPLOAD_PRIORITY):
+        rows.sort(key=lambda row: _priority_value(row, column), reverse=(direction == "desc"))
+    if PRIORITY_CATEGORIES:
+        rank = {cat: pos for pos, cat in enumerate(PRIORITY_CATEGORIES)}
+        rows.sort(key=lambda row: rank.get(row.cat.strip(), len(rank)))
+    return rows
+
+
+def wait_for_quota(pool, notifier=None):
+    """
+    Block until some credential has quota for an upload.
+
+    Returns:
+        False if the quota is used up and QUOTA_WAIT_FOR_RESET is off
+    """
+    while pool.exhausted:
+        if not QUOTA_WAIT_FOR_RESET:
+            return False
+        if notifier is not None:
+            notifier.flush()
+        wait = seconds_until_reset() + QUOTA_RESET_GRACE_SECONDS
+        logger.info(f"😴 כל המכסות היומיות נוצלו - ממתין {wait / 3600:.1f} שעות לאיפוס (חצות שעון פסיפיק)")
+        time.sleep(wait)
+    return True
+
+
+def scheduled_rows(pool, source, notifier=None):
+    """
+    Pending rows in priority order, paused (or stopped) while the quota is
+    used up. Rows rejected by validate_metadata() are left out; in
+    multi-node mode only rows this worker leased are yielded.
+    """
+    claimed_elsewhere = 0
+    rejected = 0
+    with closing(source.rows()) as rows:
+        if UPLOAD_PRIORITY or PRIORITY_CATEGORIES:
+            # Only the pending rows are kept in memory, and only when an order is set
+            rows = prioritize_rows(rows)
+            logger.info(f"🔢 {len(rows)} שורות ממתינות מוינו לפי עדיפות")
+        try:
+            for row in rows:
+                if row.key in _rejected_rows:
+                    rejected += 1
+                    continue
+                if not wait_for_quota(pool, notifier):
+                    logger.warning("⏸️ כל המכסות היומיות נוצלו - השורות הנותרות יועלו בריצה הבאה")
+                    return
+                # Claimed as the row is scheduled, so a worker never holds more than it has queued
+                if not claim_row(row):
+                    claimed_elsewhere += 1
+                    continue
+                yield row
+        finally:
+            if rejected:
+                logger.info(f"🚫 {rejected} שורות נדחו בבדיקת הכותרות ולא הועלו")
+            if claimed_elsewhere:
+                logger.info(f"🤝 {claimed_elsewhere} שורות טופלו או טופלו כעת על ידי עובדים אחרים")
+
+
+def run_sequential(pool, source, total, state, notifier=None, remote_index=None):
+    with closing(scheduled_rows(pool, source, notifier)) as rows:
+        for row in rows:
+            try:
+                job = prepare_row(row, total, remote_index)
+                if job is None:
+                    continue
+                if not fetch_row_file(job, state, notifier):
+                    continue
+                upload_row_file(pool, job, state, notifier)
+            finally:
+                finish_row(row.key)
+
+
+def run_pipeline(pool, source, total, state, notifier=None, remote_index=None):
+    """
+    Producer/consumer mode: download workers fill a bounded queue of ready
+    files while upload workers drain it, so ingress and egress overlap.
+    """
+    logger.info(
+        f"🔀 מצב pipeline: {PIPELINE_DOWNLOAD_WORKERS} מורידים, "
+        f"{PIPELINE_UPLOAD_WORKERS} מעלים, תור של {PIPELINE_QUEUE_SIZE} קבצים"
+    )
+    jobs = queue.Queue(maxsize=PIPELINE_DOWNLOAD_WORKERS)
+    ready = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    def download_worker():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            try:
+                if fetch_row_file(job, state, notifier):
+                    ready.put(job)
+                    continue
+            except Exception as e:
+                logger.error(f"❌ שגיאה לא צפויה בהורדת שורה {job['idx'] + 1}: {str(e)}")
+            finish_row(job["key"])
+
+    def upload_worker():
+        while True:
+            job = ready.get()
+            if job is None:
+                return
+            try:
+                upload_row_file(pool, job, state, notifier)
+            except Exception as e:
+                # Keep draining `ready`, or the downloaders block on a full queue
+                logger.error(f"❌ שגיאה לא צפויה בהעלאת שורה {job['idx'] + 1}: {str(e)}")
+            finally:
+                finish_row(job["key"])
+
+    downloaders = [
+        threading.Thread(target=download_worker, name=f"download-{i}", daemon=True)
+        for i in range(PIPELINE_DOWNLOAD_WORKERS)
+    ]
+    uploaders = [
+        threading.Thread(target=upload_worker, name=f"upload-{i}", daemon=True)
+        for i in range(PIPELINE_UPLOAD_WORKERS)
+    ]
+    for t in downloaders + uploaders:
+        t.start()
+
+    with closing(scheduled_rows(pool, source, notifier)) as rows:
+        for row in rows:
+            job = prepare_row(row, total, remote_index)
+            if job is not None:
+                jobs.put(job)
+            else:
+                finish_row(row.key)
+
+    for _ in downloaders:
+        jobs.put(None)
+    for t in downloaders:
+        t.join()
+    for _ in uploaders:
+        ready.put(None)
+    for t in uploaders:
+        t.join()
+
+
+# Loaded by require_async_engine() when an async run starts (like aiohttp)
+asyncio = None
+async_engine = None
+
+
+def require_async_engine():
+    """Import asyncio and async_engine for the async run mode, once."""
+    global asyncio, async_engine
+    if async_engine is None:
+        import asyncio
+        import async_engine
+    return async_engine
+
+
+class AsyncProviderNotifier:
+    """
+    Site updates of an async run. With PROVIDER_BATCH_SIZE = 0 every row is
+    sent as its own GET; otherwise rows are POSTed in batches, as with
+    ProviderNotifier. Results are journaled through the run's StateWriter;
+    rows that failed are retried by the next run. Rows added with an object
+    path go to the inline cleanup once the site is updated.
+    """
+
+    def __init__(self, http, writer, limit):
+        self.http = http
+        self.writer = writer
+        self._limit = asyncio.Semaphore(max(limit, 1))
+        self._buffer = {}
+        self._tasks = set()
+
+    def add(self, key, csv_id, youtube_url, object_path=None):
+        if not csv_id:
+            self.writer.record(key, provider_updated="error")
+            return
+        if PROVIDER_BATCH_SIZE <= 0:
+            self._spawn(self._send_one(key, csv_id, youtube_url, object_path))
+            return
+        self._buffer[key] = (csv_id, youtube_url, object_path)
+        if len(self._buffer) >= PROVIDER_BATCH_SIZE:
+            self._spawn_batches()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _spawn_batches(self):
+        items = list(self._buffer.items())
+        self._buffer.clear()
+        for start in range(0, len(items), PROVIDER_MAX_BATCH_ITEMS):
+            self._spawn(self._send_batch(dict(items[start:start + PROVIDER_MAX_BATCH_ITEMS])))
+
+    async def flush(self):
+        if self._buffer:
+            self._spawn_batches()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks))
+
+    async def _send_one(self, key, csv_id, youtube_url, object_path=None):
+        ok = False
+        async with self._limit:
+            try:
+                with METRICS.timer("provider_notify_seconds", mode="single"):
+                    async with self.http.get(
+                        UPDATE_PROVIDER_ENDPOINT, params={"id": csv_id, "youtube_url": youtube_url}
+                    ) as resp:
+                        text = await resp.text()
+                ok = resp.status == 200
+                METRICS.inc("provider_notify_total", result="yes" if ok else f"http_{resp.status}")
+                if ok:
+                    logger.info("🛰️ עודכן provider באתר עבור id=%s", csv_id)
                 else:
-                    logger.error("❌ ההעלאה נכשלה")
-                    
+                    logger.warning("⚠️ עדכון provider נכשל (HTTP %s): %s", resp.status, text[:300])
             except Exception as e:
-                logger.error(f"❌ שגיאה בהעלאה: {str(e)}")
-                logger.error(f"⏭️ ממשיך לשורה הבאה...")
-                continue
+                METRICS.inc("provider_notify_total", result="error")
+                logger.warning("⚠️ כשל בעדכון provider באתר: %s", str(e))
+        self.writer.record(key, provider_updated="yes" if ok else "error")
+        if ok:
+            queue_remote_delete(key, object_path)
+
+    async def _send_batch(self, batch):
+        items = [{"id": csv_id, "youtube_url": url} for csv_id, url, _ in batch.values()]
+        data = None
+        async with self._limit:
+            try:
+                with METRICS.timer("provider_notify_seconds", mode="batch"):
+                    async with self.http.post(UPDATE_PROVIDER_ENDPOINT, json={"items": items}) as resp:
+                        if resp.status == 200:
+                            data = await resp.json(content_type=None)
+                        else:
+                            logger.warning("⚠️ עדכון provider מרוכז נכשל (HTTP %s): %s", resp.status, (await resp.text())[:300])
+            except Exception as e:
+                logger.warning("⚠️ כשל בעדכון provider מרוכז באתר: %s", str(e))
+
+        if not data or not data.get("ok"):
+            METRICS.inc("provider_notify_total", len(batch), result="error")
+            for key in batch:
+                self.writer.record(key, provider_updated="error")
+            return
+
+        results = data.get("results", {})
+        updated = 0
+        for key, (csv_id, _, object_path) in batch.items():
+            result = provider_result(results, csv_id)
+            ok = result == "updated"
+            METRICS.inc("provider_notify_total", result="yes" if ok else result)
+            self.writer.record(key, provider_updated="yes" if ok else "error")
+            if ok:
+                queue_remote_delete(key, object_path)
+            updated += ok
+        logger.info("🛰️ עודכן provider באתר עבור %s/%s סרטונים", updated, len(batch))
+
+
+class AsyncRun:
+    """
+    One RUN_MODE = "async" run: each row is a coroutine that goes through the
+    dedup check, download and upload stages, each stage bounded by its own
+    ASYNC_* semaphore. All HTTP goes through one aiohttp session; blocking
+    helpers shared with the other modes (fingerprints, the download cache,
+    the quota ledger) run in worker threads.
+    """
+
+    def __init__(self, pool, state, http, writer):
+        self.pool = pool
+        self.state = state
+        self.http = http
+        self.writer = writer
+        self.downloads = asyncio.Semaphore(max(ASYNC_DOWNLOADS, 1))
+        self.uploads = asyncio.Semaphore(max(ASYNC_UPLOADS, 1))
+        self.notifier = AsyncProviderNotifier(http, writer, ASYNC_NOTIFICATIONS)
+        self._auth_lock = asyncio.Lock()
+
+    async def access_token(self, credential, refresh=False):
+        async with self._auth_lock:
+            creds = credential.creds
+            if refresh or not creds.valid:
+                from google.auth.transport.requests import Request
+
+                logger.info(f"🔄 מרענן טוקן של '{credential.name}'...")
+                await asyncio.to_thread(creds.refresh, Request())
+            return creds.token
+
+    def finish(self, job, youtube_url, result="uploaded"):
+        """record_upload() for the async mode: journal through the writer, notify in the background."""
+        METRICS.inc("rows_total", result=result)
+        update = {"uploaded": "yes"}
+        object_path = None
+        if youtube_url:
+            logger.info(f"🔗 נשמר קישור: {youtube_url}")
+            update.update(youtube_url=youtube_url, provider_updated="pending")
+            object_path = cleanup_path(job)
+            if object_path:
+                update["remote_deleted"] = "pending"
+        self.writer.record(job["key"], **update)
+        if youtube_url:
+            self.notifier.add(job["key"], job["csv_id"], youtube_url, object_path)
+
+    async def process(self, job):
+        try:
+            if DEDUP_ENABLED and await self.link_duplicate(job):
+                return
+            if UPLOAD_SOURCE == "stream":
+                ready = await self.open_stream(job)
+            else:
+                async with self.downloads:
+                    ready = await self.fetch(job)
+            if ready:
+                async with self.uploads:
+                    await self.upload(job)
+        except Exception as e:
+            logger.error(f"❌ שגיאה לא צפויה בשורה {job['idx'] + 1}: {str(e)}")
+        finally:
+            await asyncio.to_thread(finish_row, job["key"])
+
+    async def link_duplicate(self, job):
+        try:
+            if job.get("remote_etag"):
+                job["fingerprints"] = [f"etag:{job['remote_size']}:{job['remote_etag']}"]
+            else:
+                job["fingerprints"] = await asyncio.to_thread(
+                    remote_fingerprints, storage_url_factory(job["url_path"], job["full_url"])
+                )
+        except Exception as e:
+            logger.warning(f"⚠️ לא הצלחתי לחשב טביעת אצבע לשורה {job['idx'] + 1}: {str(e)}")
+            return False
+        found = self.state.find_content(job["fingerprints"])
+        if not found:
+            return False
+        youtube_url, original_key = found
+        logger.info(f"♻️ תוכן זהה כבר הועלה (שורה {original_key}) - מקשר ל-{youtube_url} בלי הורדה והעלאה")
+        self.finish(job, youtube_url, result="duplicate")
+        return True
+
+    def _fetch_failed(self, job, e):
+        logger.error(f"❌ שגיאה בהורדה: {str(e)}")
+        if isinstance(e, async_engine.NotFound):
+            METRICS.inc("rows_total", result="not_url")
+            self.writer.record(job["key"], uploaded="Not url")
+            logger.info(f"✅ נשמר 'Not url' בעמודת uploaded עבור שורה {job['idx'] + 1}")
+        else:
+            METRICS.inc("rows_total", result="download_failed")
+        logger.error(f"⏭️ דילוג על שורה {job['idx'] + 1}")
+        return False
+
+    async def open_stream(self, job):
+        url_factory = storage_url_factory(job["url_path"], job["full_url"])
+        try:
+            size, etag = await async_engine.probe(self.http, url_factory)
+        except Exception as e:
+            return self._fetch_failed(job, e)
+        logger.info(f"🌊 העלאה בזרימה ישירה מהאחסון ({size / (1024*1024):.2f} MB)")
+        job["source"] = async_engine.RemoteSource(self.http, url_factory, size, bandwidth_governor())
+        job["fingerprint"] = f"remote:{size}:{etag or ''}"
+        return True
+
+    async def fetch(self, job):
+        """fetch_row_file() for the async mode (one stream per file - rows run in parallel instead)."""
+        local_file = job["local_file"]
+        cache = download_cache()
+        url_factory = storage_url_factory(job["url_path"], job["full_url"])
+        try:
+            size = job.get("remote_size")
+            if not size:
+                size, _ = await async_engine.probe(self.http, url_factory)
+            if await asyncio.to_thread(cache.lookup, local_file, size, job.get("remote_etag")):
+                logger.info(f"✅ קובץ כבר קיים: {local_file} - דילוג על הורדה")
+                return True
+            if not await asyncio.to_thread(cache.reserve, local_file, size):
+                logger.warning(f"💽 אין מספיק מקום פנוי להורדה - שורה {job['idx'] + 1} תטופל בריצה הבאה")
+                return False
+            logger.info(f"📥 מוריד: {job['url_path']}")
+            try:
+                await asyncio.to_thread(trim_segmented_download, cache.part_path(local_file), size)
+                await async_engine.download(
+                    self.http, url_factory, cache.part_path(local_file), size, bandwidth=bandwidth_governor()
+                )
+                await asyncio.to_thread(cache.commit, local_file, size, job.get("remote_etag"))
+            except BaseException:
+                cache.release(local_file)
+                raise
+            return True
+        except Exception as e:
+            return self._fetch_failed(job, e)
+
+    async def _send(self, upload, session_key, credential):
+        """
+        Resume the saved session of session_key if YouTube still has it, else
+        start a new one. The credential's videos.insert reservation is refunded
+        when no new session was created.
+        """
+        refund = functools.partial(asyncio.to_thread, self.pool.refund, credential, "videos.insert")
+        saved = self.state.get_upload_session(session_key)
+        if saved:
+            upload.uri = saved[0]
+            try:
+                outcome, value = await upload.query()
+            except async_engine.UploadError:
+                outcome, value = None, None
+            if outcome == "done":
+                logger.info("✅ ההעלאה כבר הושלמה בריצה קודמת")
+                self.writer.call("drop_upload_session", session_key)
+                await refund()
+                return value
+            if outcome == "resume":
+                logger.info(f"♻️ ממשיך סשן העלאה קודם מבייט {value} ({value / (1024*1024):.2f} MB)")
+                upload.progress = value
+                await refund()
+            else:
+                logger.info("⌛ סשן ההעלאה השמור פג תוקף - מתחיל העלאה חדשה")
+                upload.uri = None
+
+        def save_progress(offset):
+            self.writer.call("save_upload_session", session_key, upload.uri, offset)
+
+        resumed = upload.uri is not None
+        try:
+            response = await upload.run(on_progress=save_progress)
+        except QuotaExceeded:
+            # The caller books the rest of the credential's day
+            raise
+        except Exception:
+            if not resumed and upload.uri is None:
+                await refund()
+            raise
+        self.writer.call("drop_upload_session", session_key)
+        return response
+
+    async def upload(self, job):
+        """upload_row_file() for the async mode."""
+        local_file = job["local_file"]
+        source = job.pop("source", None)
+        on_disk = source is None
+        failed = True
+        try:
+            if on_disk:
+                source = async_engine.FileSource(local_file)
+                fingerprint = await asyncio.to_thread(file_fingerprint, local_file)
+            else:
+                fingerprint = job["fingerprint"]
+            file_name = os.path.basename(urllib.parse.urlparse(job["full_url"]).path)
+            mimetype = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+            metadata = {
+                "snippet": {"title": job["title"], "description": job["description"], "tags": []},
+                "status": {"privacyStatus": "public"},
+            }
+            logger.info(f"📤 מתחיל העלאה ליוטיוב: {job['title']}")
+
+            owner = await asyncio.to_thread(saved_session_owner, self.pool, self.state, job, fingerprint)
+            while True:
+                credential = await asyncio.to_thread(self.pool.reserve, "videos.insert", owner)
+                if credential is None and owner is not None:
+                    logger.warning(f"⌛ ל-'{owner.name}' אין מכסה להמשך סשן ההעלאה השמור - מתחיל העלאה חדשה")
+                    self.writer.call("drop_upload_session", upload_session_key(job, owner, fingerprint))
+                    owner = None
+                    continue
+                if credential is None:
+                    if await asyncio.to_thread(wait_for_quota, self.pool):
+                        continue
+                    logger.warning(f"⏸️ אין מכסה פנויה - שורה {job['idx'] + 1} תועלה בריצה הבאה")
+                    failed = False
+                    return
+                upload = async_engine.ResumableUpload(
+                    self.http,
+                    YOUTUBE_UPLOAD_URL,
+                    lambda refresh, credential=credential: self.access_token(credential, refresh),
+                    metadata,
+                    source,
+                    mimetype,
+                    chunk_tuner(),
+                    bandwidth_governor(),
+                )
+                try:
+                    response = await self._send(upload, upload_session_key(job, credential, fingerprint), credential)
+                    break
+                except QuotaExceeded:
+                    await asyncio.to_thread(self.pool.mark_exhausted, credential)
+
+            failed = False
+            logger.info(f"✅ הועלה בהצלחה! Video ID: {response['id']}")
+            youtube_url = f"https://www.youtube.com/watch?v={response['id']}"
+            self.finish(job, youtube_url)
+            fingerprints = list(job.get("fingerprints", []))
+            if on_disk:
+                fingerprints.append(fingerprint)
+            self.writer.call("index_content", fingerprints, youtube_url, job["key"])
+            if on_disk:
+                file_size = await asyncio.to_thread(download_cache().remove, local_file)
+                logger.info(f"🗑️ קובץ נמחק: {local_file} ({file_size / (1024*1024):.2f} MB)")
+        except Exception as e:
+            logger.error(f"❌ שגיאה בהעלאה של שורה {job['idx'] + 1}: {str(e)}")
+        finally:
+            if failed:
+                METRICS.inc("rows_total", result="upload_failed")
+            if source is not None:
+                await source.close()
+            if on_disk:
+                download_cache().release(local_file, failed=failed)
+
+
+async def _run_async(pool, source, total, state, remote_index=None):
+    connections = ASYNC_DOWNLOADS + ASYNC_UPLOADS * 2 + ASYNC_NOTIFICATIONS
+    # Rows admitted at once: every stage busy plus a few waiting, like the pipeline queue
+    admitted = asyncio.Semaphore(ASYNC_DOWNLOADS + ASYNC_UPLOADS + PIPELINE_QUEUE_SIZE)
+    writer = async_engine.StateWriter(state)
+    writer.start()
+    cleaner = remote_cleaner()
+    if cleaner is not None:
+        # Delete results are journaled by the writer too, handed over from the delete threads
+        loop = asyncio.get_running_loop()
+        cleaner.record = lambda key, **fields: loop.call_soon_threadsafe(
+            functools.partial(writer.record, key, **fields)
+        )
+    tasks = set()
+    # Pulled in a worker thread: waiting for the quota to reset may sleep for hours
+    rows = scheduled_rows(pool, source)
+    try:
+        async with async_engine.http_session(connections) as http:
+            run = AsyncRun(pool, state, http, writer)
+            try:
+                while True:
+                    row = await asyncio.to_thread(next, rows, None)
+                    if row is None:
+                        break
+                    job = prepare_row(row, total, remote_index)
+                    if job is None:
+                        await asyncio.to_thread(finish_row, row.key)
+                        continue
+                    await admitted.acquire()
+                    task = asyncio.create_task(run.process(job))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    task.add_done_callback(lambda _: admitted.release())
+                if tasks:
+                    await asyncio.gather(*list(tasks))
+            finally:
+                await run.notifier.flush()
+    finally:
+        rows.close()
+        if cleaner is not None:
+            # Their results reach the writer before it closes
+            await asyncio.to_thread(cleaner.drain)
+            cleaner.record = state.record
+        await writer.close()
+
+
+def run_async(pool, source, total, state, remote_index=None):
+    """
+    asyncio mode: downloads, upload chunk PUTs and site updates run as
+    coroutines over one aiohttp connection pool. Row state is written by a
+    single StateWriter task. Falls back to the pipeline when aiohttp is missing.
+    """
+    try:
+        require_async_engine().require_aiohttp()
+    except RuntimeError as e:
+        logger.warning(f"⚠️ {str(e)} - עובר למצב pipeline")
+        return run_pipeline(pool, source, total, state, remote_index=remote_index)
+    logger.info(
+        f"⚡ מצב async: {ASYNC_DOWNLOADS} הורדות, {ASYNC_UPLOADS} העלאות ו-{ASYNC_NOTIFICATIONS} "
+        f"עדכוני אתר במקביל"
+    )
+    asyncio.run(_run_async(pool, source, total, state, remote_index))
+
+
+def main(command="upload"):
+    """
+    Args:
+        command: "upload" (the pending rows) or "reconcile" (only backfill rows
+            whose video is already on a channel - see reconcile_uploads)
+    """
+    logger.info("=" * 60)
+    logger.info("🚀 מתחיל תהליך העלאה ליוטיוב")
+    logger.info("=" * 60)
+    
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+
+    state = StateStore(STATE_DB_FILE, STATE_DB_JOURNAL_MODE)
+    # Joined before the journal is read; with other workers live, only the
+    # last one to leave writes the CSV
+    other_workers = start_row_leases(state)
+    try:
+        # Apply transitions journaled since the last export (e.g. after a crash)
+        source = CsvRowSource(CSV_FILE, journal=state.current())
+        total, uploaded_count = source.counts()
+
+        logger.info(f"📊 נמצאו {total} שורות בקובץ CSV")
+        
+        remaining_count = total - uploaded_count
+        logger.info(f"✅ כבר הועלו: {uploaded_count} | 📤 נותרו: {remaining_count}")
+
+        # Before any network I/O (even the OAuth token refresh)
+        validate_metadata(source)
+
+        uploading = command == "upload"
+        notifier = None
+        if PROVIDER_BATCH_SIZE > 0:
+            notifier = ProviderNotifier(state)
+        cleaner = remote_cleaner(state)
+        if (notifier is not None or cleaner is not None) and not other_workers:
+            # Retry site updates and inline deletes that failed (or never ran)
+            # in previous runs - once, by the first worker
+            with closing(source.rows(status="uploaded")) as rows:
+                for row in rows:
+                    if not row.youtube_url:
+                        continue
+                    object_path = cleanup_path({"url_path": row.url.strip()}) if row.remote_deleted.strip() == "pending" else None
+                    if row.provider_updated == "yes":
+                        queue_remote_delete(row.key, object_path)
+                    elif notifier is not None and row.provider_updated in ("error", "pending"):
+                        notifier.add(row.key, row.id, row.youtube_url, object_path)
+
+        if not remaining_count:
+            # No token refresh and no Google libraries for a run with nothing to do
+            logger.info("✅ אין שורות ממתינות")
+            if notifier is not None:
+                notifier.flush()
+            return
+
+        pool = load_credential_pool(state)
+
+        purge_worker_folders(state)
+        os.makedirs(download_folder(), exist_ok=True)
+        if UPLOAD_CHUNK_ADAPTIVE:
+            chunk_tuner(state)
+        # Created before the transfer threads start; logs the limits in effect
+        bandwidth_governor()
+        purged = state.purge_upload_sessions(UPLOAD_SESSION_MAX_AGE_SECONDS)
+        if purged:
+            logger.info(f"🧹 נמחקו {purged} סשני העלאה ישנים")
+
+        remote_index = preflight_remote_objects(source, state) if PREFLIGHT_ENABLED and uploading else None
+
+        if DEDUP_ENABLED and DEDUP_BACKFILL and uploading:
+            backfill_content_index(source, state)
+
+        try:
+            if command == "reconcile" or RECONCILE_BEFORE_RUN:
+                if reconcile_uploads(pool, source, state, notifier):
+                    # The backfilled rows are no longer pending
+                    source = CsvRowSource(CSV_FILE, journal=state.current())
+            if not uploading:
+                logger.info("🔎 מצב reconcile - לא מעלה סרטונים")
+            elif RUN_MODE == "async":
+                run_async(pool, source, total, state, remote_index)
+            elif RUN_MODE == "pipeline":
+                run_pipeline(pool, source, total, state, notifier, remote_index)
+            else:
+                run_sequential(pool, source, total, state, notifier, remote_index)
+        finally:
+            if notifier is not None:
+                notifier.flush()
+            pool.log_report()
+            if UPLOAD_CHUNK_ADAPTIVE:
+                state.set_setting("upload_chunk_tuning", chunk_tuner().stats())
 
         logger.info(f"\n{'=' * 60}")
         logger.info("🎉 כל ההעלאות הסתיימו!")
@@ -424,7 +2288,35 @@ def main():
     except Exception as e:
         logger.error(f"❌ שגיאה קריטית: {str(e)}")
         raise
+    finally:
+        if remote_cleaner() is not None:
+            # Deletes still queued are journaled before the CSV is written
+            remote_cleaner().close()
+        last_worker = _row_leases is None or _row_leases.stop()
+        if last_worker:
+            try:
+                state.export_csv(CSV_FILE)
+            except Exception as e:
+                logger.error(f"❌ לא הצלחתי לכתוב את המצב לקובץ CSV (נשמר ביומן {state.path}): {str(e)}")
+        else:
+            logger.info(f"📝 עובדים אחרים עדיין פעילים - המצב נשמר ביומן {state.path} והעובד האחרון יכתוב את {CSV_FILE}")
+        state.close()
+        if METRICS_SUMMARY_FILE:
+            METRICS.write_summary(METRICS_SUMMARY_FILE)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="העלאת הסרטונים שב-CSV_FILE ליוטיוב")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=("upload", "reconcile"),
+        default="upload",
+        help="upload (ברירת מחדל): העלאת השורות הממתינות | "
+             "reconcile: סימון שורות שהסרטון שלהן כבר בערוץ, בלי להעלות",
+    )
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    main()
+    main(parse_args().command)